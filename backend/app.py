@@ -1,9 +1,9 @@
 # backend/app.py
 from __future__ import annotations
-import os, time
+import hashlib, os, time
 from datetime import datetime
 
-from flask import Flask, request, jsonify, send_from_directory, current_app, redirect, url_for, render_template
+from flask import Flask, Blueprint, request, jsonify, current_app, redirect, url_for, render_template, session, stream_with_context
 from flask_cors import CORS
 from flask_login import (
     LoginManager, login_user, logout_user,
@@ -13,56 +13,100 @@ from werkzeug.utils import secure_filename
 from werkzeug.exceptions import RequestEntityTooLarge
 from sqlalchemy import inspect
 from sqlalchemy.exc import OperationalError
-from sqlalchemy.orm import Session
-from dotenv import load_dotenv
+from sqlalchemy.orm import Session, joinedload
 from authlib.integrations.flask_client import OAuth
 from prometheus_flask_exporter import PrometheusMetrics
 
 from .models import (
-    db, File, Folder, User, FileVersion,
+    db, File, Folder, FolderRollup, User, FileVersion,
     DocumentReview, Notification,
     generate_reset_token, verify_reset_token,
 )
-from .config import Config
-from .init_db import create_test_user, create_admin_and_test_users
+from .config import Config, engine_options
+from .routing import init_replica_routing
+from .storage import HashingReader, StorageError, init_storage, storage
+from . import archive, backup, changes, domain_metrics, extract, hot_cache, previews, layout, query_stats, retention, sessions, stats
+from .health import readiness
+from .pagination import (
+    BadCursor, NEXT_CURSOR_HEADER, after_asc, after_desc, cursor_int, decode_cursor,
+    encode_cursor, page_limit, stored_time,
+)
 
 
 # ───────────────────────────── Flask & Login ─────────────────────────────
-app = Flask(__name__)
-app.config.from_object(Config)
-db.init_app(app)
+# Extensions are created unbound and attached in create_app(), so importing
+# this module never touches the database, the network or the metrics registry.
+bp = Blueprint('main', __name__)
 
-metrics = PrometheusMetrics(app)  # 啟用自動監控所有 endpoint
+metrics = PrometheusMetrics.for_app_factory()  # 啟用自動監控所有 endpoint
 
 login_manager               = LoginManager()
 login_manager.login_view    = None          #   ↳ return JSON, no 302
-login_manager.init_app(app)
 
-# create test user and admin 
-create_admin_and_test_users(app, db)
+oauth = OAuth()
 
-# google oauth
-load_dotenv()
-GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID", "your-google-client-id")
-GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET", "your-google-client-secret")
-FRONTEND_PORT = os.getenv("FRONTEND_PORT", 80)
+FRONTEND_PORT = Config.FRONTEND_PORT
 FRONTEND_ROOT = f"http://localhost:{FRONTEND_PORT}" if FRONTEND_PORT else "http://localhost:8080"
 
-oauth = OAuth(app)
-google = oauth.register(
-    name='google',
-    client_id=GOOGLE_CLIENT_ID,
-    client_secret=GOOGLE_CLIENT_SECRET,
-    # access_token_url='https://accounts.google.com/o/oauth2/token',
-    access_token_params=None,
-    # authorize_url='https://accounts.google.com/o/oauth2/auth',
-    authorize_params=None,
-    api_base_url='https://www.googleapis.com/oauth2/v1/',
-    client_kwargs={
-        'scope': 'openid email profile',
-    },
-    server_metadata_url= 'https://accounts.google.com/.well-known/openid-configuration'
-)
+
+def create_app(config_object=Config, **overrides) -> Flask:
+    """
+    Build a configured Flask application.
+
+    Seeding the admin/test users and creating tables are *not* done here;
+    run ``flask init-db`` / ``flask seed-users`` once per deployment instead.
+    """
+    app = Flask(__name__)
+    app.config.from_object(config_object)
+    app.config.update(overrides)
+
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS',
+                          engine_options(app.config['SQLALCHEMY_DATABASE_URI'], app.config))
+
+    db.init_app(app)
+    init_storage(app)
+    hot_cache.init_app(app)
+    sessions.init_app(app)
+    extract.init_app(app)
+    previews.init_app(app)
+    init_replica_routing(app)
+    query_stats.init_app(app)
+    login_manager.init_app(app)
+    oauth.init_app(app)
+    if app.config.get('METRICS_ENABLED', True):
+        metrics.init_app(app)
+        domain_metrics.init_collector(app)
+    CORS(app, supports_credentials=True, expose_headers=[NEXT_CURSOR_HEADER, backup.SNAPSHOT_HEADER])
+
+    app.register_blueprint(bp)
+    retention.init_sweeper(app)
+    changes.init_compactor(app)
+    stats.init_reconciler(app)
+
+    from .cli import register_commands
+    register_commands(app)
+    return app
+
+
+def google_client():
+    """Register the Google OAuth client on first use and return it."""
+    client = oauth.create_client('google')
+    if client is None:
+        client = oauth.register(
+            name='google',
+            client_id=current_app.config['GOOGLE_CLIENT_ID'],
+            client_secret=current_app.config['GOOGLE_CLIENT_SECRET'],
+            # access_token_url='https://accounts.google.com/o/oauth2/token',
+            access_token_params=None,
+            # authorize_url='https://accounts.google.com/o/oauth2/auth',
+            authorize_params=None,
+            api_base_url='https://www.googleapis.com/oauth2/v1/',
+            client_kwargs={
+                'scope': 'openid email profile',
+            },
+            server_metadata_url= 'https://accounts.google.com/.well-known/openid-configuration'
+        )
+    return client
 
 @login_manager.user_loader
 def load_user(uid):          # SQLAlchemy 2.x: Session.get
@@ -72,16 +116,15 @@ def load_user(uid):          # SQLAlchemy 2.x: Session.get
 def _unauth():
     return jsonify({"error": "unauthenticated"}), 401
 
-CORS(app, supports_credentials=True)
-
-# ───────────────────── helper: build **absolute** disk path ──────────────
+# ───────────────────── helper: build storage keys ────────────────────────
 def folder_disk_path(folder: Folder | None, username: str) -> str:
     """
-    Build uploads/<username>/… path for *folder*.
+    Build the <username>/… storage key for *folder* (relative to UPLOAD_FOLDER,
+    so it means the same thing on every replica).
     If *folder* is None ⇒ returns user root folder.
     """
     if not folder or folder.parent_id is None:
-        return os.path.join(app.config['UPLOAD_FOLDER'], username)
+        return username
     
     # Build the full path hierarchy recursively
     path_parts = []
@@ -92,11 +135,15 @@ def folder_disk_path(folder: Folder | None, username: str) -> str:
         current = Folder.query.get(current.parent_id)
     
     path_parts.reverse()  # Reverse to get correct order
-    return os.path.join(app.config['UPLOAD_FOLDER'], username, *path_parts)
+    return os.path.join(username, *path_parts)
 
 def get_version_dir(username: str) -> str:
-    """Returns the .version directory for a user"""
-    return os.path.join(Config.UPLOAD_FOLDER, username, '.version')
+    """Returns the .version directory key for a user"""
+    return os.path.join(username, layout.VERSION_DIR)
+
+def get_version_path(username: str, name: str) -> str:
+    """Returns the (hash-sharded) key of version blob *name* for a user"""
+    return layout.version_path(username, name)
 
 def get_next_version_number(file_id: int) -> int:
     """Get the next available version number for a file"""
@@ -124,10 +171,9 @@ def _get_content_for_version(db_session: Session, file_obj: File, version_number
         
     content_path = fv_record.path
     
-    if content_path and os.path.exists(content_path):
+    if content_path and storage.exists(content_path):
         try:
-            with open(content_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = storage.read_text(content_path)
             current_app.logger.info(f"Successfully read content for file {file_obj.id} V{version_number_to_fetch} from {content_path}. Length: {len(content)}")
             return content
         except Exception as e:
@@ -138,32 +184,36 @@ def _get_content_for_version(db_session: Session, file_obj: File, version_number
         return ""
 
 # ───────────────────────────────── Routes ─────────────────────────────────
-@app.route('/')
+@bp.route('/')
 def health():
     return {"message": "Flask backend is running."}
 
-# ────────────── Upload ───────────────────────────────────────────────────
-@app.route('/upload', methods=['POST'])
-@login_required
-def upload_file():
-    f         = request.files.get('file')
-    folder_id = request.form.get('folder_id', type=int)
-    if not f:
-        return {"error": "No file provided"}, 400
+@bp.route('/healthz')
+def healthz():
+    """Liveness: the worker answers; dependencies are /readyz's business."""
+    return {"status": "ok"}
 
-    # target folder (None → root)
-    folder = Folder.query.get(folder_id) if folder_id else \
-             Folder.query.filter_by(owner_id=current_user.id,
-                                    parent_id=None).first()
+@bp.route('/readyz')
+def readyz():
+    """Readiness: DB + storage reachable and this worker warmed up (503 otherwise)."""
+    report = readiness(current_app._get_current_object())
+    return report, 200 if report["ready"] else 503
 
+# ────────────── Upload ───────────────────────────────────────────────────
+def _create_file(folder: Folder | None, filename: str, mimetype: str | None,
+                 fill, operation: str) -> FileVersion:
+    """
+    Store a new File and return its initial version.
+    *fill(path)* writes the live blob and returns ``(size, sha256)``.
+    """
     disk_dir = folder_disk_path(folder, current_user.username)
-    os.makedirs(disk_dir, exist_ok=True)
 
-    final_path = os.path.join(disk_dir, secure_filename(f.filename))
-    f.save(final_path)
+    final_path = os.path.join(disk_dir, secure_filename(filename))
+    with domain_metrics.disk_write(operation):
+        size, digest = fill(final_path)
 
     # Create file record
-    rec = File(filename=f.filename, mimetype=f.mimetype,
+    rec = File(filename=filename, mimetype=mimetype,
                path=final_path, owner_id=current_user.id,
                folder_id=folder.id if folder else None,
                current_version=1)  # Set initial version
@@ -171,34 +221,266 @@ def upload_file():
     db.session.flush()  # Get the file ID without committing
 
     # Create initial version record and store in .version directory
-    version_dir = get_version_dir(current_user.username)
-    os.makedirs(version_dir, exist_ok=True)
-    version_path = os.path.join(version_dir, f"{rec.id}_v1_{secure_filename(f.filename)}")
-    import shutil
-    shutil.copy2(final_path, version_path)
+    version_path = get_version_path(current_user.username, f"{rec.id}_v1_{secure_filename(filename)}")
+    with domain_metrics.disk_write(operation):
+        storage.copy(final_path, version_path, immutable=True)
 
     version = FileVersion(
         file_id=rec.id,
         version_number=1,
         path=version_path,
+        size=size,
+        sha256=digest,
         comment="Initial version"
     )
     db.session.add(version)
     db.session.commit()
+    extract.schedule(version, filename)
+    return version
+
+def _add_version(file: File, filename: str, comment: str, fill, operation: str) -> FileVersion:
+    """Store a new current version of *file*; *fill(path)* returns ``(size, sha256)``."""
+    # Get the next version number by checking the highest existing version
+    new_version_number = get_next_version_number(file.id)
+    version_path = get_version_path(current_user.username, f"{file.id}_v{new_version_number}_{secure_filename(filename)}")
+    with domain_metrics.disk_write(operation):
+        size, digest = fill(version_path)
+
+    # Create version record
+    version = FileVersion(
+        file_id=file.id,
+        version_number=new_version_number,
+        path=version_path,
+        size=size,
+        sha256=digest,
+        comment=comment
+    )
+    
+    # Update file's current version
+    file.current_version = new_version_number
+    file.path = version_path  # Update current file path to latest version
     
-    return {"message": "Upload successful", "file_id": rec.id}, 201
+    db.session.add(version)
+    db.session.commit()
+    extract.schedule(version, file.filename)
+    return version
+
+def _extracted_content(file: File, version: FileVersion, **extra):
+    """Extracted text of a non-text *version* (see extract.py); 202 while it is being extracted."""
+    status, text, meta = extract.lookup(version, file.filename)
+    if status == 'pending':
+        return {"status": "pending", "message": "Text extraction in progress, retry shortly"}, 202
+    if status != 'done':
+        return {"error": f"No text could be extracted from this file ({status})", **(meta or {})}, 422
+    return jsonify({"content": text, "filename": file.filename, "mimetype": file.mimetype,
+                    "extracted": True, "metadata": meta, **extra})
+
+def _stream_into_storage(stream):
+    """fill() for a request body: store it while hashing it in the same pass."""
+    def fill(path):
+        reader = HashingReader(stream)
+        size = storage.put(path, reader)
+        return size, reader.hexdigest()
+    return fill
+
+def _readable_blob(digest: str, size: int) -> FileVersion | None:
+    """
+    A stored version with this content that the current user may read: any
+    version of their own files, only the current one of someone else's
+    published file (older versions of those are not served to them).
+    """
+    q = (FileVersion.query.join(File, File.id == FileVersion.file_id)
+         .filter(FileVersion.sha256 == digest, FileVersion.size == size))
+    if not current_user.is_admin:
+        q = q.filter((File.owner_id == current_user.id)
+                     | ((File.is_published == True)
+                        & (FileVersion.version_number == File.current_version)))
+    for candidate in q.order_by(FileVersion.id.desc()).limit(5):
+        if storage.exists(candidate.path):
+            return candidate
+    return None
+
+@bp.route('/upload', methods=['POST'])
+@login_required
+def upload_file():
+    f         = request.files.get('file')
+    folder_id = request.form.get('folder_id', type=int)
+    if not f:
+        return {"error": "No file provided"}, 400
+
+    # target folder (None → root)
+    folder = Folder.query.get(folder_id) if folder_id else \
+             Folder.query.filter_by(owner_id=current_user.id,
+                                    parent_id=None).first()
+
+    version = _create_file(folder, f.filename, f.mimetype, _stream_into_storage(f.stream), 'upload_file')
+    domain_metrics.record_upload('upload_file', version.size)
+    return {"message": "Upload successful", "file_id": version.file_id, "sha256": version.sha256}, 201
+
+@bp.route('/upload/precheck', methods=['POST'])
+@login_required
+def upload_precheck():
+    """
+    Upload-by-hash handshake.
+    Body: ``{"sha256", "size", "filename", "folder_id"?, "mimetype"?}`` for a new
+    file, or ``{"sha256", "size", "file_id", "comment"?}`` for a new version.
+    If identical content is already stored in a file the user can read, the
+    records are created from it right away (201, nothing is transferred);
+    otherwise the response says where to upload the bytes (200).
+    """
+    data = request.get_json(silent=True) or {}
+    digest = str(data.get('sha256') or '').lower()
+    size = data.get('size')
+    if len(digest) != 64 or any(c not in '0123456789abcdef' for c in digest) \
+            or not isinstance(size, int) or size < 0:
+        return {"error": "sha256 (hex) and size are required"}, 400
+    limit = current_app.config.get('MAX_CONTENT_LENGTH')
+    if limit and size > limit:
+        return {"error": "File exceeds limit"}, 413
+
+    target = folder = None
+    if data.get('file_id'):
+        try:
+            file_id = int(data['file_id'])
+        except (TypeError, ValueError):
+            return {"error": "file_id must be an integer"}, 400
+        target = File.query.get_or_404(file_id)
+        if target.owner_id != current_user.id and not current_user.is_admin:
+            return {"error": "Access denied"}, 403
+    elif not data.get('filename'):
+        return {"error": "filename is required"}, 400
+    elif data.get('folder_id'):
+        try:
+            folder_id = int(data['folder_id'])
+        except (TypeError, ValueError):
+            return {"error": "folder_id must be an integer"}, 400
+        folder = Folder.query.get_or_404(folder_id)
+        if folder.owner_id != current_user.id:
+            return {"error": "Access denied to target folder"}, 403
+
+    source = _readable_blob(digest, size)
+    if source is None:
+        url = url_for('main.upload_version', file_id=target.id) if target else url_for('main.upload_file')
+        return {"deduplicated": False, "upload_url": url}
+
+    def fill(path):
+        storage.copy(source.path, path, immutable=True)
+        return size, digest
+
+    domain_metrics.record_dedup(size)
+    if target:
+        version = _add_version(target, data.get('filename') or target.filename,
+                               data.get('comment', ''), fill, 'upload_precheck')
+        domain_metrics.record_upload('upload_precheck', 0)
+        return {"deduplicated": True, "file_id": target.id,
+                "version_number": version.version_number, "version_id": version.id}, 201
+
+    folder = folder or Folder.query.filter_by(owner_id=current_user.id, parent_id=None).first()
+    mimetype = data.get('mimetype') or source.file.mimetype
+    version = _create_file(folder, data['filename'], mimetype, fill, 'upload_precheck')
+    domain_metrics.record_upload('upload_precheck', 0)
+    return {"deduplicated": True, "file_id": version.file_id}, 201
+
+@bp.route('/upload-archive', methods=['POST'])
+@login_required
+def upload_archive():
+    """
+    Unpack a ZIP or tar archive sent as the raw request body into
+    ``?folder_id=`` (default: root), creating its folders and files in one
+    request (see archive.py).  Answers with a per-entry report.
+    """
+    request.max_content_length = current_app.config['ARCHIVE_MAX_BYTES']
+    folder_id = request.args.get('folder_id', type=int)
+    folder = Folder.query.get_or_404(folder_id) if folder_id else \
+             Folder.query.filter_by(owner_id=current_user.id, parent_id=None).first()
+    if folder is None:
+        return {"error": "Root folder not found"}, 404
+    if folder.owner_id != current_user.id:
+        return {"error": "Access denied to target folder"}, 403
+
+    levels = current_app.config['FOLDER_DEPTH_LIMIT'] - len(_ancestor_ids(folder))
+    try:
+        report = archive.import_archive(
+            request.stream, current_user, folder, folder_disk_path(folder, current_user.username),
+            levels, archive.Limits.from_config(current_app.config),
+            current_app.config['ARCHIVE_BATCH_SIZE'])
+    except archive.ArchiveError as e:
+        return {"error": str(e)}, 400
+    except archive.ArchiveRejected as e:
+        return {"error": f"Archive rejected, nothing was imported: {e}",
+                "entries_read": len(e.report.entries)}, 413
+    body = report.as_dict()
+    return body, 201 if body["imported"] else 200
 
 # ────────────── Download / Delete file ───────────────────────────────────
-@app.route('/download/<int:file_id>')
+@bp.route('/download/<int:file_id>')
 @login_required
 def download_file(file_id):
     rec = File.query.get_or_404(file_id)
     if rec.is_published == False and rec.owner_id != current_user.id and not current_user.is_admin:
         return {"error": "Access denied"}, 403
-    return send_from_directory(os.path.dirname(rec.path),
-                               os.path.basename(rec.path))
-
-@app.route('/delete/<int:file_id>', methods=['DELETE'])
+    resp = _send_hot(rec) if rec.is_published else None
+    if resp is not None:
+        domain_metrics.record_download('download_file', resp.content_length or 0)
+        return resp
+    st = storage.stat(rec.path)
+    if st is None:
+        return {"error": "File content not found"}, 404
+    domain_metrics.record_download('download_file', st.size)
+    return storage.send(rec.path, mimetype=rec.mimetype)
+
+@bp.route('/preview/<int:file_id>/<int:version_number>')
+@login_required
+def get_preview(file_id, version_number):
+    """
+    WebP thumbnail (images) or first-page preview (documents) of one version,
+    at most ?size= pixels square (see previews.py).  The URL is not tied to
+    the content (version numbers and, on SQLite, file ids can be reused after
+    a delete), so browsers revalidate every use against the content-hash ETag.
+    """
+    rec = File.query.get_or_404(file_id)
+    if rec.is_published == False and rec.owner_id != current_user.id and not current_user.is_admin:
+        return {"error": "Access denied"}, 403
+    version = FileVersion.query.filter_by(file_id=file_id, version_number=version_number).first_or_404()
+    if not version.sha256:
+        return {"error": "No preview for legacy versions without a content hash"}, 404
+    size = previews.snap_size(request.args.get('size', 128, type=int) or 128,
+                              current_app.config['PREVIEW_SIZES'])
+    try:
+        data = previews.get_previews().get(version, rec.filename, rec.mimetype, size)
+    except previews.PreviewUnavailable as e:
+        return {"error": str(e)}, 404
+    if data is None:
+        return {"status": "pending"}, 202, {"Retry-After": "2"}
+    resp = current_app.response_class(data, mimetype=previews.MIMETYPE)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    resp.set_etag(f"{version.sha256}-{size}")
+    return resp.make_conditional(request)
+
+def _send_hot(rec: File):
+    """Serve a published file's current content from the hot cache (None → not cached)."""
+    cache = hot_cache.get_cache()
+    if cache is None:
+        return None
+    current = (db.session.query(FileVersion.sha256, FileVersion.size)
+               .filter_by(file_id=rec.id, version_number=rec.current_version).first())
+    if not current or not current.sha256:
+        return None
+    data = cache.get(current.sha256)
+    if data is None and cache.wants(current.sha256, current.size or 0):
+        try:
+            data = storage.read(rec.path)
+        except StorageError:
+            return None
+        if not cache.put(current.sha256, data, rec.id):
+            data = None
+    if data is None:
+        return None
+    resp = current_app.response_class(data, mimetype=rec.mimetype or 'application/octet-stream')
+    resp.set_etag(current.sha256)
+    return resp.make_conditional(request)
+
+@bp.route('/delete/<int:file_id>', methods=['DELETE'])
 @login_required
 def delete_file(file_id):
     rec = File.query.get_or_404(file_id)
@@ -221,19 +503,19 @@ def delete_file(file_id):
         print(f"Error deleting file {file_id}: {str(e)}")
         return {"error": "Failed to delete file"}, 500
 
-@app.route('/list-deleted-files', methods=['GET'])
+@bp.route('/list-deleted-files', methods=['GET'])
 @login_required
 def list_deleted_files():
     """
     List all files that have been deleted but still have version history.
     This helps users find files they might want to restore.
     """
-    # Find all version records that don't have an associated file
-    versions = db.session.query(FileVersion).outerjoin(File).filter(File.id == None).all()
-    
-    # Filter versions to only include those belonging to current user
-    user_username = current_user.username
-    user_versions = [v for v in versions if f"/{user_username}/" in v.path or v.path.startswith(f"{user_username}/")]
+    # Version records of the current user that no longer have an associated file
+    # (paths are <username>/… keys, so ownership is a prefix match done in SQL)
+    user_versions = (db.session.query(FileVersion).outerjoin(File)
+                     .filter(File.id == None,
+                             FileVersion.path.startswith(f"{current_user.username}/", autoescape=True))
+                     .all())
     
     # Group versions by file_id to get the latest version for each deleted file
     deleted_files = {}
@@ -244,13 +526,13 @@ def list_deleted_files():
                 'version_number': version.version_number,
                 'filename': os.path.basename(version.path).split('_', 1)[1],  # Remove version prefix
                 'last_modified': version.uploaded_at.isoformat(),
-                'size': os.path.getsize(version.path) if os.path.exists(version.path) else 0,
+                'size': version.size if version.size is not None else storage.size(version.path),
                 'comment': version.comment
             }
     
     return jsonify(list(deleted_files.values()))
 
-@app.route('/permanently-delete/<int:file_id>', methods=['DELETE'])
+@bp.route('/permanently-delete/<int:file_id>', methods=['DELETE'])
 @login_required
 def permanently_delete_file(file_id):
     """
@@ -267,11 +549,7 @@ def permanently_delete_file(file_id):
     # Delete all versions
     versions = FileVersion.query.filter_by(file_id=file_id).all()
     for version in versions:
-        try:
-            if os.path.exists(version.path):
-                os.remove(version.path)
-        except FileNotFoundError:
-            pass
+        storage.delete(version.path)
         db.session.delete(version)
     
     db.session.commit()
@@ -281,7 +559,7 @@ def permanently_delete_file(file_id):
     }, 200
 
 # ────────────── Folder tree (GET) ────────────────────────────────────────
-@app.route('/folders', methods=['GET'])
+@bp.route('/folders', methods=['GET'])
 @login_required
 def get_folders():
     def ser(folder: Folder):
@@ -295,6 +573,7 @@ def get_folders():
                     "uploaded_at": f.uploaded_at.isoformat(),
                     "is_under_review": f.is_under_review,
                     "is_published": f.is_published,
+                    "current_version": f.current_version,
                     "active_review": {
                         "id": f.get_active_review().id,
                         "reviewer": f.get_active_review().reviewer.username,
@@ -329,8 +608,104 @@ def get_folders():
         "flat": flat_folders
     })
 
+def _ser_folder(folder: Folder, rollup: FolderRollup | None) -> dict:
+    modified = (rollup.last_modified if rollup else None) or folder.created_at
+    return {
+        "id": folder.id, "name": folder.name,
+        "parent_id": folder.parent_id,
+        "subfolders": rollup.subfolders if rollup else 0,
+        "files": rollup.files if rollup else 0,
+        "bytes": rollup.bytes if rollup else 0,
+        "last_modified": modified.isoformat() if modified else None,
+    }
+
+@bp.route('/folders/root/children', methods=['GET'])
+@bp.route('/folders/<int:fid>/children', methods=['GET'])
+@login_required
+def list_folder_children(fid=None):
+    """
+    One level of the folder tree: subfolders by name, then files by name,
+    keyset-paginated with ``?limit=`` and the X-Next-Cursor header.
+    Each subfolder carries its aggregates from folder_rollup, so a page costs
+    the same however large the tree below it is.
+    """
+    folder = db.session.get(Folder, fid) if fid is not None else \
+             Folder.query.filter_by(owner_id=current_user.id, parent_id=None).first()
+    if folder is None:
+        return {"error": "Folder not found"}, 404
+    if folder.owner_id != current_user.id:
+        return {"error": "Access denied"}, 403
+    try:
+        cursor = decode_cursor(request.args.get('cursor'))
+        phase, after = 0, None
+        if cursor:
+            phase, name = cursor_int(cursor, 'p'), cursor.get('n')
+            if phase > 1 or not isinstance(name, str):
+                raise BadCursor("cursor needs phase 0 or 1 and a string name")
+            after = (name, cursor_int(cursor, 'id'))
+    except BadCursor:
+        return {"error": "Invalid cursor"}, 400
+
+    limit = page_limit()
+    subfolders, files = [], []
+    if phase == 0:
+        q = (db.session.query(Folder, FolderRollup)
+             .outerjoin(FolderRollup, FolderRollup.folder_id == Folder.id)
+             .filter(Folder.parent_id == folder.id, Folder.owner_id == current_user.id))
+        if after:
+            q = q.filter(after_asc(Folder.name, Folder.id, *after))
+        subfolders = q.order_by(Folder.name, Folder.id).limit(limit + 1).all()
+        after = None
+    if len(subfolders) <= limit:
+        q = File.query.filter(File.folder_id == folder.id, File.owner_id == current_user.id)
+        if after:
+            q = q.filter(after_asc(File.filename, File.id, *after))
+        files = q.order_by(File.filename, File.id).limit(limit + 1 - len(subfolders)).all()
+
+    next_cursor = None
+    if len(subfolders) + len(files) > limit:
+        if files:
+            files = files[:limit - len(subfolders)]
+        else:
+            subfolders = subfolders[:limit]
+        last = files[-1] if files else subfolders[-1][0]
+        next_cursor = encode_cursor({"p": 1, "n": last.filename, "id": last.id} if files else
+                                    {"p": 0, "n": last.name, "id": last.id})
+
+    # one query each for the page's sizes and pending reviews instead of one per file
+    ids = [f.id for f in files]
+    sizes = dict(db.session.query(FileVersion.file_id, FileVersion.size)
+                 .join(File, (File.id == FileVersion.file_id)
+                       & (File.current_version == FileVersion.version_number))
+                 .filter(File.id.in_(ids))) if ids else {}
+    reviews = {r.file_id: r for r in (DocumentReview.query
+                                      .options(joinedload(DocumentReview.reviewer))
+                                      .filter(DocumentReview.file_id.in_(ids),
+                                              DocumentReview.status == 'pending'))} if ids else {}
+    resp = jsonify({
+        "folder": _ser_folder(folder, db.session.get(FolderRollup, folder.id)),
+        "folders": [_ser_folder(f, rollup) for f, rollup in subfolders],
+        "files": [{
+            "id": f.id, "name": f.filename,
+            "mimetype": f.mimetype,
+            "size": sizes.get(f.id),
+            "uploaded_at": f.uploaded_at.isoformat(),
+            "is_under_review": f.is_under_review,
+            "is_published": f.is_published,
+            "current_version": f.current_version,
+            "active_review": {
+                "id": reviews[f.id].id,
+                "reviewer": reviews[f.id].reviewer.username,
+                "requested_at": reviews[f.id].requested_at.isoformat()
+            } if f.id in reviews else None
+        } for f in files],
+    })
+    if next_cursor:
+        resp.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return resp
+
 # ────────────── Get Public Files ────────────────────────────────────────
-@app.route('/public-files', methods=['GET'])
+@bp.route('/public-files', methods=['GET'])
 @login_required
 def get_all_public_files():
     all_publics = File.query.filter_by(is_published=True).all()
@@ -358,7 +733,7 @@ def get_all_public_files():
     })
 
 # ────────────── Create / Delete folder ───────────────────────────────────
-@app.route('/folders', methods=['POST'])
+@bp.route('/folders', methods=['POST'])
 @login_required
 def create_folder():
     data      = request.json or {}
@@ -366,6 +741,8 @@ def create_folder():
     parent_id = data.get('parent_id')
     if not name:
         return {"error": "Folder name required"}, 400
+    if layout.reserved_name(name):
+        return {"error": "Invalid folder name"}, 400
 
     parent = Folder.query.get(parent_id) if parent_id else \
              Folder.query.filter_by(owner_id=current_user.id,
@@ -380,7 +757,7 @@ def create_folder():
     # Create folder in the correct parent directory
     parent_disk_path = folder_disk_path(parent, current_user.username)
     disk_dir = os.path.join(parent_disk_path, name)
-    os.makedirs(disk_dir, exist_ok=True)
+    storage.ensure_dir(disk_dir)
 
     new = Folder(name=name, owner_id=current_user.id,
                  parent_id=parent.id if parent else None)
@@ -388,7 +765,7 @@ def create_folder():
     db.session.commit()
     return {"message": "Folder created", "folder_id": new.id}, 201
 
-@app.route('/folders/<int:fid>', methods=['DELETE'])
+@bp.route('/folders/<int:fid>', methods=['DELETE'])
 @login_required
 def delete_folder(fid):
     fld = Folder.query.get_or_404(fid)
@@ -399,8 +776,115 @@ def delete_folder(fid):
     db.session.delete(fld); db.session.commit()
     return {"message": "Folder deleted"}
 
+# ────────────── Rename / move folder ─────────────────────────────────────
+def _ancestor_ids(folder: Folder) -> list[int]:
+    """Ids from *folder*'s parent up to the root; its length is the folder's depth."""
+    ids, current = [], folder
+    while current is not None and current.parent_id is not None \
+            and len(ids) <= current_app.config['FOLDER_DEPTH_LIMIT']:
+        ids.append(current.parent_id)
+        current = db.session.get(Folder, current.parent_id)
+    return ids
+
+def _subtree_height(folder: Folder) -> int:
+    """Levels of subfolders below *folder*: one query per level."""
+    height, level = 0, [folder.id]
+    while height <= current_app.config['FOLDER_DEPTH_LIMIT']:
+        level = [fid for (fid,) in db.session.query(Folder.id).filter(Folder.parent_id.in_(level))]
+        if not level:
+            break
+        height += 1
+    return height
+
+def _relocate_folder(folder: Folder, parent: Folder, name: str):
+    """
+    Give *folder* a new *parent* and/or *name*: one directory rename in storage
+    and one UPDATE rewriting the path prefix of every file below it, so the
+    cost does not grow with the number of files in the subtree.
+    """
+    limit = current_app.config['FOLDER_DEPTH_LIMIT']
+    ancestors = _ancestor_ids(parent)
+    if parent.id == folder.id or folder.id in ancestors:
+        return {"error": "Cannot move a folder into itself or one of its subfolders"}, 400
+    if len(ancestors) + 1 + _subtree_height(folder) > limit:
+        return {"error": f"Folders cannot be nested more than {limit} levels deep"}, 400
+    if Folder.query.filter(Folder.owner_id == current_user.id, Folder.parent_id == parent.id,
+                           Folder.name == name, Folder.id != folder.id).first():
+        return {"error": f"A folder named '{name}' already exists in the destination folder"}, 400
+
+    old_dir = folder_disk_path(folder, current_user.username)
+    new_dir = os.path.join(folder_disk_path(parent, current_user.username), name)
+    try:
+        storage.move_dir(old_dir, new_dir)
+    except StorageError as e:
+        return {"error": f"Failed to move folder: {str(e)}"}, 409
+    except OSError as e:
+        return {"error": f"Failed to move folder: {str(e)}"}, 500
+
+    old_prefix, new_prefix = old_dir + '/', new_dir + '/'
+    try:
+        moved = db.session.execute(
+            db.update(File)
+            .where(File.owner_id == current_user.id,
+                   db.func.substr(File.path, 1, len(old_prefix)) == old_prefix)
+            .values(path=db.literal(new_prefix) + db.func.substr(File.path, len(old_prefix) + 1))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        folder.name, folder.parent_id = name, parent.id
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        storage.move_dir(new_dir, old_dir)
+        raise
+    return {"message": "Folder moved successfully", "folder_id": folder.id,
+            "name": name, "parent_id": parent.id, "files_moved": moved}, 200
+
+@bp.route('/rename-folder/<int:fid>', methods=['POST'])
+@login_required
+def rename_folder(fid):
+    """JSON body: ``{"new_name": "reports"}``"""
+    fld = Folder.query.get_or_404(fid)
+    if fld.owner_id != current_user.id:
+        return {"error": "Access denied"}, 403
+    if fld.parent_id is None:
+        return {"error": "Cannot rename root folder"}, 400
+    new_name = ((request.json or {}).get('new_name') or '').strip()
+    if layout.reserved_name(new_name):
+        return {"error": "Invalid folder name"}, 400
+    if new_name == fld.name:
+        return {"message": "Folder name is the same, no changes made"}, 200
+    return _relocate_folder(fld, fld.parent, new_name)
+
+@bp.route('/move-folder', methods=['POST'])
+@login_required
+def move_folder():
+    """
+    JSON body:
+      { "folder_id": 12, "target_folder_id": 7 }
+    Note: target_folder_id can be null for moving to root folder
+    """
+    data = request.json or {}
+    fld = Folder.query.get_or_404(data.get('folder_id'))
+    if fld.owner_id != current_user.id:
+        return {"error": "Access denied to folder"}, 403
+    if fld.parent_id is None:
+        return {"error": "Cannot move root folder"}, 400
+
+    target_id = data.get('target_folder_id')
+    if target_id is None:
+        target = Folder.query.filter_by(owner_id=current_user.id, parent_id=None).first()
+        if not target:
+            return {"error": "Root folder not found"}, 404
+    else:
+        target = Folder.query.get_or_404(target_id)
+        if target.owner_id != current_user.id:
+            return {"error": "Access denied to target folder"}, 403
+    if fld.parent_id == target.id:
+        return {"error": "Folder is already in the target folder"}, 400
+    return _relocate_folder(fld, target, fld.name)
+
 # ────────────── Move file ────────────────────────────────────────────────
-@app.route('/move-file', methods=['POST'])
+@bp.route('/move-file', methods=['POST'])
 @login_required
 def move_file():
     """
@@ -435,20 +919,16 @@ def move_file():
 
     # ── new disk location ------------------------------------
     dest_dir = folder_disk_path(target, current_user.username)
-    os.makedirs(dest_dir, exist_ok=True)
 
     new_path = os.path.join(dest_dir, rec.filename)
     
     # Check if a file with the same name already exists in destination
-    if os.path.exists(new_path) and new_path != rec.path:
+    if storage.exists(new_path) and new_path != rec.path:
         return {"error": f"A file named '{rec.filename}' already exists in the destination folder"}, 400
     
     try:
-        # Use shutil.move instead of os.rename for better cross-device support
-        # and handling of moves between different directory levels
-        import shutil
-        shutil.move(rec.path, new_path)
-    except OSError as e:
+        storage.move(rec.path, new_path)
+    except (OSError, StorageError) as e:
         return {"error": f"Failed to move file: {str(e)}"}, 500
     except Exception as e:
         return {"error": f"Unexpected error while moving file: {str(e)}"}, 500
@@ -461,7 +941,7 @@ def move_file():
     return {"message": "File moved successfully"}, 200
 
 # ────────────── Text File Edit (New Endpoints) ───────────────────────────
-@app.route('/file-content/<int:file_id>', methods=['GET'])
+@bp.route('/file-content/<int:file_id>', methods=['GET'])
 @login_required
 def get_file_content(file_id):
     file = File.query.get_or_404(file_id)
@@ -470,17 +950,20 @@ def get_file_content(file_id):
 
     # Basic check for text files, can be expanded (e.g., check file.mimetype)
     if not file.filename.lower().endswith(('.txt', '.md', '.py', '.js', '.json', '.yaml', '.yml', '.html', '.css')):
+        if extract.supported(file.filename):
+            version = FileVersion.query.filter_by(file_id=file.id, version_number=file.current_version).first_or_404()
+            return _extracted_content(file, version, read_only=True)
         return {"error": "File is not a supported editable text file type"}, 400
 
     try:
         # Ensure the path stored in db is the actual current path
         # (especially if versioning updates file.path)
         actual_path = file.path 
-        if not os.path.exists(actual_path):
+        if not storage.exists(actual_path):
              # Fallback to version path if main path deleted or points to a version in .version
             if file.current_version:
                 latest_version = FileVersion.query.filter_by(file_id=file.id, version_number=file.current_version).first()
-                if latest_version and os.path.exists(latest_version.path):
+                if latest_version and storage.exists(latest_version.path):
                     actual_path = latest_version.path
                 else:
                     return {"error": "File content not found on disk"}, 404
@@ -488,13 +971,12 @@ def get_file_content(file_id):
                 return {"error": "File content not found on disk"}, 404
 
 
-        with open(actual_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        content = storage.read_text(actual_path)
         return jsonify({"content": content, "filename": file.filename, "mimetype": file.mimetype})
     except Exception as e:
         return {"error": f"Error reading file: {str(e)}"}, 500
 
-@app.route('/file-content/<int:file_id>', methods=['POST'])
+@bp.route('/file-content/<int:file_id>', methods=['POST'])
 @login_required
 def save_file_content(file_id):
     file = File.query.get_or_404(file_id)
@@ -512,25 +994,26 @@ def save_file_content(file_id):
 
     try:
         username = User.query.get(file.owner_id).username
-        version_dir = get_version_dir(username)
-        os.makedirs(version_dir, exist_ok=True)
         
         next_version_number = get_next_version_number(file_id)
         
         base_name = os.path.splitext(file.filename)[0]
         ext = os.path.splitext(file.filename)[1]
         # Path for the new version's content file in the .version directory
-        new_version_content_path = os.path.join(version_dir, f"{base_name}_v{next_version_number}{ext}")
+        new_version_content_path = get_version_path(username, f"{base_name}_v{next_version_number}{ext}")
 
         # 1. Save the new content to its dedicated version file
-        with open(new_version_content_path, 'w', encoding='utf-8') as f_version:
-            f_version.write(new_content)
+        blob = new_content.encode('utf-8')
+        with domain_metrics.disk_write('save_file_content'):
+            size = storage.put(new_version_content_path, blob)
 
         # 2. Create the FileVersion record pointing to this new version file
         version_record = FileVersion(
             file_id=file_id,
             version_number=next_version_number,
             path=new_version_content_path,
+            size=size,
+            sha256=hashlib.sha256(blob).hexdigest(),
             comment=f"Version {next_version_number}"
         )
         db.session.add(version_record)
@@ -540,9 +1023,8 @@ def save_file_content(file_id):
         # The actual live file path might be different from version files if desired, 
         # but for simplicity here, we can copy from the version file.
         live_file_path = file.path
-        os.makedirs(os.path.dirname(live_file_path), exist_ok=True)
-        import shutil
-        shutil.copy2(new_version_content_path, live_file_path)
+        with domain_metrics.disk_write('save_file_content'):
+            storage.copy(new_version_content_path, live_file_path, immutable=True)
         
         # 4. Update file record metadata
         file.current_version = next_version_number
@@ -551,6 +1033,7 @@ def save_file_content(file_id):
         file.is_published = False  # Reset publish status on edit
         
         db.session.commit()
+        domain_metrics.record_upload('save_file_content', size)
         
         current_app.logger.info(f"File {file_id} saved. New version {next_version_number} created at {new_version_content_path}. Live file {live_file_path} updated.")
         return {"message": "File saved successfully", "version": next_version_number}
@@ -560,7 +1043,7 @@ def save_file_content(file_id):
         return {"error": f"Error saving file: {str(e)}"}, 500
 
 # ────────────── Rename File ──────────────────────────────────────────────
-@app.route('/rename-file/<int:file_id>', methods=['POST'])
+@bp.route('/rename-file/<int:file_id>', methods=['POST'])
 @login_required
 def rename_file(file_id):
     file_to_rename = File.query.get_or_404(file_id)
@@ -584,12 +1067,12 @@ def rename_file(file_id):
     current_dir = os.path.dirname(file_to_rename.path)
     new_path = os.path.join(current_dir, new_filename)
 
-    if os.path.exists(new_path):
+    if storage.exists(new_path):
         return {"error": f"A file named '{new_filename}' already exists in this folder"}, 400
 
     try:
         # Rename on disk
-        os.rename(file_to_rename.path, new_path)
+        storage.move(file_to_rename.path, new_path)
 
         # Update database
         file_to_rename.filename = new_filename
@@ -606,17 +1089,20 @@ def rename_file(file_id):
         db.session.rollback()
         # Attempt to rollback rename if DB fails? Complex. For now, log and error.
         current_app.logger.error(f"Error renaming file {file_id}: {str(e)}")
-        # If os.rename succeeded but DB failed, we have a discrepancy.
+        # If the storage move succeeded but DB failed, we have a discrepancy.
         # A more robust solution might try to rename back or use a two-phase commit pattern.
         return {"error": f"Failed to rename file: {str(e)}"}, 500
 
 # ────────────── Auth & password flows (unchanged) ───────────────────────
-@app.route('/register', methods=['POST'])
+@bp.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
     if not data or not data.get('username') or not data.get('password') or not data.get('email'):
         return jsonify({"message": "Username, email, and password are required"}), 400
 
+    if layout.reserved_username(data['username'], current_app.config['UPLOAD_FOLDER']):
+        return jsonify({"message": "Username is reserved"}), 400
+
     if User.query.filter_by(username=data['username']).first() or \
        User.query.filter_by(email=data['email']).first():
         return jsonify({"message": "User already exists"}), 400
@@ -629,12 +1115,11 @@ def register():
     # create root folder + disk dir
     root = Folder(name='Root folder', owner_id=user.id, parent_id=None)
     db.session.add(root); db.session.commit()
-    os.makedirs(os.path.join(Config.UPLOAD_FOLDER, user.username),
-                exist_ok=True)
+    storage.ensure_dir(user.username)
 
     return {"message": "Registered successfully."}
 
-@app.route('/session-status', methods=['GET'])
+@bp.route('/session-status', methods=['GET'])
 def session_status():
     """Get current session status and user info"""
     if current_user.is_authenticated:
@@ -650,7 +1135,7 @@ def session_status():
     else:
         return jsonify({"authenticated": False, "user": None})
 
-@app.route('/login', methods=['POST'])
+@bp.route('/login', methods=['POST'])
 def login():
     data = request.json or {}
     username = data.get('username')
@@ -677,13 +1162,13 @@ def login():
         })
     return {"error": "Invalid credentials"}, 401
 
-@app.route('/logout', methods=['POST'])
+@bp.route('/logout', methods=['POST'])
 @login_required
 def logout():
     logout_user()
     return {"message": "Logged out"}
 
-@app.route('/request-reset', methods=['POST'])
+@bp.route('/request-reset', methods=['POST'])
 def request_reset():
     email = request.json.get('email', '')
     user  = User.query.filter_by(email=email).first()
@@ -692,7 +1177,7 @@ def request_reset():
         print("🔒 reset link:", f"{request.host_url}reset-password/{tok}")
     return {"message": "If that e-mail exists, a reset link was sent"}
 
-@app.route('/reset-password/<token>', methods=['POST'])
+@bp.route('/reset-password/<token>', methods=['POST'])
 def reset_password(token):
     user = verify_reset_token(token)
     if not user:
@@ -701,9 +1186,10 @@ def reset_password(token):
     if len(new_pwd) < 6:
         return {"error": "Password too short"}, 400
     user.set_password(new_pwd); db.session.commit()
+    sessions.revoke_user_sessions(user.id)
     return {"message": "Password updated"}
 
-@app.route('/change-password', methods=['POST'])
+@bp.route('/change-password', methods=['POST'])
 @login_required
 def change_password():
     data = request.json or {}
@@ -711,9 +1197,11 @@ def change_password():
     if not current_user.check_password(cur):
         return {"error":"Current password is wrong"}, 400
     current_user.set_password(new); db.session.commit()
+    # everywhere else this account is signed in gets logged out
+    sessions.revoke_user_sessions(current_user.id, keep=getattr(session, 'sid', None))
     return {"message":"Password updated"}
 
-@app.route('/user-info', methods=['GET'])
+@bp.route('/user-info', methods=['GET'])
 @login_required
 def get_user_info():
     """Get current user's profile information"""
@@ -727,7 +1215,7 @@ def get_user_info():
     })
 
 # ────────────── Review System ─────────────────────────────────────────────
-@app.route('/users', methods=['GET'])
+@bp.route('/users', methods=['GET'])
 @login_required
 def get_users():
     """Get list of all users for reviewer assignment"""
@@ -738,7 +1226,7 @@ def get_users():
         "email": user.email
     } for user in users])
 
-@app.route('/request-review/<int:file_id>', methods=['POST'])
+@bp.route('/request-review/<int:file_id>', methods=['POST'])
 @login_required
 def request_review(file_id):
     """Request a review for a document"""
@@ -814,17 +1302,63 @@ def request_review(file_id):
         db.session.rollback()
         return {"error": f"Error creating review request: {str(e)}"}, 500
 
-@app.route('/my-reviews', methods=['GET'])
-@login_required
-def get_my_reviews():
-    """Get reviews assigned to current user"""
-    reviews = DocumentReview.query.filter_by(reviewer_id=current_user.id).order_by(DocumentReview.requested_at.desc()).all()
-    
-    return jsonify([{
+REVIEW_STATUSES = ('pending', 'approved', 'rejected', 'cancelled')
+
+def _review_page(role: str):
+    """
+    One cursor page of the current user's reviews, pending first.
+
+    *role* is 'reviewer' (reviews assigned to me) or 'requester' (reviews I
+    asked for).  ?status=a,b restricts to those statuses; otherwise pending
+    reviews are listed first, then everything else, each newest first.
+    Returns (rows, next_cursor) or raises BadCursor / ValueError.
+    """
+    if role == 'reviewer':
+        owner_col, other_party = DocumentReview.reviewer_id, DocumentReview.requester
+    else:
+        owner_col, other_party = DocumentReview.requester_id, DocumentReview.reviewer
+
+    status_arg = request.args.get('status')
+    if status_arg:
+        statuses = [s for s in status_arg.split(',') if s]
+        if not statuses or any(s not in REVIEW_STATUSES for s in statuses):
+            raise ValueError(f"status must be one of {', '.join(REVIEW_STATUSES)}")
+        phases = [statuses]
+    else:
+        phases = [['pending'], [s for s in REVIEW_STATUSES if s != 'pending']]
+
+    limit  = page_limit()
+    cursor = decode_cursor(request.args.get('cursor'))
+    phase  = cursor_int(cursor, 'p') if cursor else 0
+    rows   = []
+    sort_time = stored_time(DocumentReview.requested_at)
+    while phase < len(phases) and len(rows) <= limit:
+        q = (db.session.query(DocumentReview, sort_time)
+             .options(joinedload(DocumentReview.file), joinedload(other_party))
+             .filter(owner_col == current_user.id,
+                     DocumentReview.status.in_(phases[phase])))
+        if cursor and cursor_int(cursor, 'p') == phase:
+            q = q.filter(after_desc(DocumentReview.requested_at, DocumentReview.id,
+                                    cursor.get('t'), cursor_int(cursor, 'id')))
+        batch = (q.order_by(DocumentReview.requested_at.desc(), DocumentReview.id.desc())
+                  .limit(limit + 1 - len(rows)).all())
+        rows.extend((phase, r, t) for r, t in batch)
+        phase += 1
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_phase, last, last_time = rows[-1]
+        next_cursor = encode_cursor({"p": last_phase, "t": last_time, "id": last.id})
+    return [r for _, r, _ in rows], next_cursor
+
+def _ser_review(review: DocumentReview) -> dict:
+    return {
         "id": review.id,
         "file_id": review.file_id,
         "filename": review.file.filename,
         "requester": review.requester.username,
+        "reviewer": review.reviewer.username,
         "status": review.status,
         "requested_at": review.requested_at.isoformat(),
         "reviewed_at": review.reviewed_at.isoformat() if review.reviewed_at else None,
@@ -832,9 +1366,36 @@ def get_my_reviews():
         "original_version": review.original_version,
         "modified_version": review.modified_version,
         "has_comparison": review.original_version is not None and review.modified_version is not None
-    } for review in reviews])
+    }
+
+def _review_page_response(role: str):
+    try:
+        reviews, next_cursor = _review_page(role)
+    except BadCursor:
+        return {"error": "Invalid cursor"}, 400
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    resp = jsonify([_ser_review(r) for r in reviews])
+    if next_cursor:
+        resp.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return resp
+
+@bp.route('/my-reviews', methods=['GET'])
+@login_required
+def get_my_reviews():
+    """
+    Get reviews assigned to current user, pending first.
+    Query: ?status=pending,approved  ?limit=50  ?cursor=<X-Next-Cursor of previous page>
+    """
+    return _review_page_response('reviewer')
+
+@bp.route('/my-requests', methods=['GET'])
+@login_required
+def get_my_requests():
+    """Get reviews the current user requested; same paging/filters as /my-reviews."""
+    return _review_page_response('requester')
 
-@app.route('/review/<int:review_id>', methods=['POST'])
+@bp.route('/review/<int:review_id>', methods=['POST'])
 @login_required
 def submit_review(review_id):
     """Submit a review decision"""
@@ -879,7 +1440,7 @@ def submit_review(review_id):
         db.session.rollback()
         return {"error": f"Error submitting review: {str(e)}"}, 500
 
-@app.route('/cancel-review/<int:file_id>', methods=['POST'])
+@bp.route('/cancel-review/<int:file_id>', methods=['POST'])
 @login_required
 def cancel_review(file_id):
     """Cancel a pending review request"""
@@ -916,7 +1477,7 @@ def cancel_review(file_id):
         db.session.rollback()
         return {"error": f"Error cancelling review: {str(e)}"}, 500
 
-@app.route('/notifications', methods=['GET'])
+@bp.route('/notifications', methods=['GET'])
 @login_required
 def get_notifications():
     """Get user's notifications"""
@@ -933,7 +1494,7 @@ def get_notifications():
         "related_review_id": notif.related_review_id
     } for notif in notifications])
 
-@app.route('/notifications/<int:notif_id>/read', methods=['POST'])
+@bp.route('/notifications/<int:notif_id>/read', methods=['POST'])
 @login_required
 def mark_notification_read(notif_id):
     """Mark a notification as read"""
@@ -946,7 +1507,7 @@ def mark_notification_read(notif_id):
     
     return {"message": "Notification marked as read"}, 200
 
-@app.route('/notifications/mark-all-read', methods=['POST'])
+@bp.route('/notifications/mark-all-read', methods=['POST'])
 @login_required
 def mark_all_notifications_read():
     """Mark all notifications as read"""
@@ -956,11 +1517,11 @@ def mark_all_notifications_read():
     return {"message": "All notifications marked as read"}, 200
 
 # ────────────── Error: file too large ────────────────────────────────────
-@app.errorhandler(RequestEntityTooLarge)
+@bp.app_errorhandler(RequestEntityTooLarge)
 def too_large(_): return {"error":"File exceeds limit"}, 413
 
 # ────────────── Version Control ─────────────────────────────────────────
-@app.route('/upload-version/<int:file_id>', methods=['POST'])
+@bp.route('/upload-version/<int:file_id>', methods=['POST'])
 @login_required
 def upload_version(file_id):
     f = request.files.get('file')
@@ -973,36 +1534,16 @@ def upload_version(file_id):
     if file.owner_id != current_user.id and not current_user.is_admin:
         return {"error": "Access denied"}, 403
 
-    # Create new version
-    # Get the next version number by checking the highest existing version
-    new_version_number = get_next_version_number(file_id)
-    version_dir = get_version_dir(current_user.username)
-    os.makedirs(version_dir, exist_ok=True)
-    version_path = os.path.join(version_dir, f"{file_id}_v{new_version_number}_{secure_filename(f.filename)}")
-    f.save(version_path)
-
-    # Create version record
-    version = FileVersion(
-        file_id=file.id,
-        version_number=new_version_number,
-        path=version_path,
-        comment=comment
-    )
-    
-    # Update file's current version
-    file.current_version = new_version_number
-    file.path = version_path  # Update current file path to latest version
-    
-    db.session.add(version)
-    db.session.commit()
+    version = _add_version(file, f.filename, comment, _stream_into_storage(f.stream), 'upload_version')
+    domain_metrics.record_upload('upload_version', version.size)
     
     return {
         "message": "New version uploaded successfully",
-        "version_number": new_version_number,
+        "version_number": version.version_number,
         "version_id": version.id
     }, 201
 
-@app.route('/file-versions/<int:file_id>', methods=['GET'])
+@bp.route('/file-versions/<int:file_id>', methods=['GET'])
 @login_required
 def get_file_versions(file_id):
     file = File.query.get_or_404(file_id)
@@ -1015,10 +1556,10 @@ def get_file_versions(file_id):
         "uploaded_at": v.uploaded_at.isoformat(),
         "comment": v.comment,
         "is_current": v.version_number == file.current_version,
-        "size": os.path.getsize(v.path) if os.path.exists(v.path) else 0
+        "size": v.size if v.size is not None else storage.size(v.path)
     } for v in versions])
 
-@app.route('/restore-version/<int:file_id>/<int:version_number>', methods=['POST'])
+@bp.route('/restore-version/<int:file_id>/<int:version_number>', methods=['POST'])
 @login_required
 def restore_version(file_id, version_number):
     if not current_user.is_admin:
@@ -1041,19 +1582,18 @@ def restore_version(file_id, version_number):
         return {"error": "File owner not found, cannot restore version"}, 500
     owner_username = file_owner.username
     
-    version_dir = get_version_dir(owner_username) # Use owner's username
-    os.makedirs(version_dir, exist_ok=True)
-    new_version_path = os.path.join(version_dir, f"{file_id}_v{new_version_number}_{secure_filename(file.filename)}")
+    new_version_path = get_version_path(owner_username, f"{file_id}_v{new_version_number}_{secure_filename(file.filename)}") # Use owner's username
     
     # Copy the restored version to new version
-    import shutil
-    shutil.copy2(version.path, new_version_path)
+    storage.copy(version.path, new_version_path, immutable=True)
     
     # Create new version record
     new_version = FileVersion(
         file_id=file.id,
         version_number=new_version_number,
         path=new_version_path,
+        size=storage.size(new_version_path),
+        sha256=version.sha256,
         comment=f"Restored from version {version_number} by admin {current_user.username}" # Added admin info to comment
     )
     
@@ -1065,7 +1605,7 @@ def restore_version(file_id, version_number):
     # For simplicity, we assume file.path points to the location of the live current version.
     # We need to copy the content of new_version_path to file.path
     if file.path != new_version_path: # Avoid copying if paths are already the same (e.g. if File.path was updated by upload_version)
-        shutil.copy2(new_version_path, file.path)
+        storage.copy(new_version_path, file.path, immutable=True)
     
     db.session.add(new_version)
     db.session.commit()
@@ -1076,7 +1616,7 @@ def restore_version(file_id, version_number):
         "new_version_number": new_version_number
     }
 
-@app.route('/download-version/<int:file_id>/<int:version_number>')
+@bp.route('/download-version/<int:file_id>/<int:version_number>')
 @login_required
 def download_version(file_id, version_number):
     file = File.query.get_or_404(file_id)
@@ -1085,17 +1625,16 @@ def download_version(file_id, version_number):
 
     version = FileVersion.query.filter_by(file_id=file_id, version_number=version_number).first_or_404()
     
-    if not os.path.exists(version.path):
+    if not storage.exists(version.path):
         return {"error": "Version file not found"}, 404
         
-    return send_from_directory(
-        os.path.dirname(version.path),
-        os.path.basename(version.path),
+    return storage.send(
+        version.path,
         as_attachment=True,
         download_name=f"{os.path.splitext(file.filename)[0]}_v{version_number}{os.path.splitext(file.filename)[1]}"
     )
 
-@app.route('/version-content/<int:file_id>/<int:version_number>', methods=['GET'])
+@bp.route('/version-content/<int:file_id>/<int:version_number>', methods=['GET'])
 @login_required
 def get_version_content(file_id, version_number):
     """Get content of a specific version for preview purposes"""
@@ -1105,16 +1644,19 @@ def get_version_content(file_id, version_number):
 
     version = FileVersion.query.filter_by(file_id=file_id, version_number=version_number).first_or_404()
     
-    if not os.path.exists(version.path):
+    if not storage.exists(version.path):
         return {"error": "Version file not found"}, 404
 
     # Check if it's a text file that can be previewed
     if not file.filename.lower().endswith(('.txt', '.md', '.py', '.js', '.json', '.yaml', '.yml', '.html', '.css')):
+        if extract.supported(file.filename):
+            return _extracted_content(file, version, version_number=version_number,
+                                      comment=version.comment,
+                                      uploaded_at=version.uploaded_at.isoformat())
         return {"error": "File type not supported for content preview"}, 400
 
     try:
-        with open(version.path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        content = storage.read_text(version.path)
         return jsonify({
             "content": content,
             "filename": file.filename,
@@ -1126,7 +1668,7 @@ def get_version_content(file_id, version_number):
     except Exception as e:
         return {"error": f"Error reading version content: {str(e)}"}, 500
 
-@app.route('/delete-version/<int:file_id>/<int:version_number>', methods=['DELETE'])
+@bp.route('/delete-version/<int:file_id>/<int:version_number>', methods=['DELETE'])
 @login_required
 def delete_version(file_id, version_number):
     if not current_user.is_admin:
@@ -1152,8 +1694,7 @@ def delete_version(file_id, version_number):
         db.session.commit() # Commit DB changes first
         
         # Then delete the file from disk
-        if os.path.exists(version_path):
-            os.remove(version_path)
+        storage.delete(version_path)
         
         current_app.logger.info(f"Admin {current_user.username} deleted V{version_number} of file {file.id} from path {version_path}")
         return {"message": f"Version {version_number} deleted successfully"}
@@ -1162,7 +1703,7 @@ def delete_version(file_id, version_number):
         current_app.logger.error(f"Admin {current_user.username} failed to delete V{version_number} of file {file.id}: {str(e)}", exc_info=True)
         return {"error": f"Failed to delete version: {str(e)}"}, 500
 
-@app.route('/restore-file/<int:file_id>', methods=['POST'])
+@bp.route('/restore-file/<int:file_id>', methods=['POST'])
 @login_required
 def restore_file(file_id):
     """
@@ -1181,7 +1722,7 @@ def restore_file(file_id):
 
     # Get the original file information from the latest version
     version_path = latest_version.path
-    if not os.path.exists(version_path):
+    if not storage.exists(version_path):
         return {"error": "Version file not found"}, 404
 
     # Create new file record
@@ -1203,7 +1744,7 @@ def restore_file(file_id):
         "version_number": latest_version.version_number
     }, 201
 
-@app.route('/cleanup-versions/<int:file_id>', methods=['POST'])
+@bp.route('/cleanup-versions/<int:file_id>', methods=['POST'])
 @login_required
 def cleanup_versions(file_id):
     """
@@ -1220,22 +1761,23 @@ def cleanup_versions(file_id):
     ).all()
 
     deleted_count = 0
+    freed_bytes = 0
     for version in old_versions:
-        try:
-            if os.path.exists(version.path):
-                os.remove(version.path)
-            db.session.delete(version)
-            deleted_count += 1
-        except FileNotFoundError:
-            pass
+        st = storage.stat(version.path)
+        if st:
+            freed_bytes += st.size
+            storage.delete(version.path)
+        db.session.delete(version)
+        deleted_count += 1
 
     db.session.commit()
+    domain_metrics.record_versions_deleted('cleanup_versions', deleted_count, freed_bytes)
     return {
         "message": f"Cleaned up {deleted_count} old versions",
         "current_version": file.current_version
     }
 
-@app.route('/restore-to-version/<int:file_id>/<int:version_number>', methods=['POST'])
+@bp.route('/restore-to-version/<int:file_id>/<int:version_number>', methods=['POST'])
 @login_required
 def restore_to_version(file_id, version_number):
     """
@@ -1252,7 +1794,7 @@ def restore_to_version(file_id, version_number):
     # Get the target version
     target_version = FileVersion.query.filter_by(file_id=file_id, version_number=version_number).first_or_404()
     
-    if not os.path.exists(target_version.path):
+    if not storage.exists(target_version.path):
         return {"error": "Version file not found"}, 404
 
     # No backup needed as this is an admin action, and it's a direct replacement.
@@ -1260,10 +1802,9 @@ def restore_to_version(file_id, version_number):
 
     # Replace current version content with target version content
     try:
-        import shutil
         # The file.path should point to the live content file.
         # We are overwriting the live content with the content of the target_version.
-        shutil.copy2(target_version.path, file.path) 
+        storage.copy(target_version.path, file.path, immutable=True)
         
         # Update file's current version number in the database
         file.current_version = version_number
@@ -1284,7 +1825,7 @@ def restore_to_version(file_id, version_number):
         current_app.logger.error(f"Admin {current_user.username} failed to restore file {file.id} to V{version_number}: {str(e)}", exc_info=True)
         return {"error": f"Failed to restore version: {str(e)}"}, 500
 
-@app.route('/compare-versions/<int:file_id>/<int:version1>/<int:version2>', methods=['GET'])
+@bp.route('/compare-versions/<int:file_id>/<int:version1>/<int:version2>', methods=['GET'])
 @login_required
 def compare_versions(file_id, version1, version2):
     """
@@ -1298,7 +1839,8 @@ def compare_versions(file_id, version1, version2):
     v1 = FileVersion.query.filter_by(file_id=file_id, version_number=version1).first_or_404()
     v2 = FileVersion.query.filter_by(file_id=file_id, version_number=version2).first_or_404()
 
-    if not os.path.exists(v1.path) or not os.path.exists(v2.path):
+    st1, st2 = storage.stat(v1.path), storage.stat(v2.path)
+    if not st1 or not st2:
         return {"error": "One or both version files not found"}, 404
 
     # Basic metadata comparison
@@ -1307,54 +1849,60 @@ def compare_versions(file_id, version1, version2):
             "number": v1.version_number,
             "uploaded_at": v1.uploaded_at.isoformat(),
             "comment": v1.comment,
-            "size": os.path.getsize(v1.path)
+            "size": st1.size
         },
         "version2": {
             "number": v2.version_number,
             "uploaded_at": v2.uploaded_at.isoformat(),
             "comment": v2.comment,
-            "size": os.path.getsize(v2.path)
+            "size": st2.size
         }
     }
 
-    # For text files, try to show content differences
+    # For text files, try to show content differences; other formats use their extracted text
+    content1 = content2 = None
     if file.mimetype and file.mimetype.startswith('text/'):
         try:
-            with open(v1.path, 'r') as f1, open(v2.path, 'r') as f2:
-                content1 = f1.read()
-                content2 = f2.read()
-                
-                # Simple line-by-line comparison
-                lines1 = content1.splitlines()
-                lines2 = content2.splitlines()
-                
-                comparison["text_differences"] = {
-                    "total_lines_v1": len(lines1),
-                    "total_lines_v2": len(lines2),
-                    "different_lines": []
-                }
-                
-                # Compare lines and collect differences
-                for i, (line1, line2) in enumerate(zip(lines1, lines2)):
-                    if line1 != line2:
-                        comparison["text_differences"]["different_lines"].append({
-                            "line_number": i + 1,
-                            "version1": line1,
-                            "version2": line2
-                        })
-                
-                # Handle different length files
-                if len(lines1) != len(lines2):
-                    comparison["text_differences"]["length_difference"] = {
-                        "v1_extra_lines": len(lines1) - len(lines2) if len(lines1) > len(lines2) else 0,
-                        "v2_extra_lines": len(lines2) - len(lines1) if len(lines2) > len(lines1) else 0
-                    }
+            content1 = storage.read_text(v1.path)
+            content2 = storage.read_text(v2.path)
         except Exception as e:
             comparison["text_comparison_error"] = str(e)
+    elif extract.supported(file.filename):
+        (s1, content1, _), (s2, content2, _) = (extract.lookup(v, file.filename) for v in (v1, v2))
+        if s1 != 'done' or s2 != 'done':
+            comparison["text_comparison_error"] = f"Extracted text not available yet ({s1}, {s2})"
+            content1 = content2 = None
+
+    if content1 is not None and content2 is not None:
+        # Simple line-by-line comparison
+        lines1 = content1.splitlines()
+        lines2 = content2.splitlines()
+        
+        comparison["text_differences"] = {
+            "total_lines_v1": len(lines1),
+            "total_lines_v2": len(lines2),
+            "different_lines": []
+        }
+        
+        # Compare lines and collect differences
+        for i, (line1, line2) in enumerate(zip(lines1, lines2)):
+            if line1 != line2:
+                comparison["text_differences"]["different_lines"].append({
+                    "line_number": i + 1,
+                    "version1": line1,
+                    "version2": line2
+                })
+        
+        # Handle different length files
+        if len(lines1) != len(lines2):
+            comparison["text_differences"]["length_difference"] = {
+                "v1_extra_lines": len(lines1) - len(lines2) if len(lines1) > len(lines2) else 0,
+                "v2_extra_lines": len(lines2) - len(lines1) if len(lines2) > len(lines1) else 0
+            }
 
     return jsonify(comparison)
 
-@app.route('/review-comparison/<int:review_id>', methods=['GET'])
+@bp.route('/review-comparison/<int:review_id>', methods=['GET'])
 @login_required
 def get_review_comparison(review_id):
     """Get comparison data for a review (original vs modified content)"""
@@ -1393,7 +1941,7 @@ def get_review_comparison(review_id):
         return {"error": f"Error loading comparison: {str(e)}"}, 500
 
 # ────────────── Admin Routes ─────────────────────────────────────
-@app.route('/admin/list-users', methods=['GET'])
+@bp.route('/admin/list-users', methods=['GET'])
 @login_required
 def admin_list_users():
     if not current_user.is_admin:
@@ -1407,7 +1955,82 @@ def admin_list_users():
         "created_at": user.created_at.isoformat() if user.created_at else None
     } for user in users])
 
-@app.route('/admin/user-files/<int:target_user_id>', methods=['GET'])
+@bp.route('/admin/retention-report', methods=['GET'])
+@login_required
+def admin_retention_report():
+    """Latest stored retention sweep report (written by the sweeper and `flask retention-sweep`)."""
+    if not current_user.is_admin:
+        return {"error": "Admin access required"}, 403
+    report = retention.latest_report()
+    if report is None:
+        return {"error": "No retention report yet; run `flask retention-sweep --dry-run`"}, 404
+    return jsonify(report.as_dict())
+
+@bp.route('/admin/stats/reviews', methods=['GET'])
+@login_required
+def admin_review_stats():
+    """Reviews per status and reviewer, with average turnaround (from the rollups in stats.py)."""
+    if not current_user.is_admin:
+        return {"error": "Admin access required"}, 403
+    return jsonify(stats.review_stats())
+
+@bp.route('/admin/stats/storage', methods=['GET'])
+@login_required
+def admin_storage_stats():
+    """Files, versions and stored bytes per user (from the rollups in stats.py)."""
+    if not current_user.is_admin:
+        return {"error": "Admin access required"}, 403
+    return jsonify(stats.storage_stats())
+
+@bp.route('/export', methods=['GET'])
+@login_required
+def export_snapshot():
+    """
+    Stream a snapshot archive (see backup.py) of the caller's workspace;
+    admins may pass ?scope=all for the whole tenant.  ?since=<snapshot id>
+    only includes versions newer than that snapshot.
+    """
+    since = request.args.get('since', 0, type=int)
+    if request.args.get('scope') == 'all':
+        if not current_user.is_admin:
+            return {"error": "Admin access required"}, 403
+        user = None
+    else:
+        user = current_user._get_current_object()
+    manifest = backup.build_manifest(user, since)
+    name = f"snapshot-{manifest['snapshot_id']}" + (f"-since-{since}" if since else "") + ".tar.gz"
+    resp = current_app.response_class(stream_with_context(backup.iter_archive(manifest, user)),
+                                      mimetype='application/gzip')
+    resp.headers['Content-Disposition'] = f'attachment; filename="{name}"'
+    resp.headers[backup.SNAPSHOT_HEADER] = str(manifest['snapshot_id'])
+    return resp
+
+@bp.route('/changes', methods=['GET'])
+@login_required
+def get_changes():
+    """
+    Incremental sync (see changes.py): without ?since= returns the current
+    cursor; with it, the caller's changes after that cursor, oldest first.
+    """
+    try:
+        return jsonify(changes.feed(current_user.id, request.args.get('since'), page_limit()))
+    except BadCursor:
+        return {"error": "Invalid cursor"}, 400
+    except changes.CursorExpired as e:
+        return {"error": str(e), "resync": True, "cursor": e.head}, 410
+
+@bp.route('/admin/revoke-sessions/<int:target_user_id>', methods=['POST'])
+@login_required
+def admin_revoke_sessions(target_user_id):
+    """Log a user out of every device (server-side SESSION_TYPE only)."""
+    if not current_user.is_admin:
+        return {"error": "Admin access required"}, 403
+    if not db.session.get(User, target_user_id):
+        return {"error": "Target user not found"}, 404
+    keep = getattr(session, 'sid', None) if target_user_id == current_user.id else None
+    return {"revoked": sessions.revoke_user_sessions(target_user_id, keep=keep)}
+
+@bp.route('/admin/user-files/<int:target_user_id>', methods=['GET'])
 @login_required
 def admin_get_user_files(target_user_id):
     if not current_user.is_admin:
@@ -1490,10 +2113,10 @@ def admin_get_user_files(target_user_id):
 #         print("ℹ️  Test user already exists")
 
 
-@app.route('/auth/google/login')
+@bp.route('/auth/google/login')
 def google_login():
     """Redirect to Google OAuth login"""
-    redirect_uri = url_for('google_callback', _external=True)
+    redirect_uri = url_for('.google_callback', _external=True)
 
     global FRONTEND_ROOT
     global FRONTEND_PORT
@@ -1510,7 +2133,7 @@ def google_login():
         redirect_uri = "http://localhost/api/auth/google/callback"
         print(f"Redirect URI: {redirect_uri}")
 
-        return google.authorize_redirect(redirect_uri)
+        return google_client().authorize_redirect(redirect_uri)
 
     elif "localhost" in redirect_uri and "localhost:5001" not in redirect_uri:
         localhost_name = redirect_uri.split("://")[1].split("/")[0]
@@ -1524,13 +2147,13 @@ def google_login():
     
         FRONTEND_ROOT = f"http://127.0.0.1:{FRONTEND_PORT}"
 
-    return google.authorize_redirect(redirect_uri)
+    return google_client().authorize_redirect(redirect_uri)
 
 
-@app.route('/auth/google/callback')
+@bp.route('/auth/google/callback')
 def google_callback():  # pragma: no cover
     """Handle Google OAuth callback"""
-    google = oauth.create_client('google')  # Create a Google OAuth client
+    google = google_client()  # Create a Google OAuth client
     token = google.authorize_access_token()
     user_info = google.get('userinfo').json()
 
@@ -1543,7 +2166,8 @@ def google_callback():  # pragma: no cover
         base = email.split('@')[0]
         username = base
         i = 1
-        while User.query.filter_by(username=username).first():
+        while User.query.filter_by(username=username).first() or \
+              layout.reserved_username(username, current_app.config['UPLOAD_FOLDER']):
             username = f"{base}{i}"; i += 1
 
         user = User(username=username, email=email, grade=33)
@@ -1556,8 +2180,7 @@ def google_callback():  # pragma: no cover
         db.session.add(root)
         db.session.commit()
 
-        os.makedirs(os.path.join(Config.UPLOAD_FOLDER, username),
-                exist_ok=True)
+        storage.ensure_dir(username)
 
     # login the user
     login_user(user, remember=False, fresh=True)
@@ -1566,20 +2189,6 @@ def google_callback():  # pragma: no cover
 
 if __name__ == '__main__':  # pragma: no cover
     os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
+    app = create_app()
     app.secret_key = os.getenv("SECRET_KEY", "dev-secret")
-
-    # for i in range(10):
-    #     try:
-    #         with app.app_context():
-    #             db.create_all()
-    #             print("✅ tables:", inspect(db.engine).get_table_names())
-                
-    #             # # Create default test user after tables are created
-    #             # create_default_test_user()
-    #             break
-    #     except OperationalError:
-    #         print("⏳ waiting for MySQL…"); time.sleep(3)
-    # else:
-    #     print("❌ DB not reachable"); exit(1)
-
-    app.run(host='0.0.0.0', port=80)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=80)
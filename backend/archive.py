@@ -0,0 +1,366 @@
+# backend/archive.py
+"""
+Archive upload: a ZIP or tar stream unpacked into a folder in one request.
+
+``POST /upload-archive?folder_id=<id>`` takes the archive as the raw request
+body; its first bytes, not the Content-Type, decide the format.  Tar (plain
+or gzip/bz2/xz-compressed) is read as a stream: every member goes straight
+from the decompressor into storage and nothing is buffered.  ZIP keeps its
+index at the end, so the body is spooled to a temporary file first (in
+memory up to SPOOL_MEMORY) and then read entry by entry.
+
+Directories in the archive become Folders below the target, reusing the ones
+that already exist; files become File + FileVersion rows laid out exactly as
+``/upload`` lays them out.  Rows are added ARCHIVE_BATCH_SIZE at a time and
+flushed as one multi-row INSERT per table, so the change feed and rollup
+hooks see them like any other upload, and everything commits once.
+
+Limits are checked against each entry's header before it is decompressed,
+and its reader stops at the size the header promised:
+
+  * an entry larger than MAX_CONTENT_LENGTH (what ``/upload`` accepts) or
+    compressed more than ARCHIVE_MAX_RATIO : 1 is rejected and skipped,
+  * more than ARCHIVE_MAX_ENTRIES entries, more than
+    ARCHIVE_MAX_EXPANDED_BYTES unpacked in total or an overall ratio above
+    ARCHIVE_MAX_RATIO aborts the import: nothing is committed and the blobs
+    written so far are deleted again.
+
+The report lists every entry with its outcome: ``imported``, ``exists`` (the
+folder already has a file of that name; nothing is overwritten), ``skipped``
+(directories, links, OS metadata such as ``__MACOSX/``) or ``rejected`` with
+the reason.  Entries whose path has a component starting with a dot are
+rejected: ``.version`` and friends are the app's own directories and must
+never be written through an archive.
+"""
+from __future__ import annotations
+import io
+import mimetypes
+import os
+import shutil
+import stat
+import tarfile
+import tempfile
+import zipfile
+import zlib
+from dataclasses import dataclass, field
+from typing import Callable
+
+from werkzeug.utils import secure_filename
+
+from . import domain_metrics, extract, layout
+from .models import db, File, FileVersion, Folder
+from .storage import CHUNK_SIZE, HashingReader, storage
+
+ZIP_MAGIC = (b'PK\x03\x04', b'PK\x05\x06')      # first entry, or an empty archive
+SPOOL_MEMORY = 8 * 1024 * 1024
+RATIO_FLOOR = 1024 * 1024      # ratios are only judged once this much has been unpacked
+JUNK = {'__MACOSX', '.DS_Store', 'Thumbs.db', 'desktop.ini'}
+OPERATION = 'upload_archive'
+
+
+class ArchiveError(Exception):
+    """The body is not an archive that can be read."""
+
+
+class ArchiveRejected(Exception):
+    """An archive-wide limit was hit; nothing was imported."""
+
+    def __init__(self, message: str, report: 'Report'):
+        super().__init__(message)
+        self.report = report
+
+
+class EntryTooLarge(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Limits:
+    entry_bytes: int
+    total_bytes: int
+    entries: int
+    ratio: float
+
+    @classmethod
+    def from_config(cls, config) -> 'Limits':
+        return cls(entry_bytes=config['MAX_CONTENT_LENGTH'],
+                   total_bytes=config['ARCHIVE_MAX_EXPANDED_BYTES'],
+                   entries=config['ARCHIVE_MAX_ENTRIES'],
+                   ratio=config['ARCHIVE_MAX_RATIO'])
+
+
+@dataclass
+class Report:
+    folder_id: int
+    folders_created: int = 0
+    bytes: int = 0
+    entries: list = field(default_factory=list)
+
+    def add(self, name: str, status: str, **extra) -> dict:
+        self.entries.append({'name': name, 'status': status, **extra})
+        return self.entries[-1]
+
+    def count(self, status: str) -> int:
+        return sum(1 for e in self.entries if e['status'] == status)
+
+    def as_dict(self) -> dict:
+        return {'folder_id': self.folder_id,
+                **{s: self.count(s) for s in ('imported', 'exists', 'skipped', 'rejected')},
+                'folders_created': self.folders_created, 'bytes': self.bytes,
+                'entries': self.entries}
+
+
+# ── reading archives ──
+class _Counting(io.RawIOBase):
+    """The request body as a raw stream, counting the (compressed) bytes consumed."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        data = self.stream.read(len(buf))
+        buf[:len(data)] = data
+        self.count += len(data)
+        return len(data)
+
+
+class _Capped:
+    """An entry's reader that fails instead of yielding more than *limit* bytes."""
+
+    def __init__(self, fh, limit: int):
+        self.fh = fh
+        self.left = limit
+
+    def read(self, n=-1):
+        n = self.left + 1 if n is None or n < 0 else min(n, self.left + 1)
+        data = self.fh.read(n)
+        self.left -= len(data)
+        if self.left < 0:
+            raise EntryTooLarge
+        return data
+
+
+@dataclass
+class _Entry:
+    name: str
+    kind: str                       # 'file' | 'dir' | 'other'
+    size: int                       # unpacked bytes, from the header
+    packed: int | None              # compressed bytes, if the format records them per entry
+    open: Callable
+
+
+def _zip_entries(body):
+    spool = tempfile.SpooledTemporaryFile(SPOOL_MEMORY)
+    with spool:
+        shutil.copyfileobj(body, spool, CHUNK_SIZE)
+        spool.seek(0)
+        try:
+            zf = zipfile.ZipFile(spool)
+        except zipfile.BadZipFile as e:
+            raise ArchiveError(f"not a readable ZIP archive: {e}") from e
+        with zf:
+            for info in zf.infolist():
+                mode = info.external_attr >> 16
+                kind = ('dir' if info.is_dir() else
+                        'other' if stat.S_ISLNK(mode) else 'file')
+                yield _Entry(info.filename, kind, info.file_size, info.compress_size,
+                             lambda info=info: zf.open(info))
+
+
+def _tar_entries(body):
+    try:
+        tar = tarfile.open(fileobj=body, mode='r|*')
+    except tarfile.TarError as e:
+        raise ArchiveError(f"not a ZIP or tar archive: {e}") from e
+    with tar:
+        members = iter(tar)
+        while True:
+            try:
+                member = next(members)
+            except StopIteration:
+                return
+            except (tarfile.TarError, EOFError, zlib.error, OSError) as e:
+                raise ArchiveError(f"corrupt tar archive: {e}") from e
+            kind = 'file' if member.isfile() else 'dir' if member.isdir() else 'other'
+            yield _Entry(member.name, kind, member.size if kind == 'file' else 0, None,
+                         lambda member=member: tar.extractfile(member))
+
+
+def _too_big(entry: _Entry, limits: Limits) -> str | None:
+    """Why this entry must not be unpacked, judged from its header alone."""
+    if entry.size > limits.entry_bytes:
+        return f"larger than {limits.entry_bytes} bytes"
+    if entry.packed is not None and entry.size > RATIO_FLOOR \
+            and entry.size > limits.ratio * max(entry.packed, 1):
+        return "compression ratio too high"
+    return None
+
+
+def _parts(name: str) -> tuple[str, ...] | None:
+    """Path components of an entry name, or None if it tries to leave the target."""
+    parts = tuple(p for p in name.replace('\\', '/').split('/') if p not in ('', '.'))
+    return None if '..' in parts else parts
+
+
+# ── importing ──
+class _Importer:
+    def __init__(self, owner, target: Folder, base_dir: str, levels: int,
+                 limits: Limits, batch_size: int, report: Report):
+        self.owner, self.limits, self.batch_size, self.report = owner, limits, batch_size, report
+        self.levels = levels                       # folder levels still allowed below target
+        self.folders = {(): (target, base_dir)}    # path inside the archive → (Folder, storage dir)
+        self.taken = {}                            # folder id → (filenames, live paths) in use
+        self.pending = []                          # files written, rows not yet flushed
+        self.created = []                          # (version, filename) to hand to extraction
+        self.written = []                          # storage keys to remove if the import is abandoned
+
+    def folder(self, parts: tuple[str, ...]):
+        if parts in self.folders:
+            return self.folders[parts]
+        parent, parent_dir = self.folder(parts[:-1])
+        name = parts[-1]
+        if layout.reserved_name(name):
+            raise ValueError(f"reserved folder name: {name!r}")
+        folder = Folder.query.filter_by(owner_id=self.owner.id, parent_id=parent.id, name=name).first()
+        if folder is None:
+            folder = Folder(name=name, owner_id=self.owner.id, parent_id=parent.id)
+            db.session.add(folder)
+            db.session.flush()
+            self.report.folders_created += 1
+        disk_dir = os.path.join(parent_dir, name)
+        storage.ensure_dir(disk_dir)
+        self.folders[parts] = (folder, disk_dir)
+        return self.folders[parts]
+
+    def _taken(self, folder: Folder):
+        if folder.id not in self.taken:
+            rows = db.session.query(File.filename, File.path).filter(File.folder_id == folder.id).all()
+            self.taken[folder.id] = ({r.filename for r in rows}, {r.path for r in rows})
+        return self.taken[folder.id]
+
+    def add(self, entry: _Entry, parts: tuple[str, ...]):
+        row = self.report.add('/'.join(parts), 'imported')
+        problem = _too_big(entry, self.limits)
+        if problem:
+            row.update(status='rejected', error=problem)
+            return
+        if len(parts) - 1 > self.levels:
+            row.update(status='rejected', error="folders nested too deeply")
+            return
+        name, safe = parts[-1], secure_filename(parts[-1])
+        if not safe:
+            row.update(status='rejected', error="invalid file name")
+            return
+
+        folder, disk_dir = self.folder(parts[:-1])
+        names, paths = self._taken(folder)
+        path = os.path.join(disk_dir, safe)
+        if name in names or path in paths:
+            row['status'] = 'exists'
+            return
+        try:
+            with entry.open() as fh, domain_metrics.disk_write(OPERATION):
+                reader = HashingReader(_Capped(fh, entry.size))
+                size = storage.put(path, reader)
+        except EntryTooLarge:
+            row.update(status='rejected', error="entry is longer than its header says")
+            return
+        except (RuntimeError, NotImplementedError, zipfile.BadZipFile, tarfile.TarError,
+                EOFError, zlib.error) as e:           # encrypted, unsupported method, CRC mismatch…
+            row.update(status='rejected', error=f"cannot read entry: {e}")
+            return
+        self.written.append(path)
+        names.add(name)
+        paths.add(path)
+        row['size'] = size
+        self.report.bytes += size
+        rec = File(filename=name, mimetype=mimetypes.guess_type(name)[0], path=path,
+                   owner_id=self.owner.id, folder_id=folder.id, current_version=1)
+        self.pending.append((row, rec, safe, size, reader.hexdigest()))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Insert the pending files, then their initial versions: one batched INSERT each."""
+        if not self.pending:
+            return
+        db.session.add_all(rec for _, rec, *_ in self.pending)
+        db.session.flush()
+        versions = []
+        for row, rec, safe, size, digest in self.pending:
+            version_path = layout.version_path(self.owner.username, f"{rec.id}_v1_{safe}")
+            with domain_metrics.disk_write(OPERATION):
+                storage.copy(rec.path, version_path, immutable=True)
+            self.written.append(version_path)
+            versions.append(FileVersion(file_id=rec.id, version_number=1, path=version_path,
+                                        size=size, sha256=digest, comment="Initial version"))
+            self.created.append((versions[-1], rec.filename))
+            row['file_id'] = rec.id
+        db.session.add_all(versions)
+        db.session.flush()
+        self.pending.clear()
+
+    def abandon(self):
+        db.session.rollback()
+        for path in self.written:
+            storage.delete(path)
+
+
+def import_archive(stream, owner, target: Folder, base_dir: str, levels: int,
+                   limits: Limits, batch_size: int) -> Report:
+    """
+    Unpack the archive in *stream* into *target* (whose storage dir is
+    *base_dir*) for *owner* and commit; raises ArchiveError for unreadable
+    input and ArchiveRejected when an archive-wide limit is hit.
+    """
+    body = _Counting(stream)
+    buffered = io.BufferedReader(body, CHUNK_SIZE)
+    entries = _zip_entries(buffered) if buffered.peek(4)[:4] in ZIP_MAGIC else _tar_entries(buffered)
+
+    report = Report(folder_id=target.id)
+    importer = _Importer(owner, target, base_dir, levels, limits, batch_size, report)
+    seen = expanded = 0
+    try:
+        for entry in entries:
+            seen += 1
+            # a tar stream decompresses the members it skips too; a ZIP entry
+            # refused on its header is never touched
+            if entry.packed is None or not _too_big(entry, limits):
+                expanded += entry.size
+            if seen > limits.entries:
+                raise ArchiveRejected(f"more than {limits.entries} entries", report)
+            if expanded > limits.total_bytes:
+                raise ArchiveRejected(f"more than {limits.total_bytes} bytes once unpacked", report)
+            if expanded > RATIO_FLOOR and expanded > limits.ratio * max(body.count, 1):
+                raise ArchiveRejected("archive is compressed suspiciously well", report)
+
+            parts = _parts(entry.name)
+            if parts is None:
+                report.add(entry.name, 'rejected', error="path leaves the target folder")
+            elif not parts or any(p in JUNK for p in parts) or parts[-1].startswith('._') \
+                    or entry.kind == 'other':
+                report.add(entry.name, 'skipped')
+            elif any(layout.reserved_name(p) for p in parts):
+                report.add(entry.name, 'rejected', error="reserved path component")
+            elif entry.kind == 'dir':
+                if len(parts) <= levels:
+                    importer.folder(parts)
+                report.add('/'.join(parts), 'skipped')
+            else:
+                importer.add(entry, parts)
+        importer.flush()
+        db.session.commit()
+    except BaseException:
+        importer.abandon()
+        raise
+    finally:
+        entries.close()
+
+    for version, filename in importer.created:
+        domain_metrics.record_upload(OPERATION, version.size)
+        extract.schedule(version, filename)
+    return report
@@ -0,0 +1,42 @@
+# backend/background.py
+"""
+Per-process periodic jobs.
+
+Threads are started from the first request a worker handles rather than
+from create_app(), so they survive gunicorn's pre-fork and never run
+during imports, CLI commands or tests.
+"""
+import threading
+import time
+
+from .models import db
+
+
+def _loop(app, name, job, interval):
+    while True:
+        with app.app_context():
+            try:
+                job()
+            except Exception as e:
+                app.logger.warning(f"background job {name} failed: {e}")
+            finally:
+                db.session.remove()
+        time.sleep(interval)
+
+
+def run_periodically(app, name: str, job, interval: float):
+    """Run *job()* every *interval* seconds in a daemon thread of each worker."""
+    if app.config.get('TESTING') or not interval:
+        return
+    lock = threading.Lock()
+    started = []
+
+    @app.before_request
+    def _start_job():
+        if started:
+            return
+        with lock:
+            if not started:
+                threading.Thread(target=_loop, args=(app, name, job, interval),
+                                 name=name, daemon=True).start()
+                started.append(True)
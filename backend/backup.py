@@ -0,0 +1,464 @@
+# backend/backup.py
+"""
+Snapshot export and import.
+
+A snapshot is a gzip'd tar stream that describes itself:
+
+    manifest.json        format, snapshot_id, since and scope
+    rows/<table>/<n>.jsonl
+                         the Folder / File / FileVersion / DocumentReview /
+                         User rows, one JSON object per line, one member
+                         per keyset batch (<n> = rows of the table before it)
+    blobs/<name>         version content, once per distinct blob
+                         (<name> = sha256, or v<id> for unhashed legacy rows)
+    missing.json         blobs that could not be read, if any
+
+``snapshot_id`` is the highest FileVersion id at export time.  Passing it
+back as ``since`` gives an incremental snapshot: only versions (and blobs)
+newer than it, while the cheap Folder/File/Review rows are always included
+in full so renames, moves and review state changes come along too.
+
+Export writes each keyset batch of rows as its own member, then copies every
+blob from ``storage.open`` into the archive chunk by chunk, opening the next
+few through a bounded window of parallel opens so a slow disk or S3
+round-trip does not serialise the archive; neither rows nor blobs are ever
+held whole.  Import reads the stream once (format 1 archives, with every row
+inline in manifest.json, are still accepted): it validates the rows
+against the database, writes each new version's blob as it
+arrives, upserts the rows with bulk executemany INSERT/UPDATEs, restores
+live files from their current version and commits once.  Ids are kept, so a
+full snapshot followed by its incrementals rebuilds the same database
+(deletions are not replayed: rows missing from a later snapshot stay).
+
+A per-user snapshot carries the other users its reviews mention, with
+their password hash replaced by LOCKED_PASSWORD.
+"""
+from __future__ import annotations
+import gzip
+import json
+import tarfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from sqlalchemy import func, or_, select, update
+
+from .models import db, User, Folder, File, FileVersion, DocumentReview
+from .storage import CHUNK_SIZE, StorageError, storage
+
+FORMAT = 'docs-snapshot'
+FORMAT_VERSION = 2
+MANIFEST = 'manifest.json'
+MISSING = 'missing.json'
+ROW_DIR = 'rows/'
+BLOB_DIR = 'blobs/'
+SNAPSHOT_HEADER = 'X-Snapshot-Id'
+BATCH = 1000
+COMPRESSLEVEL = 1      # blobs are mostly already-compressed documents; favour speed
+LOCKED_PASSWORD = '!'  # matches no password; such accounts sign in after a reset
+
+# manifest key → model, in foreign-key order
+TABLES = (('users', User), ('folders', Folder), ('files', File),
+          ('versions', FileVersion), ('reviews', DocumentReview))
+# columns that must match for an existing id to count as the same row on import
+IDENTITY = {'users': ('username',), 'folders': ('owner_id',), 'files': ('owner_id',),
+            'versions': ('file_id', 'version_number'), 'reviews': ('file_id',)}
+
+
+class BackupError(Exception):
+    pass
+
+
+def blob_name(version: dict) -> str:
+    return version['sha256'] or f"v{version['id']}"
+
+
+# ───────────────────────────── export ─────────────────────────────
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _batches(model, *where):
+    """Rows of *model* matching *where* as JSON-ready dicts, one keyset batch at a time."""
+    table = model.__table__
+    last = 0
+    while True:
+        chunk = db.session.execute(select(table).where(table.c.id > last, *where)
+                                   .order_by(table.c.id).limit(BATCH)).mappings().all()
+        if not chunk:
+            return
+        last = chunk[-1]['id']
+        yield [{k: _json_value(v) for k, v in row.items()} for row in chunk]
+
+
+def build_manifest(user: User | None = None, since: int = 0) -> dict:
+    """Header of a snapshot of *user*'s workspace (None = whole tenant) newer than *since*."""
+    return {
+        'format': FORMAT, 'format_version': FORMAT_VERSION,
+        'snapshot_id': db.session.query(func.max(FileVersion.id)).scalar() or 0,
+        'since': since, 'scope': {'user': user.username if user else None},
+        'created_at': datetime.utcnow().isoformat(),
+    }
+
+
+def _version_filter(manifest: dict, user: User | None) -> tuple:
+    where = (FileVersion.id > manifest['since'], FileVersion.id <= manifest['snapshot_id'])
+    if user is None:
+        return where
+    owned = select(File.id).where(File.owner_id == user.id)
+    # the path prefix also catches versions of files deleted since
+    return where + (or_(FileVersion.file_id.in_(owned),
+                        FileVersion.path.startswith(f"{user.username}/", autoescape=True)),)
+
+
+def _table_batches(manifest: dict, user: User | None):
+    """Yield ``(key, rows)`` batches of every table; users last, as reviews decide who is in."""
+    versions = _version_filter(manifest, user)
+    if user is None:
+        yield from (('folders', b) for b in _batches(Folder))
+        yield from (('files', b) for b in _batches(File))
+        yield from (('versions', b) for b in _batches(FileVersion, *versions))
+        yield from (('reviews', b) for b in _batches(DocumentReview))
+        yield from (('users', b) for b in _batches(User))
+        return
+    owned = select(File.id).where(File.owner_id == user.id)
+    yield from (('folders', b) for b in _batches(Folder, Folder.owner_id == user.id))
+    yield from (('files', b) for b in _batches(File, File.owner_id == user.id))
+    yield from (('versions', b) for b in _batches(FileVersion, *versions))
+    people = {user.id}
+    for batch in _batches(DocumentReview, DocumentReview.file_id.in_(owned)):
+        people.update(r['reviewer_id'] for r in batch)
+        people.update(r['requester_id'] for r in batch)
+        yield 'reviews', batch
+    for batch in _batches(User, User.id.in_(people)):
+        for u in batch:
+            if u['id'] != user.id:
+                u['password_hash'] = LOCKED_PASSWORD   # never hand out other people's hashes
+        yield 'users', batch
+
+
+def _blobs(manifest: dict, user: User | None):
+    """
+    Yield ``(name, path)`` once per distinct blob of the snapshot's versions,
+    with the lowest version id that references it; each batch asks the
+    database which of its hashes an earlier batch already carried.
+    """
+    where = _version_filter(manifest, user)
+    last = 0
+    while True:
+        chunk = (db.session.query(FileVersion.id, FileVersion.sha256, FileVersion.path)
+                 .filter(FileVersion.id > last, *where)
+                 .order_by(FileVersion.id).limit(BATCH).all())
+        if not chunk:
+            return
+        hashes = {v.sha256 for v in chunk if v.sha256}
+        seen = set()
+        if hashes and last:
+            seen = {h for (h,) in db.session.query(FileVersion.sha256).distinct()
+                    .filter(FileVersion.sha256.in_(hashes), FileVersion.id <= last, *where)}
+        last = chunk[-1].id
+        for v in chunk:
+            name = blob_name({'id': v.id, 'sha256': v.sha256})
+            if name not in seen:
+                seen.add(name)
+                yield name, v.path
+
+
+class _Sink:
+    """Write-only file object whose bytes are handed out by ``drain()``."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data, self._chunks = b''.join(self._chunks), []
+        return data
+
+
+class _TarStream:
+    """
+    gzip'd tar writer that hands out output while a member is still being
+    copied; ``tarfile`` only returns after a whole member, which would hold
+    a compressed blob in memory.  Headers come from ``TarInfo.tobuf``.
+    """
+
+    def __init__(self, mtime: float):
+        self.mtime = mtime
+        self.offset = 0
+        self.sink = _Sink()
+        self.gz = gzip.GzipFile(fileobj=self.sink, mode='wb', compresslevel=COMPRESSLEVEL)
+
+    def _write(self, data: bytes):
+        self.gz.write(data)
+        self.offset += len(data)
+
+    def _pad(self, unit: int):
+        if self.offset % unit:
+            self._write(b'\0' * (unit - self.offset % unit))
+
+    def _header(self, name: str, size: int):
+        info = tarfile.TarInfo(name)
+        info.size, info.mtime = size, self.mtime
+        self._write(info.tobuf(tarfile.PAX_FORMAT))
+
+    def add(self, name: str, data: bytes) -> bytes:
+        self._header(name, len(data))
+        self._write(data)
+        self._pad(tarfile.BLOCKSIZE)
+        return self.sink.drain()
+
+    def add_stream(self, name: str, size: int, fh):
+        """Copy *size* bytes of *fh* into a member, yielding output chunk by chunk."""
+        self._header(name, size)
+        left = size
+        while left:
+            chunk = fh.read(min(CHUNK_SIZE, left))
+            if not chunk:
+                raise StorageError(f"{name} ended {left} bytes short of its size")
+            self._write(chunk)
+            left -= len(chunk)
+            yield self.sink.drain()
+        self._pad(tarfile.BLOCKSIZE)
+        yield self.sink.drain()
+
+    def close(self) -> bytes:
+        self._write(b'\0' * 2 * tarfile.BLOCKSIZE)
+        self._pad(tarfile.RECORDSIZE)
+        self.gz.close()
+        return self.sink.drain()
+
+
+def _open(store, path):
+    """``(size, stream)`` of a blob, or None if it cannot be read."""
+    try:
+        st = store.stat(path)
+        return None if st is None else (st.size, store.open(path))
+    except (StorageError, OSError):
+        return None
+
+
+def _prefetch(store, items, workers: int):
+    """
+    Yield ``(name, (size, stream) | None)`` in order, keeping up to 2×*workers*
+    opens in flight: the round-trips overlap, the bytes are read by the caller.
+    """
+    it = iter(items)
+    window = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            for name, path in it:
+                window.append((name, pool.submit(_open, store, path)))
+                if len(window) >= 2 * workers:
+                    break
+            while window:
+                name, fut = window.popleft()
+                nxt = next(it, None)
+                if nxt is not None:
+                    window.append((nxt[0], pool.submit(_open, store, nxt[1])))
+                yield name, fut.result()
+        finally:
+            for _, fut in window:                   # abandoned mid-export
+                opened = fut.result()
+                if opened:
+                    opened[1].close()
+
+
+def iter_archive(manifest: dict, user: User | None = None, workers: int = 8):
+    """
+    Yield the snapshot archive for *manifest* (from ``build_manifest`` with the
+    same *user*) as gzip'd tar chunks; needs an app context while it runs.
+    Row counts per table are added to ``manifest['rows']`` as they are written.
+    """
+    store = storage._get_current_object()
+
+    def generate():
+        tar = _TarStream(time.time())
+        yield tar.add(MANIFEST, json.dumps(manifest).encode('utf-8'))
+        counts = manifest.setdefault('rows', {})
+        for key, batch in _table_batches(manifest, user):
+            n = counts.get(key, 0)
+            lines = ''.join(json.dumps(row) + '\n' for row in batch)
+            yield tar.add(f"{ROW_DIR}{key}/{n:09d}.jsonl", lines.encode('utf-8'))
+            counts[key] = n + len(batch)
+        missing = []
+        for name, opened in _prefetch(store, _blobs(manifest, user), workers):
+            if opened is None:
+                missing.append(name)
+                continue
+            size, fh = opened
+            with fh:
+                yield from tar.add_stream(BLOB_DIR + name, size, fh)
+        if missing:
+            yield tar.add(MISSING, json.dumps(missing).encode('utf-8'))
+        yield tar.close()
+
+    return generate()
+
+
+def export_to(fileobj, user: User | None = None, since: int = 0, workers: int = 8) -> dict:
+    """Write a snapshot to *fileobj*; returns its manifest (with ``rows`` counts)."""
+    manifest = build_manifest(user, since)
+    for chunk in iter_archive(manifest, user, workers):
+        fileobj.write(chunk)
+    return manifest
+
+
+# ───────────────────────────── import ─────────────────────────────
+def _per_table() -> dict:
+    return {key: 0 for key, _ in TABLES}
+
+
+@dataclass
+class ImportReport:
+    snapshot_id: int = 0
+    inserted: dict = field(default_factory=_per_table)
+    updated: dict = field(default_factory=_per_table)
+    blobs: int = 0
+    live_restored: int = 0
+    missing_blobs: int = 0
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+def _existing(model, key: str, ids: list) -> dict:
+    cols = [model.__table__.c.id] + [model.__table__.c[c] for c in IDENTITY[key]]
+    found = {}
+    for i in range(0, len(ids), BATCH):
+        for row in db.session.execute(select(*cols).where(cols[0].in_(ids[i:i + BATCH]))):
+            found[row[0]] = tuple(row[1:])
+    return found
+
+
+def _plan(manifest: dict) -> dict:
+    """Split every table's rows into inserts and updates; raise if an id means something else here."""
+    plan = {}
+    for key, model in TABLES:
+        rows = manifest[key]
+        existing = _existing(model, key, [r['id'] for r in rows])
+        for r in rows:
+            have = existing.get(r['id'])
+            if have is not None and have != tuple(r[c] for c in IDENTITY[key]):
+                raise BackupError(f"{key} id {r['id']} already holds different data")
+        plan[key] = ([r for r in rows if r['id'] not in existing],
+                     [r for r in rows if r['id'] in existing])
+    new_names = [u['username'] for u in plan['users'][0]]
+    taken = {n for (n,) in db.session.query(User.username).filter(User.username.in_(new_names))} if new_names else set()
+    if taken:
+        raise BackupError(f"usernames already taken by other ids: {', '.join(sorted(taken))}")
+    return plan
+
+
+def _typed(model, row: dict) -> dict:
+    out = dict(row)
+    for col in model.__table__.columns:
+        if isinstance(col.type, db.DateTime) and isinstance(out.get(col.name), str):
+            out[col.name] = datetime.fromisoformat(out[col.name])
+    return out
+
+
+def _parents_first(folders: list) -> list:
+    """Order new folders so every parent is inserted before its children."""
+    parent_of = {f['id']: f['parent_id'] for f in folders}
+    depth = {}
+    for fid in parent_of:
+        chain, node = [], fid
+        while node in parent_of and node not in depth and node not in chain:
+            chain.append(node)
+            node = parent_of[node]
+        base = depth.get(node, -1)
+        for i, n in enumerate(reversed(chain)):
+            depth[n] = base + 1 + i
+    return sorted(folders, key=lambda f: (depth[f['id']], f['id']))
+
+
+def _targets(plan: dict) -> dict:
+    """Blob name → paths of the versions being inserted."""
+    targets = {}
+    for v in plan['versions'][0]:
+        targets.setdefault(blob_name(v), []).append(v['path'])
+    return targets
+
+
+def import_from(fileobj) -> ImportReport:
+    """Restore a snapshot stream written by ``export_to`` / ``GET /export``; run in an app context."""
+    tar = tarfile.open(fileobj=fileobj, mode='r|*')
+    first = tar.next()
+    if first is None or first.name != MANIFEST:
+        raise BackupError("not a snapshot: manifest.json must come first")
+    manifest = json.load(tar.extractfile(first))
+    version = manifest.get('format_version')
+    if manifest.get('format') != FORMAT or version not in (1, FORMAT_VERSION):
+        raise BackupError(f"unsupported snapshot format {manifest.get('format')!r} v{version}")
+    if version > 1:
+        for key, _ in TABLES:
+            manifest[key] = []
+    report = ImportReport(snapshot_id=manifest['snapshot_id'])
+
+    plan = targets = None
+    for member in tar:
+        if not member.isfile() or member.name == MANIFEST:     # iteration replays the first member
+            continue
+        if member.name.startswith(ROW_DIR) and version > 1:
+            key = member.name[len(ROW_DIR):].split('/', 1)[0]
+            if plan is not None or key not in dict(TABLES):
+                raise BackupError(f"unexpected rows member {member.name}")
+            manifest[key].extend(json.loads(line) for line in tar.extractfile(member))
+            continue
+        if plan is None:
+            plan = _plan(manifest)
+            targets = _targets(plan)
+        if not member.name.startswith(BLOB_DIR):
+            continue
+        paths = targets.pop(member.name[len(BLOB_DIR):], None)
+        if not paths:
+            continue
+        storage.put(paths[0], tar.extractfile(member))
+        for path in paths[1:]:
+            storage.copy(paths[0], path, immutable=True)
+        report.blobs += 1
+    if plan is None:
+        plan = _plan(manifest)
+        targets = _targets(plan)
+    report.missing_blobs = len(targets)
+
+    plan['folders'] = (_parents_first(plan['folders'][0]), plan['folders'][1])
+    try:
+        for key, model in TABLES:
+            inserts, updates = plan[key]
+            for i in range(0, len(inserts), BATCH):
+                db.session.execute(db.insert(model), [_typed(model, r) for r in inserts[i:i + BATCH]])
+            report.inserted[key] = len(inserts)
+            if key in ('users', 'versions'):      # accounts and versions are never rewritten
+                continue
+            for i in range(0, len(updates), BATCH):
+                db.session.execute(update(model), [_typed(model, r) for r in updates[i:i + BATCH]])
+            report.updated[key] = len(updates)
+
+        # a live file is (re)written when its current version arrived with this
+        # snapshot, or when it is missing (e.g. renamed since the last import)
+        arrived = {(v['file_id'], v['version_number']): v['path'] for v in plan['versions'][0]}
+        for f in manifest['files']:
+            if not f['path']:
+                continue
+            src = arrived.get((f['id'], f['current_version']))
+            if src is None and not storage.exists(f['path']):
+                src = (db.session.query(FileVersion.path)
+                       .filter_by(file_id=f['id'], version_number=f['current_version']).scalar())
+            if src and storage.exists(src):
+                storage.copy(src, f['path'], immutable=True)
+                report.live_restored += 1
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return report
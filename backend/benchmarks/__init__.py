@@ -0,0 +1,7 @@
+# backend/benchmarks
+"""
+Benchmark suite: ``python -m backend.benchmarks --help`` (run from the repo root).
+
+dataset.py seeds synthetic large tenants, runner.py times the main
+endpoints and compares runs against JSON baselines in ``baselines/``.
+"""
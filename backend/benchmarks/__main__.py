@@ -0,0 +1,77 @@
+# backend/benchmarks/__main__.py
+"""
+Seed a throw-away database, benchmark it and compare with a baseline.
+
+    python -m backend.benchmarks --files-per-user 3500 --users 3 \
+        --out backend/benchmarks/baselines/latest.json \
+        --baseline backend/benchmarks/baselines/main.json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from ..app import create_app, db
+from . import runner
+from .dataset import TenantSpec, generate
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog='python -m backend.benchmarks')
+    p.add_argument('--users', type=int, default=TenantSpec.users)
+    p.add_argument('--files-per-user', type=int, default=TenantSpec.files_per_user)
+    p.add_argument('--folder-depth', type=int, default=TenantSpec.folder_depth)
+    p.add_argument('--max-versions', type=int, default=TenantSpec.max_versions)
+    p.add_argument('--notifications-per-user', type=int, default=TenantSpec.notifications_per_user)
+    p.add_argument('--seed', type=int, default=TenantSpec.seed)
+    p.add_argument('--iterations', type=int, default=30)
+    p.add_argument('--warmup', type=int, default=3)
+    p.add_argument('--concurrency', type=int, default=4)
+    p.add_argument('--no-wsgi', action='store_true', help='skip the real WSGI server pass')
+    p.add_argument('--database-url', help='defaults to a SQLite file in a temp dir')
+    p.add_argument('--out', help='write results JSON here')
+    p.add_argument('--baseline', help='compare against this results JSON')
+    p.add_argument('--tolerance', type=float, default=0.25, help='allowed p50 slowdown (0.25 = 25%%)')
+    args = p.parse_args(argv)
+
+    spec = TenantSpec(users=args.users, files_per_user=args.files_per_user,
+                      folder_depth=args.folder_depth, max_versions=args.max_versions,
+                      notifications_per_user=args.notifications_per_user, seed=args.seed)
+    work = tempfile.mkdtemp(prefix='docs-bench-')
+    try:
+        app = create_app(
+            SQLALCHEMY_DATABASE_URI=args.database_url or f"sqlite:///{os.path.join(work, 'bench.db')}",
+            UPLOAD_FOLDER=os.path.join(work, 'uploads'),
+            METRICS_ENABLED=False,
+        )
+        with app.app_context():
+            db.create_all()
+            ds = generate(spec)
+        print(f"seeded {ds.counts}", file=sys.stderr)
+
+        result = runner.run(app, ds, spec, iterations=args.iterations, warmup=args.warmup,
+                            concurrency=args.concurrency, wsgi=not args.no_wsgi)
+        for key, r in sorted(result['results'].items()):
+            print(f"{key:28s} p50 {r['p50_ms']:8.2f} ms  p95 {r['p95_ms']:8.2f} ms  "
+                  f"{r['throughput_rps']:8.1f} req/s")
+
+        if args.out:
+            os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+            with open(args.out, 'w', encoding='utf-8') as fh:
+                json.dump(result, fh, indent=2, sort_keys=True)
+
+        if args.baseline:
+            with open(args.baseline, encoding='utf-8') as fh:
+                regressions = runner.compare(result, json.load(fh), args.tolerance)
+            for line in regressions:
+                print(f"REGRESSION {line}", file=sys.stderr)
+            return 1 if regressions else 0
+        return 0
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
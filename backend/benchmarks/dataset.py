@@ -0,0 +1,145 @@
+# backend/benchmarks/dataset.py
+"""
+Synthetic large-tenant dataset generator.
+
+Builds users with deep folder trees, many files, long version chains,
+pending reviews and notifications using bulk inserts with pre-assigned
+primary keys, and writes small placeholder blobs so download and compare
+endpoints have real bytes to read.  Output is deterministic for a given seed.
+"""
+from __future__ import annotations
+import os
+import random
+from dataclasses import dataclass, field
+
+from werkzeug.security import generate_password_hash
+
+from ..models import db, User, Folder, File, FileVersion, DocumentReview, Notification
+from ..layout import version_path
+from ..storage import storage
+
+PASSWORD = 'bench'
+TEXT_EXTS = ('.txt', '.md', '.py', '.json')
+
+
+@dataclass
+class TenantSpec:
+    users: int = 3
+    files_per_user: int = 3500
+    folder_depth: int = 6
+    folder_fanout: int = 4
+    max_versions: int = 40            # longest version chain
+    long_chain_ratio: float = 0.02    # share of files with a long chain
+    review_ratio: float = 0.05        # share of files with a pending review
+    notifications_per_user: int = 200
+    published_ratio: float = 0.1
+    seed: int = 42
+
+
+@dataclass
+class Dataset:
+    """Ids the benchmarks need to address the generated data."""
+    usernames: list[str] = field(default_factory=list)
+    heavy_user: str = ''
+    reviewer: str = ''
+    compare_file_id: int = 0
+    compare_versions: tuple[int, int] = (1, 1)
+    download_file_id: int = 0
+    counts: dict = field(default_factory=dict)
+
+
+def _next_id(model) -> int:
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+
+def _blob(path: str, rng: random.Random, version: int):
+    lines = [f"line {i} v{version} {rng.random():.6f}" for i in range(rng.randint(5, 40))]
+    return storage.put(path, "\n".join(lines).encode('utf-8'))
+
+
+def generate(spec: TenantSpec) -> Dataset:
+    """Insert the tenants described by *spec*; run inside an app context."""
+    rng = random.Random(spec.seed)
+    out = Dataset()
+
+    user_id, folder_id, file_id = _next_id(User), _next_id(Folder), _next_id(File)
+    version_id, review_id, notif_id = _next_id(FileVersion), _next_id(DocumentReview), _next_id(Notification)
+
+    users, folders, files, versions, reviews, notifs = [], [], [], [], [], []
+    pw_hash = generate_password_hash(PASSWORD)   # hashed once, shared by every tenant
+
+    user_ids = []
+    for u in range(spec.users):
+        name = f"bench{spec.seed}_{u}"
+        users.append(dict(id=user_id, username=name, email=f"{name}@bench",
+                          password_hash=pw_hash, grade=rng.randint(1, 40), is_admin=False))
+        user_ids.append((user_id, name))
+        out.usernames.append(name)
+        user_id += 1
+
+    for uid, uname in user_ids:
+        # ── folder tree: breadth-limited, depth-limited ──
+        root_id = folder_id; folder_id += 1
+        folders.append(dict(id=root_id, name='Root folder', owner_id=uid, parent_id=None))
+        tree = [(root_id, uname, 0)]
+        frontier = [tree[0]]
+        while frontier:
+            parent, parent_path, depth = frontier.pop(0)
+            if depth >= spec.folder_depth:
+                continue
+            for i in range(rng.randint(1, spec.folder_fanout)):
+                name = f"d{depth}_{i}"
+                node = (folder_id, os.path.join(parent_path, name), depth + 1)
+                folders.append(dict(id=folder_id, name=name, owner_id=uid, parent_id=parent))
+                tree.append(node); frontier.append(node)
+                folder_id += 1
+
+        # ── files and version chains ──
+        for n in range(spec.files_per_user):
+            fid, (fold, fold_path, _) = file_id, rng.choice(tree)
+            file_id += 1
+            fname = f"doc{n}{rng.choice(TEXT_EXTS)}"
+            chain = spec.max_versions if rng.random() < spec.long_chain_ratio else rng.randint(1, 4)
+            for v in range(1, chain + 1):
+                vpath = version_path(uname, f"{fid}_v{v}_{fname}")
+                size = _blob(vpath, rng, v)
+                versions.append(dict(id=version_id, file_id=fid, version_number=v,
+                                     path=vpath, size=size, comment=f"Version {v}"))
+                version_id += 1
+            live = os.path.join(fold_path, fname)
+            _blob(live, rng, chain)
+            under_review = rng.random() < spec.review_ratio
+            files.append(dict(id=fid, filename=fname, mimetype='text/plain', path=live,
+                              owner_id=uid, folder_id=fold, current_version=chain,
+                              is_under_review=under_review,
+                              is_published=not under_review and rng.random() < spec.published_ratio))
+            if chain > out.compare_versions[1] - out.compare_versions[0]:
+                out.compare_file_id, out.compare_versions = fid, (1, chain)
+                out.heavy_user = uname
+            if under_review and len(user_ids) > 1:
+                reviewer = next(i for i in user_ids if i[0] != uid)
+                reviews.append(dict(id=review_id, file_id=fid, reviewer_id=reviewer[0],
+                                    requester_id=uid, status='pending',
+                                    original_version=chain - 1 or None, modified_version=chain))
+                review_id += 1
+
+        for n in range(spec.notifications_per_user):
+            notifs.append(dict(id=notif_id, user_id=uid, title=f"Notice {n}",
+                               message="synthetic", type='info', is_read=rng.random() < 0.7))
+            notif_id += 1
+
+    for model, rows in ((User, users), (Folder, folders), (File, files),
+                        (FileVersion, versions), (DocumentReview, reviews), (Notification, notifs)):
+        for start in range(0, len(rows), 1000):
+            db.session.execute(db.insert(model), rows[start:start + 1000])
+    db.session.commit()
+
+    if reviews:
+        out.reviewer = next(name for uid, name in user_ids if uid == reviews[0]['reviewer_id'])
+    else:
+        out.reviewer = out.usernames[0]
+    out.heavy_user = out.heavy_user or out.usernames[0]
+    out.download_file_id = out.compare_file_id
+    out.counts = dict(users=len(users), folders=len(folders), files=len(files),
+                      versions=len(versions), reviews=len(reviews), notifications=len(notifs))
+    return out
@@ -0,0 +1,162 @@
+# backend/benchmarks/runner.py
+"""
+Latency / throughput benchmarks against the main endpoints.
+
+Each scenario runs first through the Flask test client (in-process, no
+network) and then through a real threaded WSGI server hit by concurrent
+``requests`` sessions.  Results are plain dicts so they can be written as
+JSON baselines and compared on the next run.
+"""
+from __future__ import annotations
+import platform
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from datetime import datetime, timezone
+from io import BytesIO
+
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from .dataset import Dataset, TenantSpec, PASSWORD
+
+
+def scenarios(ds: Dataset) -> list[tuple[str, str, str, str]]:
+    """(name, user, method, path) for every benchmarked call."""
+    v1, v2 = ds.compare_versions
+    return [
+        ('folders', ds.heavy_user, 'GET', '/folders'),
+        ('public_files', ds.heavy_user, 'GET', '/public-files'),
+        ('notifications', ds.heavy_user, 'GET', '/notifications'),
+        ('my_reviews', ds.reviewer, 'GET', '/my-reviews'),
+        ('file_versions', ds.heavy_user, 'GET', f'/file-versions/{ds.compare_file_id}'),
+        ('compare_versions', ds.heavy_user, 'GET', f'/compare-versions/{ds.compare_file_id}/{v1}/{v2}'),
+        ('download', ds.heavy_user, 'GET', f'/download/{ds.download_file_id}'),
+        ('upload', ds.heavy_user, 'POST', '/upload'),
+    ]
+
+
+def summarize(samples: list[float], wall: float) -> dict:
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        'n': len(ordered),
+        'mean_ms': statistics.fmean(ordered) * 1000,
+        'p50_ms': pct(50) * 1000,
+        'p95_ms': pct(95) * 1000,
+        'p99_ms': pct(99) * 1000,
+        'max_ms': ordered[-1] * 1000,
+        'throughput_rps': len(ordered) / wall if wall else 0.0,
+    }
+
+
+def _upload_payload(i: int):
+    return {'file': (BytesIO(f"bench upload {i}".encode()), f"bench_{time.time_ns()}_{i}.txt")}
+
+
+def bench_test_client(app, ds: Dataset, iterations: int, warmup: int) -> dict:
+    results = {}
+    clients = {}
+    for name, user, method, path in scenarios(ds):
+        client = clients.get(user)
+        if client is None:
+            client = clients[user] = app.test_client()
+            client.post('/login', json={'username': user, 'password': PASSWORD})
+        samples = []
+        start_all = time.perf_counter()
+        for i in range(warmup + iterations):
+            t0 = time.perf_counter()
+            if method == 'POST':
+                rv = client.post(path, data=_upload_payload(i), content_type='multipart/form-data')
+            else:
+                rv = client.get(path)
+            rv.get_data()
+            if rv.status_code >= 400:
+                raise RuntimeError(f"{name}: {path} returned {rv.status_code}")
+            if i == warmup - 1:
+                start_all = time.perf_counter()
+            if i >= warmup:
+                samples.append(time.perf_counter() - t0)
+        results[f"client:{name}"] = summarize(samples, time.perf_counter() - start_all)
+    return results
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def bench_wsgi(app, ds: Dataset, iterations: int, concurrency: int) -> dict:
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=_QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    results = {}
+    try:
+        sessions = {}
+        for _, user, _, _ in scenarios(ds):
+            if user not in sessions:
+                sessions[user] = [requests.Session() for _ in range(concurrency)]
+                for s in sessions[user]:
+                    s.post(f"{base}/login", json={'username': user, 'password': PASSWORD}).raise_for_status()
+
+        for name, user, method, path in scenarios(ds):
+            pool = sessions[user]
+
+            def one(i):
+                s = pool[i % concurrency]
+                t0 = time.perf_counter()
+                if method == 'POST':
+                    body, filename = _upload_payload(i)['file']
+                    rv = s.post(base + path, files={'file': (filename, body)})
+                else:
+                    rv = s.get(base + path)
+                rv.raise_for_status()
+                return time.perf_counter() - t0
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as ex:
+                samples = list(ex.map(one, range(iterations)))
+            results[f"wsgi:{name}"] = summarize(samples, time.perf_counter() - start)
+    finally:
+        server.shutdown()
+        thread.join()
+    return results
+
+
+def run(app, ds: Dataset, spec: TenantSpec, iterations: int = 30, warmup: int = 3,
+        concurrency: int = 4, wsgi: bool = True) -> dict:
+    results = bench_test_client(app, ds, iterations, warmup)
+    if wsgi:
+        results.update(bench_wsgi(app, ds, iterations, concurrency))
+    return {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'database': app.config['SQLALCHEMY_DATABASE_URI'].split('://')[0],
+            'spec': asdict(spec),
+            'counts': ds.counts,
+            'iterations': iterations,
+            'concurrency': concurrency,
+        },
+        'results': results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.25,
+            metric: str = 'p50_ms') -> list[str]:
+    """Scenarios whose *metric* regressed by more than *tolerance* vs. *baseline*."""
+    regressions = []
+    for key, base in baseline.get('results', {}).items():
+        now = current['results'].get(key)
+        if not now or not base.get(metric):
+            continue
+        ratio = now[metric] / base[metric]
+        if ratio > 1 + tolerance:
+            regressions.append(f"{key}: {metric} {base[metric]:.2f} → {now[metric]:.2f} ({ratio:.2f}×)")
+    return regressions
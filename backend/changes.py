@@ -0,0 +1,255 @@
+# backend/changes.py
+"""
+Change feed for incremental client sync.
+
+Every flush that creates, modifies or deletes a File, Folder, FileVersion or
+DocumentReview appends rows to ``change_log`` on the same connection, so the
+outbox commits (or rolls back) together with the change itself.  Each row
+names its audience: the owner of a folder/file/version, both parties of a
+review, or NULL (everyone) for files that are or were published.  Of a
+published file only the current version's upserts are public, as older
+versions are not readable by others; their comment, hash and size go to the
+owner alone (tombstones carry no data and stay public).  Bulk
+deletes that bypass the ORM (retention sweep, fsck repair) record their
+tombstones through ``record_version_deletes``.
+
+``GET /changes?since=<cursor>`` reads ``id > since`` for the caller's
+audience in id order, collapses repeated changes to the same entity within
+the page to the newest one, and hands back the cursor to resume from.
+Rows younger than CHANGES_SETTLE_SECONDS are held back: ids are assigned at
+insert but transactions commit in any order, so a reader racing a slow
+commit could otherwise move its cursor past an id that is not visible yet.
+
+``compact()`` keeps the log small: rows superseded by a newer row for the
+same audience and entity are dropped once older than
+CHANGES_COLLAPSE_AFTER_HOURS (a client behind them sees the newer row
+anyway), and rows older than CHANGES_RETENTION_DAYS are dropped outright.
+The highest expired id becomes the floor; cursors below it get
+``410 {"resync": true}`` and must re-list before following the feed again.
+"""
+from __future__ import annotations
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event, func, or_, select, tuple_
+
+from .background import run_periodically
+from .models import (db, ChangeCompaction, ChangeLog, DocumentReview, File, FileVersion,
+                     Folder, User)
+from .pagination import BadCursor, decode_cursor, encode_cursor
+from .routing import RoutingSession
+
+# Attributes whose change is worth telling clients about, per entity
+TRACKED = {
+    File: ('file', ('filename', 'mimetype', 'folder_id', 'current_version',
+                    'is_under_review', 'is_published', 'owner_id')),
+    Folder: ('folder', ('name', 'parent_id', 'owner_id')),
+    FileVersion: ('version', ('file_id', 'version_number', 'size', 'sha256', 'comment')),
+    DocumentReview: ('review', ('file_id', 'status', 'reviewer_id', 'requester_id',
+                                'original_version', 'modified_version')),
+}
+EVERYONE = None
+
+
+class CursorExpired(Exception):
+    """The cursor points below the compaction floor; the client must resync."""
+
+    def __init__(self, head: str):
+        super().__init__("cursor is older than the retained change log")
+        self.head = head
+
+
+# ── writing ──
+def _snapshot(obj, fields) -> dict:
+    return {f: getattr(obj, f) for f in fields}
+
+
+def _changed(obj, fields) -> bool:
+    state = db.inspect(obj)
+    return any(state.attrs[f].history.has_changes() for f in fields)
+
+
+def _was_published(obj) -> bool:
+    hist = db.inspect(obj).attrs.is_published.history
+    return bool(obj.is_published) or any(hist.deleted)
+
+
+class FileOwners:
+    """
+    (owner_id, published, current_version) of the files a flush touches, from
+    the session or one lookup each.
+    """
+
+    def __init__(self, session, objects=()):
+        self.session = session
+        self.known = {o.id: (o.owner_id, _was_published(o), o.current_version)
+                      for o in objects if isinstance(o, File)}
+        self.known.update((o.id, (o.owner_id, bool(o.is_published), o.current_version))
+                          for o in session.identity_map.values()
+                          if isinstance(o, File) and o.id not in self.known)
+
+    def of(self, version) -> tuple:
+        if version.file_id not in self.known:
+            row = self.session.connection().execute(
+                select(File.owner_id, File.is_published, File.current_version)
+                .where(File.id == version.file_id)).first()
+            if row is None:      # file row already gone: the path starts with the owner
+                owner = self.session.connection().execute(
+                    select(User.id).where(User.username == version.path.split('/', 1)[0])).scalar()
+                row = (owner, False, None)
+            self.known[version.file_id] = (row[0], bool(row[1]), row[2])
+        return self.known[version.file_id]
+
+
+def _audience(obj, op: str, files: FileOwners) -> list:
+    if isinstance(obj, File):
+        return [EVERYONE] if _was_published(obj) else [obj.owner_id]
+    if isinstance(obj, Folder):
+        return [obj.owner_id]
+    if isinstance(obj, FileVersion):
+        owner, published, current = files.of(obj)
+        public = published and (op == 'delete' or obj.version_number == current)
+        return [EVERYONE] if public else [owner]
+    return sorted({obj.requester_id, obj.reviewer_id})
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _record_flush(session, flush_context):
+    pending = []
+    for obj in session.new:
+        if type(obj) in TRACKED:
+            pending.append((obj, 'upsert'))
+    for obj in session.dirty:
+        if type(obj) in TRACKED and _changed(obj, TRACKED[type(obj)][1]):
+            pending.append((obj, 'upsert'))
+    for obj in session.deleted:
+        if type(obj) in TRACKED:
+            pending.append((obj, 'delete'))
+    if not pending:
+        return
+
+    files = FileOwners(session, [obj for obj, _ in pending])
+    now = datetime.utcnow()
+    rows = []
+    for obj, op in pending:
+        entity, fields = TRACKED[type(obj)]
+        data = _snapshot(obj, fields) if op == 'upsert' else None
+        rows.extend({'user_id': user_id, 'entity': entity, 'entity_id': obj.id, 'op': op,
+                     'data': data, 'created_at': now}
+                    for user_id in _audience(obj, op, files))
+    session.connection().execute(ChangeLog.__table__.insert(), rows)
+
+
+def record_version_deletes(version_ids) -> int:
+    """Tombstone versions about to be removed by a bulk DELETE; call before it, same transaction."""
+    version_ids = list(version_ids)
+    if not version_ids:
+        return 0
+    now = datetime.utcnow()
+    rows = [{'user_id': EVERYONE if published else owner, 'entity': 'version',
+             'entity_id': vid, 'op': 'delete', 'data': None, 'created_at': now}
+            for vid, owner, published in
+            db.session.query(FileVersion.id, File.owner_id, File.is_published)
+                      .join(File, File.id == FileVersion.file_id)
+                      .filter(FileVersion.id.in_(version_ids))]
+    if rows:
+        db.session.execute(ChangeLog.__table__.insert(), rows)
+    return len(rows)
+
+
+# ── reading ──
+def floor() -> int:
+    return db.session.query(func.coalesce(func.max(ChangeCompaction.floor_id), 0)).scalar()
+
+
+def _settled(q):
+    settle = current_app.config['CHANGES_SETTLE_SECONDS']
+    if settle > 0:
+        q = q.filter(ChangeLog.created_at <= datetime.utcnow() - timedelta(seconds=settle))
+    return q
+
+
+def head_cursor() -> str:
+    head = _settled(db.session.query(func.max(ChangeLog.id))).scalar()
+    return encode_cursor({'seq': max(head or 0, floor())})
+
+
+def feed(user_id: int, cursor: str | None, limit: int) -> dict:
+    """One page of *user_id*'s changes after *cursor*; no cursor returns just the head."""
+    data = decode_cursor(cursor)
+    if data is None:
+        return {'changes': [], 'cursor': head_cursor(), 'has_more': False}
+    since = data.get('seq')
+    if not isinstance(since, int) or since < 0:
+        raise BadCursor("cursor must carry a sequence number")
+    if since < floor():
+        raise CursorExpired(head_cursor())
+
+    rows = (_settled(ChangeLog.query)
+            .filter(or_(ChangeLog.user_id == user_id, ChangeLog.user_id.is_(None)),
+                    ChangeLog.id > since)
+            .order_by(ChangeLog.id).limit(limit + 1).all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    latest = {}
+    for row in rows:                       # later rows win; dict keeps first-seen order
+        latest.pop((row.entity, row.entity_id), None)
+        latest[(row.entity, row.entity_id)] = row
+    return {
+        'changes': [{'seq': r.id, 'entity': r.entity, 'id': r.entity_id, 'op': r.op, 'data': r.data}
+                    for r in latest.values()],
+        'cursor': encode_cursor({'seq': rows[-1].id if rows else since}),
+        'has_more': has_more,
+    }
+
+
+# ── compaction ──
+def compact(now: datetime | None = None, batch_size: int = 1000) -> dict:
+    """Collapse superseded entries, expire old ones and raise the floor; run in an app context."""
+    now = now or datetime.utcnow()
+    config = current_app.config
+    expire_before = now - timedelta(days=config['CHANGES_RETENTION_DAYS'])
+    collapse_before = now - timedelta(hours=config['CHANGES_COLLAPSE_AFTER_HOURS'])
+
+    new_floor = (db.session.query(func.max(ChangeLog.id))
+                 .filter(ChangeLog.created_at < expire_before).scalar())
+    expired = 0
+    if new_floor is not None:
+        expired = db.session.execute(ChangeLog.__table__.delete()
+                                     .where(ChangeLog.id <= new_floor)).rowcount
+
+    collapsed, last_id = 0, 0
+    while True:
+        batch = (db.session.query(ChangeLog.id, ChangeLog.user_id, ChangeLog.entity,
+                                  ChangeLog.entity_id)
+                 .filter(ChangeLog.id > last_id, ChangeLog.created_at < collapse_before)
+                 .order_by(ChangeLog.id).limit(batch_size).all())
+        if not batch:
+            break
+        last_id = batch[-1].id
+        keys = {(r.entity, r.entity_id) for r in batch}
+        newest = {(r.user_id, r.entity, r.entity_id): r.newest for r in
+                  db.session.query(ChangeLog.user_id, ChangeLog.entity, ChangeLog.entity_id,
+                                   func.max(ChangeLog.id).label('newest'))
+                  .filter(tuple_(ChangeLog.entity, ChangeLog.entity_id).in_(keys))
+                  .group_by(ChangeLog.user_id, ChangeLog.entity, ChangeLog.entity_id)}
+        doomed = [r.id for r in batch if r.id < newest[(r.user_id, r.entity, r.entity_id)]]
+        if doomed:
+            db.session.execute(ChangeLog.__table__.delete().where(ChangeLog.id.in_(doomed)))
+            collapsed += len(doomed)
+        db.session.commit()
+
+    db.session.add(ChangeCompaction(ran_at=now, floor_id=max(new_floor or 0, floor()),
+                                    collapsed=collapsed, expired=expired))
+    db.session.commit()
+    return {'collapsed': collapsed, 'expired': expired, 'floor': floor()}
+
+
+def init_compactor(app):
+    """Compact every CHANGES_COMPACT_INTERVAL seconds (0 = only via `flask compact-changes`)."""
+    def _compact():
+        result = compact()
+        app.logger.info(f"change log compaction: {result['collapsed']} collapsed, "
+                        f"{result['expired']} expired")
+    run_periodically(app, 'change-compactor', _compact, app.config.get('CHANGES_COMPACT_INTERVAL', 0))
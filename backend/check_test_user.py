@@ -1,7 +1,8 @@
-from app import app, db
+from app import create_app, db
 from models import User, File, Folder
 
 def check_test_user():  # pragma: no cover
+    app = create_app()
     with app.app_context():
         # Find test user
         test_user = User.query.filter_by(username='test').first()
@@ -0,0 +1,153 @@
+# backend/cli.py
+"""
+Flask CLI commands (``flask --app backend.app <command>``).
+
+Anything that touches the database at start-up lives here instead of in
+create_app(), so workers boot without a round-trip to MySQL.
+"""
+import click
+from flask import current_app
+
+from .models import db
+from .init_db import create_admin_and_test_users
+from .models import User
+from . import backup, changes, fsck, layout, retention, stats
+
+
+@click.command('init-db')
+def init_db_command():
+    """Create all tables that do not exist yet."""
+    db.create_all()
+    click.echo("✅ tables created")
+
+
+@click.command('seed-users')
+def seed_users_command():
+    """Create the default admin and test users (idempotent)."""
+    create_admin_and_test_users(current_app._get_current_object(), db)
+
+
+@click.command('retention-sweep')
+@click.option('--dry-run', is_flag=True, help='Report reclaimable bytes without deleting.')
+@click.option('--user', 'username', help='Only sweep this user\'s files.')
+def retention_sweep_command(dry_run, username):
+    """Apply the version retention policy to stored versions."""
+    user_id = None
+    if username:
+        user = User.query.filter_by(username=username).first()
+        if not user:
+            raise click.ClickException(f"no such user: {username}")
+        user_id = user.id
+    report = retention.sweep(dry_run=dry_run, user_id=user_id)
+    for name, entry in sorted(report.per_user.items()):
+        click.echo(f"{name:30s} {entry['versions']:8d} versions {entry['bytes']:14d} bytes")
+    verb = "reclaimable" if dry_run else "reclaimed"
+    click.echo(f"{report.versions_deleted} versions, {report.bytes_reclaimed} bytes {verb} "
+               f"across {report.files_scanned} files")
+
+
+@click.command('shard-versions')
+@click.option('--batch-size', default=500, show_default=True, help='Versions per DB batch.')
+@click.option('--workers', default=8, show_default=True, help='Parallel blob copies.')
+@click.option('--start-id', default=0, help='Resume after this FileVersion id.')
+def shard_versions_command(batch_size, workers, start_id):
+    """Move flat .version blobs into the hash-sharded layout (safe to re-run)."""
+    def progress(r):
+        click.echo(f"…up to id {r.last_id}: {r.moved} moved, {r.missing} missing, {r.failed} failed")
+    report = layout.migrate_version_layout(batch_size=batch_size, workers=workers,
+                                           start_id=start_id, progress=progress)
+    click.echo(f"{report.scanned} versions scanned, {report.moved} moved, "
+               f"{report.already_sharded} already sharded, {report.missing} missing blobs, "
+               f"{report.failed} failed")
+
+
+@click.command('relativize-paths')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per DB batch.')
+def relativize_paths_command(batch_size):
+    """Rewrite stored File/FileVersion paths as storage-relative keys (safe to re-run)."""
+    report = layout.migrate_storage_keys(batch_size=batch_size)
+    click.echo(f"{report.scanned} rows scanned, {report.rewritten} rewritten, "
+               f"{report.outside_root} outside the storage root")
+
+
+@click.command('export-snapshot')
+@click.argument('out', type=click.File('wb'))
+@click.option('--user', 'username', help='Only this user\'s workspace (default: whole tenant).')
+@click.option('--since', default=0, show_default=True, help='Only versions newer than this snapshot id.')
+@click.option('--workers', default=8, show_default=True, help='Parallel blob reads.')
+def export_snapshot_command(out, username, since, workers):
+    """Write a snapshot archive (rows + blobs) to OUT ('-' for stdout)."""
+    user = None
+    if username:
+        user = User.query.filter_by(username=username).first()
+        if not user:
+            raise click.ClickException(f"no such user: {username}")
+    manifest = backup.export_to(out, user=user, since=since, workers=workers)
+    rows = manifest['rows']
+    click.echo(f"snapshot {manifest['snapshot_id']}: {rows.get('files', 0)} files, "
+               f"{rows.get('versions', 0)} versions", err=True)
+
+
+@click.command('import-snapshot')
+@click.argument('archive', type=click.File('rb'))
+def import_snapshot_command(archive):
+    """Restore a snapshot archive written by export-snapshot or GET /export."""
+    try:
+        report = backup.import_from(archive)
+    except backup.BackupError as e:
+        raise click.ClickException(str(e))
+    for key, n in report.inserted.items():
+        click.echo(f"{key:10s} {n:8d} inserted {report.updated[key]:8d} updated")
+    click.echo(f"snapshot {report.snapshot_id}: {report.blobs} blobs written, "
+               f"{report.live_restored} live files restored, {report.missing_blobs} blobs missing")
+
+
+@click.command('compact-changes')
+def compact_changes_command():
+    """Collapse superseded change-feed entries and expire old ones."""
+    result = changes.compact()
+    click.echo(f"{result['collapsed']} collapsed, {result['expired']} expired, "
+               f"cursors below {result['floor']} must resync")
+
+
+@click.command('reconcile-stats')
+def reconcile_stats_command():
+    """Recompute the statistics and folder rollups from the source tables."""
+    fixed = stats.reconcile()
+    click.echo(f"review keys fixed: {fixed['reviews']}  storage keys fixed: {fixed['storage']}  "
+               f"folder keys fixed: {fixed['folders']}")
+
+
+@click.command('fsck')
+@click.option('--repair', is_flag=True, help='Fix sizes, restore live files, drop dead version rows.')
+@click.option('--quarantine', is_flag=True, help='Move orphaned blobs to UPLOAD_FOLDER/.quarantine/.')
+@click.option('--workers', default=16, show_default=True, help='Parallel directory scanners.')
+@click.option('--batch-size', default=1000, show_default=True, help='DB rows per batch.')
+@click.option('--verbose', '-v', is_flag=True, help='List sample paths for every finding.')
+def fsck_command(repair, quarantine, workers, batch_size, verbose):
+    """Compare stored blobs with File/FileVersion rows."""
+    report = fsck.run(repair=repair, quarantine=quarantine, workers=workers, batch_size=batch_size)
+    click.echo(f"{report.blobs_scanned} blobs ({report.bytes_scanned} bytes), {report.rows_scanned} rows")
+    click.echo(f"orphans: {report.orphans} ({report.orphan_bytes} bytes)  missing: {report.missing}  "
+               f"size mismatches: {report.size_mismatches}")
+    if verbose:
+        for kind, items in report.samples.items():
+            for item in items:
+                click.echo(f"  {kind:8s} {item}")
+    if repair or quarantine:
+        click.echo(f"repaired: {report.repaired}  quarantined: {report.quarantined}")
+    elif report.orphans or report.missing or report.size_mismatches:
+        raise SystemExit(1)
+
+
+def register_commands(app):
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(seed_users_command)
+    app.cli.add_command(retention_sweep_command)
+    app.cli.add_command(shard_versions_command)
+    app.cli.add_command(relativize_paths_command)
+    app.cli.add_command(export_snapshot_command)
+    app.cli.add_command(import_snapshot_command)
+    app.cli.add_command(compact_changes_command)
+    app.cli.add_command(reconcile_stats_command)
+    app.cli.add_command(fsck_command)
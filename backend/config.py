@@ -1,4 +1,8 @@
+from __future__ import annotations
 import os
+from dotenv import load_dotenv
+
+load_dotenv()
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key')
@@ -17,10 +21,116 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Connection pool (ignored for SQLite, which uses its own pool classes)
+    DB_POOL_SIZE      = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW   = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT   = int(os.getenv("DB_POOL_TIMEOUT", 30))      # seconds to wait for a free connection
+    DB_POOL_RECYCLE   = int(os.getenv("DB_POOL_RECYCLE", 1800))    # below MySQL wait_timeout
+    DB_POOL_PRE_PING  = os.getenv("DB_POOL_PRE_PING", "1") != "0"
+
+    # Optional read replica for the read-only listing endpoints
+    DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+    REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", 5))  # read-your-writes window
+
     # Session Configuration for better isolation
     SESSION_COOKIE_NAME = "session"
     SESSION_COOKIE_SAMESITE = "Lax"
     SESSION_COOKIE_SECURE = False
     SESSION_COOKIE_HTTPONLY = True
-    PERMANENT_SESSION_LIFETIME = 3600  # 1 hour
-    SESSION_TYPE = 'filesystem'  # Store sessions on filesystem instead of cookies
\ No newline at end of file
+    PERMANENT_SESSION_LIFETIME = 3600  # 1 hour, also the server-side session TTL
+
+    # Where sessions live (see sessions.py): "cookie" (signed cookie, Flask's default),
+    # or server-side in "memory" (one process), "sqlite" (one file) or "redis" (shared by replicas)
+    SESSION_TYPE        = os.getenv("SESSION_TYPE", "cookie")
+    SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", "sessions.db")
+    SESSION_REDIS_URL   = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+    SESSION_KEY_PREFIX  = os.getenv("SESSION_KEY_PREFIX", "session:")
+
+    # Probes (see health.py): per-check timeout for /readyz and what warm-up pre-loads
+    HEALTH_CHECK_TIMEOUT  = float(os.getenv("HEALTH_CHECK_TIMEOUT", 2))   # seconds
+    WARMUP_DB_CONNECTIONS = int(os.getenv("WARMUP_DB_CONNECTIONS", 5))     # per engine, capped at DB_POOL_SIZE
+    WARMUP_HOT_FILES      = int(os.getenv("WARMUP_HOT_FILES", 50))         # published files preloaded, 0 = none
+
+    # Prometheus: how often DB-backed gauges (pending reviews, bytes per tier…) refresh
+    METRICS_COLLECTOR_INTERVAL = int(os.getenv("METRICS_COLLECTOR_INTERVAL", 30))
+
+    # Version retention (see retention.py); a version is kept if any rule keeps it
+    VERSION_KEEP_LAST         = int(os.getenv("VERSION_KEEP_LAST", 10))
+    VERSION_KEEP_DAILY_DAYS   = int(os.getenv("VERSION_KEEP_DAILY_DAYS", 30))
+    VERSION_KEEP_WEEKLY_WEEKS = int(os.getenv("VERSION_KEEP_WEEKLY_WEEKS", 52))
+    RETENTION_BATCH_SIZE      = int(os.getenv("RETENTION_BATCH_SIZE", 500))   # files per sweep batch
+    RETENTION_SWEEP_INTERVAL  = int(os.getenv("RETENTION_SWEEP_INTERVAL", 0))  # seconds, 0 = CLI only
+
+    # Change feed (see changes.py)
+    CHANGES_SETTLE_SECONDS       = float(os.getenv("CHANGES_SETTLE_SECONDS", 2))   # hide entries younger than this
+    CHANGES_COLLAPSE_AFTER_HOURS = int(os.getenv("CHANGES_COLLAPSE_AFTER_HOURS", 24))
+    CHANGES_RETENTION_DAYS       = int(os.getenv("CHANGES_RETENTION_DAYS", 30))    # older cursors must resync
+    CHANGES_COMPACT_INTERVAL     = int(os.getenv("CHANGES_COMPACT_INTERVAL", 3600))  # seconds, 0 = CLI only
+
+    # Text extraction for non-text formats (see extract.py)
+    EXTRACT_WORKERS    = int(os.getenv("EXTRACT_WORKERS", 2))        # worker processes, 0 = inline
+    EXTRACT_TIME_LIMIT = float(os.getenv("EXTRACT_TIME_LIMIT", 30))  # seconds per job
+    EXTRACT_MEMORY_MB  = int(os.getenv("EXTRACT_MEMORY_MB", 512))    # extra address space per worker
+    EXTRACT_MAX_BYTES  = int(os.getenv("EXTRACT_MAX_BYTES", 50 * 1024 * 1024))
+    EXTRACT_MAX_CHARS  = int(os.getenv("EXTRACT_MAX_CHARS", 2_000_000))
+
+    # Thumbnails and page previews (see previews.py)
+    PREVIEW_SIZES        = (64, 128, 256, 512)
+    PREVIEW_WORKERS      = int(os.getenv("PREVIEW_WORKERS", 4))           # concurrent renders per worker
+    PREVIEW_WAIT_SECONDS = float(os.getenv("PREVIEW_WAIT_SECONDS", 5))    # then 202 and retry
+    PREVIEW_MAX_BYTES    = int(os.getenv("PREVIEW_MAX_BYTES", 40 * 1024 * 1024))  # larger images get no thumbnail
+
+    # Archive upload (see archive.py); single entries are capped at MAX_CONTENT_LENGTH
+    ARCHIVE_MAX_BYTES          = int(os.getenv("ARCHIVE_MAX_BYTES", 1024 * 1024 * 1024))           # request body
+    ARCHIVE_MAX_EXPANDED_BYTES = int(os.getenv("ARCHIVE_MAX_EXPANDED_BYTES", 4 * 1024 * 1024 * 1024))
+    ARCHIVE_MAX_ENTRIES        = int(os.getenv("ARCHIVE_MAX_ENTRIES", 10_000))
+    ARCHIVE_MAX_RATIO          = float(os.getenv("ARCHIVE_MAX_RATIO", 100))    # unpacked : packed
+    ARCHIVE_BATCH_SIZE         = int(os.getenv("ARCHIVE_BATCH_SIZE", 500))     # rows per INSERT
+
+    # Admin statistics rollups (see stats.py)
+    STATS_RECONCILE_INTERVAL = int(os.getenv("STATS_RECONCILE_INTERVAL", 3600))  # seconds, 0 = CLI only
+
+    # Per-request SQL accounting (see query_stats.py)
+    QUERY_STATS_ENABLED  = os.getenv("QUERY_STATS_ENABLED", "1") != "0"
+    QUERY_STATS_HEADERS  = False   # X-DB-Query-* headers; always on when app.debug
+    SLOW_QUERY_MS        = int(os.getenv("SLOW_QUERY_MS", 200))
+    N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", 10))  # same statement shape per request
+
+    # "direct": Flask streams file bytes; "accel": reply with X-Accel-Redirect and let
+    # nginx send the file from its internal ACCEL_REDIRECT_PREFIX location (local storage)
+    DOWNLOAD_MODE         = os.getenv("DOWNLOAD_MODE", "direct")
+    ACCEL_REDIRECT_PREFIX = os.getenv("ACCEL_REDIRECT_PREFIX", "/_protected/")
+
+    # Hot-document byte cache for published files (see hot_cache.py), per worker
+    HOT_CACHE_MAX_BYTES      = int(os.getenv("HOT_CACHE_MAX_BYTES", 64 * 1024 * 1024))  # 0 disables
+    HOT_CACHE_MAX_ITEM_BYTES = int(os.getenv("HOT_CACHE_MAX_ITEM_BYTES", 1024 * 1024))
+    HOT_CACHE_ADMIT_AFTER    = int(os.getenv("HOT_CACHE_ADMIT_AFTER", 2))   # requests before caching
+
+    # Blob storage (see storage.py): "local" filesystem or "s3" (AWS / MinIO / any S3 API)
+    STORAGE_BACKEND         = os.getenv("STORAGE_BACKEND", "local")
+    S3_BUCKET               = os.getenv("S3_BUCKET", "docs")
+    S3_ENDPOINT_URL         = os.getenv("S3_ENDPOINT_URL")        # e.g. http://minio:9000
+    S3_REGION               = os.getenv("S3_REGION", "us-east-1")
+    S3_ACCESS_KEY           = os.getenv("S3_ACCESS_KEY")
+    S3_SECRET_KEY           = os.getenv("S3_SECRET_KEY")
+    S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", 50))
+    S3_MULTIPART_THRESHOLD  = int(os.getenv("S3_MULTIPART_THRESHOLD", 8 * 1024 * 1024))
+    S3_MULTIPART_CHUNKSIZE  = int(os.getenv("S3_MULTIPART_CHUNKSIZE", 8 * 1024 * 1024))
+
+    # Google OAuth (client is registered lazily on first login attempt)
+    GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID", "your-google-client-id")
+    GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET", "your-google-client-secret")
+    FRONTEND_PORT = os.getenv("FRONTEND_PORT", 80)
+
+
+def engine_options(uri: str | None, config) -> dict:
+    """SQLAlchemy create_engine() kwargs for *uri* built from the DB_POOL_* settings."""
+    if not uri or str(uri).startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+    }
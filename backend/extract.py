@@ -0,0 +1,426 @@
+# backend/extract.py
+"""
+Plain-text and metadata extraction for formats that are not text already.
+
+After an upload (``_create_file`` / ``_add_version``) the new blob is queued
+here if an extractor is registered for its extension.  A dispatcher thread
+reads the blob and hands the bytes to a process pool, so a pathological PDF
+burns a worker process instead of a request thread.  Each job runs under
+EXTRACT_TIME_LIMIT seconds (interval timer in the worker, plus a parent-side
+deadline) and its worker under EXTRACT_MEMORY_MB of extra address space
+(RLIMIT_AS above the forked baseline).  Blobs over EXTRACT_MAX_BYTES are
+recorded as skipped; text is cut at EXTRACT_MAX_CHARS.
+
+Results are cached per content hash: the outcome goes to ExtractedContent,
+the text to storage under ``.derived/text/``.  Identical content uploaded
+again — another copy, a restore, a reverted edit — is never parsed twice.
+Readers ask ``lookup()``; a missing entry (older uploads, a job lost with its
+process) is queued on demand and reported as pending.
+
+Extractors are plain functions ``bytes → (text, meta)`` registered with
+``@extractor('.ext', …)`` and use only the standard library, so the pool
+needs nothing beyond what the app already imports.  EXTRACT_WORKERS = 0
+runs jobs inline in the calling thread without limits (tests, debugging).
+"""
+from __future__ import annotations
+import csv
+import io
+import os
+import re
+import signal
+import threading
+import zipfile
+import zlib
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from html.parser import HTMLParser
+from xml.etree import ElementTree
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from .layout import derived_path
+from .models import db, ExtractedContent
+from .storage import StorageError, storage
+
+EXTRACTORS: dict[str, tuple[str, callable]] = {}
+TEXT_NAME = 'text.txt'
+
+
+class ExtractTimeout(Exception):
+    pass
+
+
+def extractor(*extensions: str):
+    """Register ``fn(data: bytes) -> (text, meta)`` for these file extensions."""
+    def register(fn):
+        for ext in extensions:
+            EXTRACTORS[ext] = (fn.__name__, fn)
+        return fn
+    return register
+
+
+def supported(filename: str) -> bool:
+    return os.path.splitext(filename)[1].lower() in EXTRACTORS
+
+
+# ── extractors ──
+def decode_text(data: bytes) -> str:
+    for encoding in ('utf-8-sig', 'cp1252'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('latin-1')
+
+
+@extractor('.csv', '.tsv')
+def delimited(data: bytes):
+    text = decode_text(data)
+    try:
+        dialect = csv.Sniffer().sniff(text[:8192], delimiters=',;\t|')
+    except csv.Error:
+        dialect = csv.excel
+    rows = list(csv.reader(io.StringIO(text), dialect))
+    return ('\n'.join('\t'.join(row) for row in rows),
+            {'rows': len(rows), 'columns': max((len(r) for r in rows), default=0),
+             'header': rows[0] if rows else []})
+
+
+class _HTMLText(HTMLParser):
+    SKIP = {'script', 'style', 'head'}
+    BREAK = {'p', 'div', 'br', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'title'}
+
+    def __init__(self):
+        super().__init__()
+        self.parts, self.title, self._skip, self._in_title = [], None, 0, False
+
+    def handle_starttag(self, tag, attrs):
+        self._skip += tag in self.SKIP
+        self._in_title = tag == 'title'
+        if tag in self.BREAK:
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag):
+        self._skip -= tag in self.SKIP and self._skip > 0
+        self._in_title = False
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title = data.strip()
+        elif not self._skip:
+            self.parts.append(data)
+
+
+@extractor('.htm', '.xhtml')
+def html(data: bytes):
+    parser = _HTMLText()
+    parser.feed(decode_text(data))
+    text = re.sub(r'\n\s*\n+', '\n\n', ''.join(parser.parts)).strip()
+    return text, {'title': parser.title}
+
+
+_CORE = {'title': '{http://purl.org/dc/elements/1.1/}title',
+         'author': '{http://purl.org/dc/elements/1.1/}creator',
+         'modified': '{http://purl.org/dc/terms/}modified'}
+
+
+def _xml_text(xml: bytes, para_tags: set[str], text_tags: set[str]) -> list[str]:
+    """Paragraphs of *xml*: text of *text_tags* elements, one line per *para_tags* element."""
+    paragraphs, current = [], []
+    for _, elem in ElementTree.iterparse(io.BytesIO(xml)):
+        tag = elem.tag.rsplit('}', 1)[-1]
+        if tag in text_tags and elem.text:
+            current.append(elem.text)
+        elif tag in para_tags:
+            paragraphs.append(''.join(current))
+            current = []
+            elem.clear()
+    if current:
+        paragraphs.append(''.join(current))
+    return paragraphs
+
+
+def _ooxml_meta(zf: zipfile.ZipFile) -> dict:
+    try:
+        root = ElementTree.fromstring(zf.read('docProps/core.xml'))
+    except KeyError:
+        return {}
+    return {k: root.findtext(tag) for k, tag in _CORE.items() if root.findtext(tag)}
+
+
+@extractor('.docx')
+def docx(data: bytes):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        paragraphs = _xml_text(zf.read('word/document.xml'), {'p'}, {'t'})
+        meta = _ooxml_meta(zf)
+    meta['paragraphs'] = sum(1 for p in paragraphs if p)
+    return '\n'.join(paragraphs), meta
+
+
+@extractor('.pptx')
+def pptx(data: bytes):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        slides = sorted((n for n in zf.namelist() if re.fullmatch(r'ppt/slides/slide\d+\.xml', n)),
+                        key=lambda n: int(re.search(r'\d+', n.rsplit('/', 1)[1]).group()))
+        text = '\n\n'.join('\n'.join(_xml_text(zf.read(n), {'p'}, {'t'})) for n in slides)
+        meta = _ooxml_meta(zf)
+    meta['slides'] = len(slides)
+    return text, meta
+
+
+@extractor('.xlsx')
+def xlsx(data: bytes):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        names = zf.namelist()
+        shared = (_xml_text(zf.read('xl/sharedStrings.xml'), {'si'}, {'t'})
+                  if 'xl/sharedStrings.xml' in names else [])
+        sheets = sorted(n for n in names if re.fullmatch(r'xl/worksheets/sheet\d+\.xml', n))
+        lines = []
+        for name in sheets:
+            for row in ElementTree.fromstring(zf.read(name)).iter():
+                if not row.tag.endswith('}row'):
+                    continue
+                cells = []
+                for c in row:
+                    value = c.findtext('{*}v')
+                    if c.get('t') == 's' and value is not None:
+                        value = shared[int(value)]
+                    elif c.get('t') == 'inlineStr':
+                        value = ''.join(t.text or '' for t in c.iter() if t.tag.endswith('}t'))
+                    cells.append(value or '')
+                lines.append('\t'.join(cells))
+        meta = _ooxml_meta(zf)
+    meta.update(sheets=len(sheets), rows=len(lines))
+    return '\n'.join(lines), meta
+
+
+@extractor('.odt', '.ods', '.odp')
+def opendocument(data: bytes):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        paragraphs = []
+        for _, elem in ElementTree.iterparse(io.BytesIO(zf.read('content.xml'))):
+            if elem.tag.rsplit('}', 1)[-1] in ('p', 'h'):
+                paragraphs.append(''.join(elem.itertext()))
+                elem.clear()
+        meta = {}
+        if 'meta.xml' in zf.namelist():
+            root = ElementTree.fromstring(zf.read('meta.xml'))
+            meta = {k: root.findtext(f'.//{tag}') for k, tag in _CORE.items()
+                    if root.findtext(f'.//{tag}')}
+    return '\n'.join(paragraphs), meta
+
+
+_PDF_STREAM = re.compile(rb'<<(.*?)>>\s*stream\r?\n(.*?)\r?\nendstream', re.S)
+_PDF_TEXT = re.compile(rb'\((?:\\.|[^\\)])*\)\s*(?:Tj|\'|")|\[(?:\\.|[^\]\\])*\]\s*TJ|T\*|ET|Td|TD', re.S)
+_PDF_STRING = re.compile(rb'\(((?:\\.|[^\\)])*)\)', re.S)
+_PDF_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f',
+                b'(': b'(', b')': b')', b'\\': b'\\'}
+
+
+def _pdf_string(raw: bytes) -> str:
+    def unescape(m):
+        esc = m.group(1)
+        if esc[:1].isdigit():
+            return bytes([int(esc, 8) & 0xFF])
+        return _PDF_ESCAPES.get(esc, esc)
+    return re.sub(rb'\\([0-7]{1,3}|.)', unescape, raw, flags=re.S).decode('latin-1')
+
+
+@extractor('.pdf')
+def pdf(data: bytes):
+    """Text-showing operators of every content stream; enough for PDFs with simple fonts."""
+    if not data.startswith(b'%PDF'):
+        raise ValueError('not a PDF file')
+    lines, current = [], []
+    for m in _PDF_STREAM.finditer(data):
+        header, body = m.groups()
+        if b'/FlateDecode' in header:
+            try:
+                body = zlib.decompress(body)
+            except zlib.error:
+                continue
+        elif b'/Filter' in header:
+            continue          # images and other encodings carry no text
+        for op in _PDF_TEXT.finditer(body):
+            token = op.group()
+            if token in (b'T*', b'ET', b'Td', b'TD'):
+                if current:
+                    lines.append(''.join(current))
+                    current = []
+            else:
+                current.extend(_pdf_string(s) for s in _PDF_STRING.findall(token))
+    if current:
+        lines.append(''.join(current))
+    meta = {'pages': len(re.findall(rb'/Type\s*/Page(?!s)', data))}
+    for key in ('Title', 'Author'):
+        found = re.search(rb'/' + key.encode() + rb'\s*\(((?:\\.|[^\\)])*)\)', data)
+        if found:
+            meta[key.lower()] = _pdf_string(found.group(1))
+    return '\n'.join(lines), meta
+
+
+# ── worker side ──
+def _limit_memory(extra_mb: int):
+    """Pool initializer: cap this worker's address space at its current size + *extra_mb*."""
+    try:
+        import resource
+        with open('/proc/self/statm') as fh:
+            baseline = int(fh.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (ImportError, OSError, ValueError):
+        return
+    limit = baseline + extra_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _on_alarm(signum, frame):
+    raise ExtractTimeout()
+
+
+def run_job(ext: str, data: bytes, time_limit: float, max_chars: int) -> dict:
+    """Extract *data* with the extractor for *ext*; never raises."""
+    name, fn = EXTRACTORS[ext]
+    timed = time_limit and threading.current_thread() is threading.main_thread()
+    if timed:
+        previous = signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, time_limit)
+    try:
+        text, meta = fn(data)
+    except ExtractTimeout:
+        return {'status': 'failed', 'extractor': name, 'error': f'timed out after {time_limit}s'}
+    except MemoryError:
+        return {'status': 'failed', 'extractor': name, 'error': 'memory limit exceeded'}
+    except Exception as e:
+        return {'status': 'failed', 'extractor': name, 'error': f'{type(e).__name__}: {e}'[:500]}
+    finally:
+        if timed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    meta = {k: v for k, v in (meta or {}).items() if v is not None}
+    if len(text) > max_chars:
+        text, meta['truncated'] = text[:max_chars], True
+    return {'status': 'done', 'extractor': name, 'text': text, 'meta': meta}
+
+
+# ── app side ──
+class Extraction:
+    def __init__(self, app):
+        self.app = app
+        self.workers = app.config['EXTRACT_WORKERS']
+        self._procs: ProcessPoolExecutor | None = None
+        self._dispatch = ThreadPoolExecutor(max_workers=max(1, self.workers),
+                                            thread_name_prefix='extract')
+        self._inflight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._procs is None:
+            self._procs = ProcessPoolExecutor(max_workers=self.workers, initializer=_limit_memory,
+                                              initargs=(self.app.config['EXTRACT_MEMORY_MB'],))
+        return self._procs
+
+    def submit(self, digest: str, key: str, filename: str) -> Future | None:
+        """Queue extraction of the blob at *key* unless it is cached or already queued."""
+        ext = os.path.splitext(filename)[1].lower()
+        if not digest or ext not in EXTRACTORS:
+            return None
+        store = storage._get_current_object()
+        if not self.workers:
+            fut = Future()
+            fut.set_result(self._job(store, digest, key, ext))
+            return fut
+        with self._lock:
+            fut = self._inflight.get(digest)
+            if fut is None:
+                fut = self._inflight[digest] = self._dispatch.submit(self._job, store, digest, key, ext)
+                fut.add_done_callback(lambda _: self._inflight.pop(digest, None))
+        return fut
+
+    def _job(self, store, digest: str, key: str, ext: str) -> str:
+        config = self.app.config
+        with self.app.app_context():
+            try:
+                if db.session.get(ExtractedContent, digest) is not None:
+                    return 'cached'
+                result = self._extract(store, key, ext, config)
+                if result['status'] == 'done':
+                    store.put(derived_path('text', digest, TEXT_NAME), result['text'].encode('utf-8'))
+                db.session.add(ExtractedContent(
+                    sha256=digest, status=result['status'], extractor=result.get('extractor'),
+                    chars=len(result.get('text', '')), meta=result.get('meta'),
+                    error=result.get('error'), extracted_at=datetime.utcnow()))
+                db.session.commit()
+                return result['status']
+            except IntegrityError:          # another worker or replica got there first
+                db.session.rollback()
+                return 'cached'
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception(f"extraction of {digest} failed")
+                return 'error'
+            finally:
+                db.session.remove()
+
+    def _extract(self, store, key: str, ext: str, config) -> dict:
+        try:
+            size = store.size(key)
+            if size > config['EXTRACT_MAX_BYTES']:
+                return {'status': 'skipped', 'error': f'{size} bytes exceeds EXTRACT_MAX_BYTES'}
+            data = store.read(key)
+        except StorageError as e:
+            return {'status': 'failed', 'error': str(e)}
+        limit, max_chars = config['EXTRACT_TIME_LIMIT'], config['EXTRACT_MAX_CHARS']
+        if not self.workers:
+            return run_job(ext, data, 0, max_chars)
+        try:
+            return self._pool().submit(run_job, ext, data, limit, max_chars).result(timeout=limit + 5)
+        except FutureTimeout:
+            return {'status': 'failed', 'error': f'timed out after {limit}s'}
+        except BrokenProcessPool:           # a worker died (killed, segfault); start a fresh pool
+            self._procs = None
+            return {'status': 'failed', 'error': 'extraction worker died'}
+
+    def shutdown(self):
+        self._dispatch.shutdown(wait=False)
+        if self._procs is not None:
+            self._procs.shutdown(wait=False, cancel_futures=True)
+
+
+def init_app(app):
+    app.extensions['extraction'] = Extraction(app)
+
+
+def get_extraction() -> Extraction:
+    return current_app.extensions['extraction']
+
+
+def schedule(version, filename: str) -> Future | None:
+    """Queue a freshly stored version; call after its commit (skipped under TESTING)."""
+    if current_app.config.get('TESTING'):
+        return None
+    return get_extraction().submit(version.sha256, version.path, filename)
+
+
+def lookup(version, filename: str) -> tuple[str, str | None, dict | None]:
+    """``(status, text, meta)`` of *version*: done, failed, skipped, pending or unsupported."""
+    if not supported(filename):
+        return 'unsupported', None, None
+    row = db.session.get(ExtractedContent, version.sha256) if version.sha256 else None
+    if row is None:
+        if not version.sha256 or not get_extraction().submit(version.sha256, version.path, filename):
+            return 'unsupported', None, None
+        row = db.session.get(ExtractedContent, version.sha256)   # set by an inline run
+        if row is None:
+            return 'pending', None, None
+    if row.status != 'done':
+        return row.status, None, {'error': row.error}
+    try:
+        text = storage.read_text(derived_path('text', row.sha256, TEXT_NAME))
+    except StorageError:
+        db.session.delete(row)         # text blob lost: forget the result and extract again
+        db.session.commit()
+        get_extraction().submit(version.sha256, version.path, filename)
+        return 'pending', None, None
+    return 'done', text, dict(row.meta or {}, extractor=row.extractor)
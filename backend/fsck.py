@@ -0,0 +1,172 @@
+# backend/fsck.py
+"""
+Reconcile the database with what is actually in storage.
+
+Three kinds of drift are reported:
+  * orphans     – blobs in storage that no File/FileVersion row references
+                  (e.g. left behind by delete_file / delete_folder),
+  * missing     – rows whose path has no blob (e.g. a rename that moved the
+                  bytes and then failed to commit),
+  * size        – FileVersion.size disagreeing with the blob on disk.
+
+Storage is listed once with ``storage.scan`` (parallel ``os.scandir`` for
+the local driver, paginated listing for S3) into a key → size map, then
+File/FileVersion rows are streamed against it in keyset batches (row paths
+go through ``storage.key``; run ``flask relativize-paths`` first on a database
+that still holds pre-key paths).
+
+With ``repair=True`` sizes are corrected from the blob, a missing live file
+is restored from its current version and version rows without a blob are
+dropped (the current version is kept and reported instead).  With
+``quarantine=True`` orphans are moved under ``<root>/.quarantine/<stamp>/``
+rather than deleted, so a bad run can be undone by moving them back.
+Derived assets under ``.derived/`` are keyed by content hash, not by a row,
+and are left alone.
+Samples report storage keys.
+"""
+from __future__ import annotations
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from sqlalchemy import update
+
+from .changes import record_version_deletes
+from .layout import DERIVED_DIR
+from .models import db, File, FileVersion
+from .stats import forget_versions
+from .storage import StorageError, storage
+
+QUARANTINE_DIR = '.quarantine'
+SAMPLE = 100          # paths kept per category in the report
+GRACE_SECONDS = 300   # blobs younger than this may belong to an upload still committing
+
+
+@dataclass
+class FsckReport:
+    blobs_scanned: int = 0
+    rows_scanned: int = 0
+    bytes_scanned: int = 0
+    orphans: int = 0
+    orphan_bytes: int = 0
+    missing: int = 0
+    size_mismatches: int = 0
+    repaired: int = 0
+    quarantined: int = 0
+    samples: dict = field(default_factory=lambda: {'orphans': [], 'missing': [], 'size': []})
+
+    def note(self, kind: str, item):
+        if len(self.samples[kind]) < SAMPLE:
+            self.samples[kind].append(item)
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+def _norm(path: str) -> str | None:
+    try:
+        return storage.key(path)
+    except StorageError:
+        return None
+
+
+def _referenced(batch_size: int):
+    """Yield (kind, id, path, size, is_current, file_id) for every row, in keyset batches."""
+    last = 0
+    while True:
+        rows = (db.session.query(File.id, File.path).filter(File.id > last)
+                .order_by(File.id).limit(batch_size).all())
+        if not rows:
+            break
+        last = rows[-1].id
+        for r in rows:
+            yield 'file', r.id, r.path, None, True, r.id
+
+    last = 0
+    while True:
+        rows = (db.session.query(FileVersion.id, FileVersion.file_id, FileVersion.path,
+                                 FileVersion.size, FileVersion.version_number, File.current_version)
+                .outerjoin(File, File.id == FileVersion.file_id)
+                .filter(FileVersion.id > last)
+                .order_by(FileVersion.id).limit(batch_size).all())
+        if not rows:
+            break
+        last = rows[-1].id
+        for r in rows:
+            yield 'version', r.id, r.path, r.size, r.version_number == r.current_version, r.file_id
+
+
+def run(repair: bool = False, quarantine: bool = False, workers: int = 8,
+        batch_size: int = 1000, prefix: str = '') -> FsckReport:
+    """Compare storage under the key *prefix* (default: everything) with the DB; run in an app context."""
+    report = FsckReport()
+    started = time.time()
+
+    on_disk: dict[str, int] = {}
+    for key, size in storage.scan(prefix, workers=workers, skip=(QUARANTINE_DIR, DERIVED_DIR)):
+        on_disk[key] = size
+        report.blobs_scanned += 1
+        report.bytes_scanned += size
+
+    seen: set[str] = set()
+    size_fixes, dead_versions, restore_live = [], [], []
+    for kind, row_id, path, size, is_current, file_id in _referenced(batch_size):
+        report.rows_scanned += 1
+        key = _norm(path)
+        seen.add(key)
+        actual = on_disk.get(key) if key is not None else None
+        if actual is None:
+            report.missing += 1
+            report.note('missing', {'kind': kind, 'id': row_id, 'path': path})
+            if kind == 'file':
+                restore_live.append((row_id, path))
+            elif not is_current:
+                dead_versions.append(row_id)
+        elif kind == 'version' and size is not None and size != actual:
+            report.size_mismatches += 1
+            report.note('size', {'id': row_id, 'path': path, 'db': size, 'disk': actual})
+            size_fixes.append({'id': row_id, 'size': actual})
+
+    orphans = []
+    for p in on_disk:
+        if p not in seen:
+            st = storage.stat(p)
+            if st and st.mtime < started - GRACE_SECONDS:
+                orphans.append(p)
+    report.orphans = len(orphans)
+    report.orphan_bytes = sum(on_disk[p] for p in orphans)
+    for p in orphans[:SAMPLE]:
+        report.note('orphans', p)
+
+    if repair:
+        report.repaired += _repair(size_fixes, dead_versions, restore_live, on_disk, batch_size)
+    if quarantine and orphans:
+        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+        for p in orphans:
+            storage.move(p, f'{QUARANTINE_DIR}/{stamp}/{p}')
+            report.quarantined += 1
+    return report
+
+
+def _repair(size_fixes, dead_versions, restore_live, on_disk, batch_size) -> int:
+    fixed = 0
+    for i in range(0, len(size_fixes), batch_size):
+        chunk = size_fixes[i:i + batch_size]
+        db.session.execute(update(FileVersion), chunk)
+        fixed += len(chunk)
+    for i in range(0, len(dead_versions), batch_size):
+        chunk = dead_versions[i:i + batch_size]
+        record_version_deletes(chunk)
+        forget_versions(chunk)
+        db.session.execute(FileVersion.__table__.delete().where(FileVersion.id.in_(chunk)))
+        fixed += len(chunk)
+    for file_id, path in restore_live:
+        current = (db.session.query(FileVersion.path)
+                   .join(File, (File.id == FileVersion.file_id)
+                         & (File.current_version == FileVersion.version_number))
+                   .filter(File.id == file_id).scalar())
+        if current and _norm(current) in on_disk:
+            storage.copy(current, path, immutable=True)
+            fixed += 1
+    db.session.commit()
+    return fixed
@@ -0,0 +1,178 @@
+# backend/health.py
+"""
+Liveness, readiness and warm-up.
+
+``/healthz`` only says the process answers HTTP; it never touches the
+database, so a slow MySQL does not get every pod restarted at once.
+
+``/readyz`` checks what a request needs — the primary (and replica)
+database answer ``SELECT 1`` and storage accepts a write — each bounded by
+HEALTH_CHECK_TIMEOUT, and additionally stays 503 until this worker has
+warmed up.  The first readiness probe starts warm-up in a background thread:
+
+  * pool      – check out WARMUP_DB_CONNECTIONS connections per engine at once
+                and hand them back, so the pool is full before traffic arrives,
+  * indexes   – run the index lookups hot endpoints depend on, pulling those
+                pages into the database's buffer pool,
+  * hot_cache – preload the current content of the most recent published
+                files into the hot-document cache while it has room.
+
+A failing step is reported but does not block readiness; the live checks
+decide whether the pod gets traffic.
+"""
+from __future__ import annotations
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from sqlalchemy import func, text
+
+from . import hot_cache
+from .models import db, DocumentReview, File, FileVersion
+from .routing import REPLICA_EXTENSION
+from .storage import StorageError, storage
+
+PROBE_KEY = '.health/{host}-{pid}'
+_checks = ThreadPoolExecutor(max_workers=4, thread_name_prefix='health')
+
+
+class Warmup:
+    def __init__(self):
+        self.done = threading.Event()
+        self.steps: dict[str, dict] = {}
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self, app):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, args=(app,), name='warmup', daemon=True).start()
+
+    def _run(self, app):
+        with app.app_context():
+            try:
+                for name, step in (('pool', _fill_pools), ('indexes', _prime_indexes),
+                                   ('hot_cache', _prime_hot_cache)):
+                    t0 = time.perf_counter()
+                    try:
+                        self.steps[name] = {'ok': True, 'result': step(app)}
+                    except Exception as e:
+                        db.session.rollback()
+                        self.steps[name] = {'ok': False, 'error': str(e)}
+                    self.steps[name]['ms'] = round((time.perf_counter() - t0) * 1000, 1)
+            finally:
+                db.session.remove()
+                self.done.set()
+
+    def as_dict(self) -> dict:
+        return {'done': self.done.is_set(), 'steps': dict(self.steps)}
+
+
+def _engines(app) -> dict:
+    engines = {'database': db.engine}
+    if app.extensions.get(REPLICA_EXTENSION) is not None:
+        engines['replica'] = app.extensions[REPLICA_EXTENSION]
+    return engines
+
+
+# ── warm-up steps ──
+def _fill_pools(app) -> dict:
+    opened = {}
+    for name, engine in _engines(app).items():
+        n = 1 if engine.dialect.name == 'sqlite' else min(app.config['WARMUP_DB_CONNECTIONS'],
+                                                           app.config['DB_POOL_SIZE'])
+        conns = []
+        try:
+            for _ in range(n):
+                conn = engine.connect()
+                conns.append(conn)
+                conn.execute(text('SELECT 1'))
+        finally:
+            for conn in conns:
+                conn.close()       # back into the pool, still open
+        opened[name] = len(conns)
+    return opened
+
+
+def _prime_indexes(app) -> dict:
+    return {
+        'pending_reviews': db.session.query(func.count(DocumentReview.id))
+                             .filter(DocumentReview.status == 'pending').scalar(),
+        'published_files': db.session.query(func.count(File.id))
+                             .filter(File.is_published.is_(True)).scalar(),
+        'last_version_id': db.session.query(func.max(FileVersion.id)).scalar(),
+    }
+
+
+def _prime_hot_cache(app) -> int:
+    cache = hot_cache.get_cache()
+    if cache is None or not app.config['WARMUP_HOT_FILES']:
+        return 0
+    rows = (db.session.query(File.id, FileVersion.sha256, FileVersion.size, File.path)
+            .join(FileVersion, (FileVersion.file_id == File.id)
+                  & (FileVersion.version_number == File.current_version))
+            .filter(File.is_published.is_(True), FileVersion.sha256.isnot(None),
+                    FileVersion.size > 0, FileVersion.size <= cache.max_item_bytes)
+            .order_by(File.id.desc()).limit(app.config['WARMUP_HOT_FILES']).all())
+    loaded = 0
+    for row in rows:
+        if cache.nbytes + row.size > cache.max_bytes:
+            break
+        try:
+            data = storage.read(row.path)
+        except StorageError:
+            continue
+        loaded += cache.preload(row.sha256, data, row.id)
+    return loaded
+
+
+# ── live checks ──
+def _check_engine(engine):
+    with engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+
+
+def _check_storage(store):
+    key = PROBE_KEY.format(host=socket.gethostname(), pid=os.getpid())
+    store.put(key, b'ok')
+    store.delete(key)
+
+
+def _measured(fn, arg) -> float:
+    t0 = time.perf_counter()
+    fn(arg)
+    return round((time.perf_counter() - t0) * 1000, 1)
+
+
+def _run_checks(jobs: dict, timeout: float) -> dict:
+    """Run ``{name: (fn, arg)}`` concurrently; a check not done within *timeout* fails."""
+    futures = {name: _checks.submit(_measured, fn, arg) for name, (fn, arg) in jobs.items()}
+    deadline = time.monotonic() + timeout
+    results = {}
+    for name, fut in futures.items():
+        try:
+            results[name] = {'ok': True, 'ms': fut.result(timeout=max(0.0, deadline - time.monotonic()))}
+        except FutureTimeout:
+            results[name] = {'ok': False, 'error': f'timed out after {timeout}s'}
+        except Exception as e:
+            results[name] = {'ok': False, 'error': str(e)}
+    return results
+
+
+def get_warmup(app) -> Warmup:
+    return app.extensions.setdefault('warmup', Warmup())
+
+
+def readiness(app) -> dict:
+    """Run the live checks, kick off warm-up if needed; call from a request."""
+    warmup = get_warmup(app)
+    warmup.start(app)
+    jobs = {name: (_check_engine, engine) for name, engine in _engines(app).items()}
+    jobs['storage'] = (_check_storage, storage._get_current_object())
+    checks = _run_checks(jobs, app.config['HEALTH_CHECK_TIMEOUT'])
+    ready = warmup.done.is_set() and all(c['ok'] for c in checks.values())
+    return {'ready': ready, 'checks': checks, 'warmup': warmup.as_dict()}
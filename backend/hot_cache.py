@@ -0,0 +1,163 @@
+# backend/hot_cache.py
+"""
+In-memory cache for the bytes of hot published documents.
+
+A handful of published files (handbooks, templates) take most downloads.
+Their current content is kept in a per-process, size-bounded cache keyed by
+the version's SHA-256, so a hit costs one indexed DB lookup (to learn the
+current digest and check access) and no disk I/O.
+
+Eviction is LRU; admission is frequency-based in the spirit of TinyLFU: a
+blob is only cached once it has been requested HOT_CACHE_ADMIT_AFTER times,
+and when the cache is full it only displaces the LRU victim if it has been
+requested more often than that victim.  Request counts are halved every
+so often so yesterday's hot set fades out.
+
+Because entries are keyed by content hash they can never go stale; changing
+File.current_version / is_published / path or deleting the File drops the
+file's entry only to release memory early.
+"""
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from .domain_metrics import (
+    HOT_CACHE_BYTES, HOT_CACHE_EVICTIONS, HOT_CACHE_HITS, HOT_CACHE_ITEMS, HOT_CACHE_MISSES,
+)
+from .models import File
+
+SKETCH_LIMIT = 10_000      # distinct digests tracked before counts are aged
+
+
+class HotCache:
+    def __init__(self, max_bytes: int, max_item_bytes: int, admit_after: int = 2):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.admit_after = admit_after
+        self._items: OrderedDict[str, bytes] = OrderedDict()
+        self._freq: dict[str, int] = {}
+        self._by_file: dict[int, str] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def get(self, digest: str) -> bytes | None:
+        with self._lock:
+            self._touch(digest)
+            data = self._items.get(digest)
+            if data is not None:
+                self._items.move_to_end(digest)
+        (HOT_CACHE_HITS if data is not None else HOT_CACHE_MISSES).inc()
+        return data
+
+    def wants(self, digest: str, size: int) -> bool:
+        """Whether a blob just missed is worth reading in full to offer to put()."""
+        return (0 < size <= self.max_item_bytes and size <= self.max_bytes
+                and self._freq.get(digest, 0) >= self.admit_after)
+
+    def put(self, digest: str, data: bytes, file_id: int | None = None) -> bool:
+        size = len(data)
+        with self._lock:
+            if digest in self._items or not self.wants(digest, size):
+                return digest in self._items
+            freq = self._freq.get(digest, 0)
+            victims, freed = [], 0
+            for victim, blob in self._items.items():      # oldest first
+                if self._bytes - freed + size <= self.max_bytes:
+                    break
+                if self._freq.get(victim, 0) >= freq:
+                    return False                          # not hotter than what it would displace
+                victims.append(victim)
+                freed += len(blob)
+            for victim in victims:
+                self._drop(victim)
+                HOT_CACHE_EVICTIONS.inc()
+            self._items[digest] = data
+            self._bytes += size
+            if file_id is not None:
+                self._by_file[file_id] = digest
+            self._publish()
+            return True
+
+    def preload(self, digest: str, data: bytes, file_id: int | None = None) -> bool:
+        """Cache *data* ahead of demand (warm-up) if it fits without evicting anything."""
+        size = len(data)
+        with self._lock:
+            if digest in self._items:
+                return False
+            if not 0 < size <= self.max_item_bytes or self._bytes + size > self.max_bytes:
+                return False
+            self._items[digest] = data
+            self._bytes += size
+            if file_id is not None:
+                self._by_file[file_id] = digest
+            self._publish()
+            return True
+
+    def invalidate_file(self, file_id: int):
+        with self._lock:
+            digest = self._by_file.pop(file_id, None)
+            if digest is not None:
+                self._drop(digest)
+                self._publish()
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._by_file.clear()
+            self._freq.clear()
+            self._bytes = 0
+            self._publish()
+
+    # ── internals (lock held) ──
+    def _touch(self, digest):
+        self._freq[digest] = self._freq.get(digest, 0) + 1
+        if len(self._freq) > SKETCH_LIMIT:
+            self._freq = {d: n // 2 for d, n in self._freq.items() if n // 2 or d in self._items}
+
+    def _drop(self, digest):
+        data = self._items.pop(digest, None)
+        if data is not None:
+            self._bytes -= len(data)
+        for fid in [f for f, d in self._by_file.items() if d == digest]:
+            del self._by_file[fid]
+
+    def _publish(self):
+        HOT_CACHE_BYTES.set(self._bytes)
+        HOT_CACHE_ITEMS.set(len(self._items))
+
+
+def get_cache() -> HotCache | None:
+    return current_app.extensions.get('hot_cache') if has_app_context() else None
+
+
+def _forget(target, *_):
+    cache = get_cache()
+    if cache is not None and target.id is not None:
+        cache.invalidate_file(target.id)
+
+
+def _forget_deleted(_mapper, _connection, target):
+    _forget(target)
+
+
+def init_app(app):
+    """Attach a HotCache sized by HOT_CACHE_MAX_BYTES (0 disables it)."""
+    if not app.config.get('HOT_CACHE_MAX_BYTES'):
+        return
+    app.extensions['hot_cache'] = HotCache(app.config['HOT_CACHE_MAX_BYTES'],
+                                           app.config['HOT_CACHE_MAX_ITEM_BYTES'],
+                                           app.config['HOT_CACHE_ADMIT_AFTER'])
+    if not event.contains(File, 'after_delete', _forget_deleted):
+        for attr in (File.current_version, File.is_published, File.path):
+            event.listen(attr, 'set', _forget)
+        event.listen(File, 'after_delete', _forget_deleted)
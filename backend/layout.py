@@ -0,0 +1,205 @@
+# backend/layout.py
+"""
+On-disk layout of version blobs.
+
+Versions used to be written flat into ``<root>/<username>/.version/``;
+heavy users ended up with hundreds of thousands of entries in one
+directory.  New versions go two hash-prefix levels deeper:
+
+    <username>/.version/<h[0:2]>/<h[2:4]>/<name>     h = sha1(name)
+
+which spreads a user's versions over 65 536 leaf directories.  The blob name
+itself is unchanged, so code that derives the original filename from
+``basename(path)`` keeps working.
+
+``migrate_version_layout`` relocates old flat blobs online: it walks
+FileVersion ids in keyset batches, copies each batch's blobs into their
+shard across a thread pool, repoints FileVersion.path (and File.path rows
+that referenced the same blob) with one bulk UPDATE per batch, and only
+then removes the old copies.  Every step is idempotent, so an interrupted
+run simply resumes when started again (``--start-id`` skips ahead).
+
+``migrate_storage_keys`` rewrites paths stored before they became
+storage-relative keys (``uploads/alice/…`` or ``/app/backend/uploads/alice/…``)
+into ``alice/…``.  Only rows change; the blobs stay where they are.  It is
+the only code that strips the root prefix, so usernames that would read as
+that prefix (or as one of the dot-directories below) are refused at signup.
+"""
+from __future__ import annotations
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from sqlalchemy import update
+
+from .models import db, File, FileVersion
+from .storage import StorageError, storage
+
+VERSION_DIR = '.version'
+DERIVED_DIR = '.derived'     # regenerable data computed from blobs, keyed by content hash
+
+
+def reserved_name(name: str) -> bool:
+    """
+    True if *name* cannot be a user-chosen directory: dot-names such as
+    VERSION_DIR belong to the app, and separators would span several levels.
+    """
+    return not name or name.startswith('.') or '/' in name or '\\' in name
+
+
+def reserved_username(name: str, root: str) -> bool:
+    """True if *name* cannot be a top-level user directory under storage *root*."""
+    return reserved_name(name) or name == os.path.basename(os.path.normpath(root))
+
+
+def legacy_key(path: str, root: str) -> str:
+    """The key of a path stored before keys: root-prefixed or absolute under *root*."""
+    root = os.path.normpath(root)
+    if os.path.isabs(path) or path == root or path.startswith(root + os.sep):
+        path = os.path.relpath(os.path.abspath(path), os.path.abspath(root))
+    return storage.key(path)
+
+
+def shard(name: str) -> str:
+    digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+    return os.path.join(digest[:2], digest[2:4])
+
+
+def version_path(username: str, name: str) -> str:
+    """Storage key of the version blob called *name* of *username*."""
+    return os.path.join(username, VERSION_DIR, shard(name), name)
+
+
+def derived_path(kind: str, digest: str, name: str) -> str:
+    """Storage key of the *kind* asset *name* derived from the blob with sha256 *digest*."""
+    return '/'.join((DERIVED_DIR, kind, digest[:2], digest, name))
+
+
+def sharded_path(path: str) -> str:
+    """The sharded equivalent of a flat ``…/.version/<name>`` path (others unchanged)."""
+    parent, name = os.path.split(path)
+    if os.path.basename(parent) != VERSION_DIR:
+        return path
+    return os.path.join(parent, shard(name), name)
+
+
+@dataclass
+class LayoutReport:
+    scanned: int = 0
+    moved: int = 0
+    already_sharded: int = 0
+    missing: int = 0
+    failed: int = 0
+    last_id: int = 0
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+@dataclass
+class KeyReport:
+    scanned: int = 0
+    rewritten: int = 0
+    outside_root: int = 0
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+def _relocate(store, src: str, dst: str) -> str:
+    """Copy *src* into its shard; 'moved', 'resumed' (already copied) or 'missing'."""
+    if store.exists(dst):
+        return 'resumed'
+    if not store.exists(src):
+        return 'missing'
+    store.copy(src, dst, immutable=True)
+    return 'moved'
+
+
+def migrate_version_layout(batch_size: int = 500, workers: int = 8, start_id: int = 0,
+                           progress=None) -> LayoutReport:
+    """Move flat version blobs into the sharded layout; run in an app context."""
+    report = LayoutReport(last_id=start_id)
+    store = storage._get_current_object()   # worker threads have no app context
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            rows = (db.session.query(FileVersion.id, FileVersion.path)
+                    .filter(FileVersion.id > report.last_id)
+                    .order_by(FileVersion.id).limit(batch_size).all())
+            if not rows:
+                break
+            report.last_id = rows[-1].id
+            report.scanned += len(rows)
+
+            todo = []
+            for row in rows:
+                target = sharded_path(row.path)
+                if target == row.path:
+                    report.already_sharded += 1
+                else:
+                    todo.append((row.id, row.path, target))
+
+            futures = [(vid, src, dst, pool.submit(_relocate, store, src, dst))
+                       for vid, src, dst in todo]
+            moves = []
+            for vid, src, dst, fut in futures:
+                try:
+                    outcome = fut.result()
+                except Exception:
+                    report.failed += 1
+                    continue
+                if outcome == 'missing':
+                    report.missing += 1
+                    continue
+                moves.append((vid, src, dst))
+
+            if moves:
+                db.session.execute(update(FileVersion),
+                                   [{'id': vid, 'path': dst} for vid, _, dst in moves])
+                new_for_old = {src: dst for _, src, dst in moves}
+                live = (db.session.query(File.id, File.path)
+                        .filter(File.path.in_(list(new_for_old))).all())
+                if live:
+                    db.session.execute(update(File),
+                                       [{'id': f.id, 'path': new_for_old[f.path]} for f in live])
+                db.session.commit()
+                # readers switch to the new path at commit; the old copies can go now
+                list(pool.map(store.delete, [src for _, src, _ in moves]))
+                report.moved += len(moves)
+            else:
+                db.session.commit()
+
+            if progress:
+                progress(report)
+    return report
+
+
+def migrate_storage_keys(batch_size: int = 1000) -> KeyReport:
+    """Rewrite File/FileVersion paths into storage keys; run in an app context."""
+    report = KeyReport()
+    for model in (File, FileVersion):
+        last = 0
+        while True:
+            rows = (db.session.query(model.id, model.path).filter(model.id > last)
+                    .order_by(model.id).limit(batch_size).all())
+            if not rows:
+                break
+            last = rows[-1].id
+            report.scanned += len(rows)
+            changes = []
+            for row in rows:
+                if row.path is None:
+                    continue
+                try:
+                    key = legacy_key(row.path, storage.root)
+                except StorageError:
+                    report.outside_root += 1
+                    continue
+                if key != row.path:
+                    changes.append({'id': row.id, 'path': key})
+            if changes:
+                db.session.execute(update(model), changes)
+                report.rewritten += len(changes)
+            db.session.commit()
+    return report
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the per-level listing indexes to Folder and File
+"""
+
+from app import create_app, db
+from models import File, Folder
+
+NEW_INDEXES = {"folder": ("ix_folder_parent_name",), "file": ("ix_file_folder_filename",)}
+
+def migrate_folder_indexes():  # pragma: no cover
+    """Create (parent_id, name) and (folder_id, filename) indexes if missing"""
+    app = create_app()
+    with app.app_context():
+        for model in (Folder, File):
+            table = model.__table__
+            existing = {ix['name'] for ix in db.inspect(db.engine).get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in NEW_INDEXES[table.name] and index.name not in existing:
+                    print(f"Creating {index.name}...")
+                    index.create(db.engine)
+        print("Migration completed successfully!")
+
+if __name__ == "__main__":  # pragma: no cover
+    migrate_folder_indexes()
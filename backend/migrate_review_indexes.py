@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the composite review inbox indexes to DocumentReview
+"""
+
+from app import create_app, db
+from models import DocumentReview
+
+NEW_INDEXES = ("ix_review_reviewer_status_requested", "ix_review_requester_status_requested")
+
+def migrate_review_indexes():  # pragma: no cover
+    """Create (reviewer_id|requester_id, status, requested_at) indexes if missing"""
+    app = create_app()
+    with app.app_context():
+        existing = {ix['name'] for ix in db.inspect(db.engine).get_indexes('document_review')}
+        for index in DocumentReview.__table__.indexes:
+            if index.name in NEW_INDEXES and index.name not in existing:
+                print(f"Creating {index.name}...")
+                index.create(db.engine)
+        print("Migration completed successfully!")
+
+if __name__ == "__main__":  # pragma: no cover
+    migrate_review_indexes()
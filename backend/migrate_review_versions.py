@@ -3,10 +3,11 @@
 Migration script to add version tracking fields to DocumentReview table
 """
 
-from app import app, db
+from app import create_app, db
 
 def migrate_review_versions():  # pragma: no cover
     """Add version tracking fields to DocumentReview table"""
+    app = create_app()
     with app.app_context():
         try:
             # Check if columns already exist
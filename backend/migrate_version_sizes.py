@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the size column to FileVersion and backfill it from disk
+"""
+from app import create_app, db
+from models import FileVersion
+from storage import storage
+
+BATCH = 500
+
+def migrate_version_sizes():  # pragma: no cover
+    """Add file_version.size and fill it for rows written before it existed"""
+    app = create_app()
+    with app.app_context():
+        inspector = db.inspect(db.engine)
+        columns = [col['name'] for col in inspector.get_columns('file_version')]
+        if 'size' not in columns:
+            print("Adding size column...")
+            with db.engine.begin() as conn:
+                conn.execute(db.text('ALTER TABLE file_version ADD COLUMN size BIGINT'))
+
+        updated = 0
+        while True:
+            rows = FileVersion.query.filter(FileVersion.size.is_(None)).limit(BATCH).all()
+            if not rows:
+                break
+            for v in rows:
+                v.size = storage.size(v.path)
+            db.session.commit()
+            updated += len(rows)
+        print(f"✅ Backfilled size for {updated} version(s)")
+
+if __name__ == "__main__":  # pragma: no cover
+    migrate_version_sizes()
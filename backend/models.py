@@ -4,7 +4,9 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 
-db = SQLAlchemy()
+from .routing import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # ---------------- User, File & Folder tables ----------------
 class User(db.Model, UserMixin):
@@ -38,6 +40,10 @@ class Folder(db.Model):
 
     parent = db.relationship('Folder', remote_side=[id], backref='subfolders')
 
+    __table_args__ = (
+        db.Index("ix_folder_parent_name", "parent_id", "name"),   # keyset listing of one level
+    )
+
 
 class File(db.Model):
     id          = db.Column(db.Integer, primary_key=True)
@@ -55,6 +61,10 @@ class File(db.Model):
     versions = db.relationship('FileVersion', backref='file', lazy=True, order_by='FileVersion.version_number.desc()', cascade='all, delete-orphan')
     reviews = db.relationship('DocumentReview', backref='file', lazy=True, cascade='all, delete-orphan')
 
+    __table_args__ = (
+        db.Index("ix_file_folder_filename", "folder_id", "filename"),
+    )
+
     def get_latest_version(self):
         return FileVersion.query.filter_by(file_id=self.id).order_by(FileVersion.version_number.desc()).first()
 
@@ -70,6 +80,8 @@ class FileVersion(db.Model):
     file_id         = db.Column(db.Integer, db.ForeignKey('file.id'), nullable=False)
     version_number  = db.Column(db.Integer, nullable=False)
     path            = db.Column(db.String(255), nullable=False)
+    size            = db.Column(db.BigInteger, nullable=True)  # bytes on disk, NULL for legacy rows
+    sha256          = db.Column(db.String(64), nullable=True, index=True)  # content hash, NULL for legacy rows
     uploaded_at     = db.Column(db.DateTime, server_default=db.func.now())
     comment         = db.Column(db.String(500))  # Optional comment for version changes
 
@@ -95,6 +107,9 @@ class DocumentReview(db.Model):
         db.Index("ix_review_status", "status"),
         db.Index("ix_review_reviewer", "reviewer_id"),
         db.Index("ix_review_file", "file_id"),
+        # inbox / "requested by me" pages: equality on user + status, range on time
+        db.Index("ix_review_reviewer_status_requested", "reviewer_id", "status", "requested_at"),
+        db.Index("ix_review_requester_status_requested", "requester_id", "status", "requested_at"),
     )
 
 
@@ -118,6 +133,84 @@ class Notification(db.Model):
     )
 
 
+# ---------------- Change feed (see changes.py) -------
+class ChangeLog(db.Model):
+    """Append-only outbox written in the same transaction as the change it records."""
+    id          = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    user_id     = db.Column(db.Integer, nullable=True)        # audience; NULL = everyone (published files)
+    entity      = db.Column(db.String(16), nullable=False)    # 'file' | 'folder' | 'version' | 'review'
+    entity_id   = db.Column(db.Integer, nullable=False)
+    op          = db.Column(db.String(8), nullable=False)     # 'upsert' | 'delete'
+    data        = db.Column(db.JSON, nullable=True)           # entity fields after the change
+    created_at  = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_change_log_user_id_id", "user_id", "id"),
+        db.Index("ix_change_log_entity", "entity", "entity_id"),
+        db.Index("ix_change_log_created_at", "created_at"),
+    )
+
+
+class ChangeCompaction(db.Model):
+    """One row per compaction run; feed cursors below the highest floor_id must resync."""
+    id          = db.Column(db.Integer, primary_key=True)
+    ran_at      = db.Column(db.DateTime, nullable=False)
+    floor_id    = db.Column(db.BigInteger, nullable=False, default=0)
+    collapsed   = db.Column(db.Integer, nullable=False, default=0)
+    expired     = db.Column(db.Integer, nullable=False, default=0)
+
+
+# ---------------- Version retention (see retention.py) -----
+class RetentionRun(db.Model):
+    """Report of one whole-tree retention sweep; the admin report serves the latest."""
+    id               = db.Column(db.Integer, primary_key=True)
+    ran_at           = db.Column(db.DateTime, nullable=False)
+    dry_run          = db.Column(db.Boolean, nullable=False, default=False)
+    files_scanned    = db.Column(db.Integer, nullable=False, default=0)
+    versions_deleted = db.Column(db.Integer, nullable=False, default=0)
+    bytes_reclaimed  = db.Column(db.BigInteger, nullable=False, default=0)
+    per_user         = db.Column(db.JSON, nullable=False)
+
+
+# ---------------- Extracted content (see extract.py) -----
+class ExtractedContent(db.Model):
+    """Outcome of text extraction for one blob; the text itself lives in storage."""
+    sha256      = db.Column(db.String(64), primary_key=True)
+    status      = db.Column(db.String(16), nullable=False)   # 'done' | 'failed' | 'skipped'
+    extractor   = db.Column(db.String(32), nullable=True)
+    chars       = db.Column(db.Integer, nullable=False, default=0)
+    meta        = db.Column(db.JSON, nullable=True)
+    error       = db.Column(db.String(500), nullable=True)
+    extracted_at = db.Column(db.DateTime, nullable=False)
+
+
+# ---------------- Statistics rollups (see stats.py) -----
+class ReviewRollup(db.Model):
+    """Reviews per (reviewer, status) and the summed request→decision time of those decided."""
+    reviewer_id        = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    status             = db.Column(db.String(50), primary_key=True)
+    reviews            = db.Column(db.Integer, nullable=False, default=0)
+    timed              = db.Column(db.Integer, nullable=False, default=0)      # rows with reviewed_at
+    turnaround_seconds = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class StorageRollup(db.Model):
+    """Live files, their versions and version bytes per owner."""
+    user_id     = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    files       = db.Column(db.Integer, nullable=False, default=0)
+    versions    = db.Column(db.Integer, nullable=False, default=0)
+    bytes       = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class FolderRollup(db.Model):
+    """Direct contents of a folder: subfolders, files, their version bytes and the last change."""
+    folder_id     = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    subfolders    = db.Column(db.Integer, nullable=False, default=0)
+    files         = db.Column(db.Integer, nullable=False, default=0)
+    bytes         = db.Column(db.BigInteger, nullable=False, default=0)
+    last_modified = db.Column(db.DateTime, nullable=True)
+
+
 # ---------------- Password-reset tokens -------------
 class ResetToken(db.Model):
     id         = db.Column(db.Integer, primary_key=True)
@@ -0,0 +1,102 @@
+# backend/pagination.py
+"""
+Keyset (cursor) pagination helpers.
+
+Cursors are opaque url-safe strings wrapping a small JSON dict of the sort
+key of the last row returned, so the next page is a single indexed range
+scan instead of an OFFSET.
+"""
+from __future__ import annotations
+import base64
+import json
+from datetime import datetime
+
+from flask import request
+from sqlalchemy import type_coerce
+
+from .models import db
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+class BadCursor(ValueError):
+    pass
+
+
+def encode_cursor(data: dict) -> str:
+    raw = json.dumps(data, separators=(',', ':'), default=_json_default).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str | None) -> dict | None:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise BadCursor(str(e)) from e
+    if not isinstance(data, dict):
+        raise BadCursor("cursor must wrap an object")
+    return data
+
+
+def cursor_int(cursor: dict, key: str, default: int = 0) -> int:
+    """A non-negative integer field of a decoded cursor."""
+    value = cursor.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise BadCursor(f"cursor field {key!r} must be a non-negative integer")
+    return value
+
+
+def page_limit() -> int:
+    """``?limit=`` clamped to 1..MAX_LIMIT."""
+    limit = request.args.get('limit', DEFAULT_LIMIT, type=int) or DEFAULT_LIMIT
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _is_sqlite() -> bool:
+    return db.session.get_bind().dialect.name == 'sqlite'
+
+
+def stored_time(time_col):
+    """
+    *time_col* exactly as the database orders it.  SQLite keeps DATETIMEs as
+    text in whichever format wrote them (server defaults lack the ".ffffff"
+    bound parameters carry), so there the raw text is selected, carried in the
+    cursor and compared as is; converting either side would round or reorder.
+    """
+    return type_coerce(time_col, db.String) if _is_sqlite() else time_col
+
+
+def after_desc(time_col, id_col, when, last_id: int):
+    """
+    Rows strictly after (*when*, *last_id*) in ``ORDER BY time DESC, id DESC``;
+    *when* is the cursor's copy of ``stored_time(time_col)`` for the last row.
+    """
+    col = stored_time(time_col)
+    if not _is_sqlite():
+        when = parse_time(when)
+    elif not isinstance(when, str):
+        raise BadCursor("cursor time must be a string")
+    return (col < when) | ((col == when) & (id_col < last_id))
+
+
+def after_asc(key_col, id_col, key, last_id: int):
+    """Rows strictly after (*key*, *last_id*) in ``ORDER BY key, id``."""
+    return (key_col > key) | ((key_col == key) & (id_col > last_id))
+
+
+def parse_time(value: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError) as e:
+        raise BadCursor(str(e)) from e
+
+
+def _json_default(o):
+    if isinstance(o, datetime):
+        return o.isoformat()
+    raise TypeError(f"not serializable: {type(o).__name__}")
@@ -0,0 +1,194 @@
+# backend/previews.py
+"""
+Thumbnails and first-page previews as derived assets.
+
+``GET /preview/<file_id>/<version_number>?size=N`` answers with a WebP no
+larger than N×N (N snapped up to one of PREVIEW_SIZES so the cache stays
+bounded):
+
+  * images   – the picture scaled down (JPEG decoded at reduced size via
+               ``draft``, EXIF orientation applied),
+  * documents – a page-shaped image of the first lines of text: the blob
+               itself for text files, the extracted text (extract.py) for
+               PDF, DOCX and the other extractable formats.
+
+Version blobs never change, so the URL names immutable content and is served
+with a one-year ``immutable`` Cache-Control.  Renders are stored under
+``.derived/preview/<sha256>/<N>.webp`` and shared by every file with the same
+bytes.
+
+Rendering is lazy: the first request for a (hash, size) submits a job to a
+PREVIEW_WORKERS thread pool (Pillow releases the GIL while decoding and
+resampling) and waits up to PREVIEW_WAIT_SECONDS; concurrent requests for
+the same key wait on the same job, and a folder of 500 images queues behind
+the pool instead of rendering 500 at once.  A request that runs out of
+patience gets 202 and retries.  Sources that cannot be rendered are
+remembered for FAILURE_TTL seconds so broken files do not re-render on every
+listing.
+
+Pillow is imported on first render; without it every preview is 404.
+"""
+from __future__ import annotations
+import io
+import os
+import textwrap
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import current_app
+
+from . import extract
+from .layout import derived_path
+from .storage import StorageError, storage
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp', '.tif', '.tiff'}
+TEXT_EXTENSIONS = {'.txt', '.md', '.py', '.js', '.json', '.yaml', '.yml', '.html', '.css'}
+MIMETYPE = 'image/webp'
+PAGE = (595, 842)            # A4 at 72 dpi; pages are drawn at this size, then scaled
+PAGE_LINES = 48
+PAGE_TEXT_BYTES = 16 * 1024
+FAILURE_TTL = 300
+
+
+class PreviewUnavailable(Exception):
+    """No preview can be produced for this source."""
+
+
+def source_kind(filename: str, mimetype: str | None) -> str | None:
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in IMAGE_EXTENSIONS or (mimetype or '').startswith('image/'):
+        return 'image'
+    if ext in TEXT_EXTENSIONS or extract.supported(filename):
+        return 'page'
+    return None
+
+
+def snap_size(requested: int, sizes) -> int:
+    sizes = sorted(sizes)
+    return next((s for s in sizes if s >= requested), sizes[-1])
+
+
+# ── rendering (worker threads) ──
+def _webp(im) -> bytes:
+    if im.mode not in ('RGB', 'RGBA'):
+        im = im.convert('RGBA' if im.mode in ('LA', 'PA') or 'transparency' in im.info else 'RGB')
+    out = io.BytesIO()
+    im.save(out, 'WEBP', quality=80, method=4)
+    return out.getvalue()
+
+
+def render_image(fh, size: int) -> bytes:
+    from PIL import Image, ImageOps
+    try:
+        with Image.open(fh) as im:
+            im.draft('RGB', (size, size))          # JPEG: decode at 1/2…1/8 scale directly
+            im = ImageOps.exif_transpose(im)
+            im.thumbnail((size, size), Image.Resampling.LANCZOS)
+            return _webp(im)
+    except (Image.DecompressionBombError, OSError, ValueError, SyntaxError) as e:
+        raise PreviewUnavailable(f'cannot render image: {e}') from e
+
+
+def render_page(text: str, size: int) -> bytes:
+    from PIL import Image, ImageDraw, ImageFont
+    page = Image.new('RGB', PAGE, 'white')
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=11)
+    lines = []
+    for paragraph in text.splitlines():
+        lines.extend(textwrap.wrap(paragraph, 90, replace_whitespace=False) or [''])
+        if len(lines) >= PAGE_LINES:
+            break
+    draw.multiline_text((36, 36), '\n'.join(lines[:PAGE_LINES]), fill=(40, 40, 40), font=font, spacing=4)
+    draw.rectangle((0, 0, PAGE[0] - 1, PAGE[1] - 1), outline=(200, 200, 200))
+    page.thumbnail((size, size), Image.Resampling.LANCZOS)
+    return _webp(page)
+
+
+class Previews:
+    def __init__(self, app):
+        self.app = app
+        self._pool = ThreadPoolExecutor(max_workers=app.config['PREVIEW_WORKERS'],
+                                        thread_name_prefix='preview')
+        self._inflight: dict[tuple, Future] = {}
+        self._failed: dict[tuple, tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, version, filename: str, mimetype: str | None, size: int) -> bytes | None:
+        """The preview bytes, or None while the render is still running; call from a request."""
+        key = (version.sha256, size)
+        cache_key = derived_path('preview', version.sha256, f'{size}.webp')
+        store = storage._get_current_object()
+        try:
+            return store.read(cache_key)
+        except StorageError:
+            pass
+
+        with self._lock:
+            failed = self._failed.get(key)
+            if failed and failed[0] > time.monotonic():
+                raise PreviewUnavailable(failed[1])
+            fut = self._inflight.get(key)
+        if fut is None:
+            job = self._job(store, version, filename, mimetype, size)
+            if job is None:                 # text extraction still running
+                return None
+            with self._lock:
+                fut = self._inflight.get(key)
+                if fut is None:
+                    fut = self._inflight[key] = self._pool.submit(self._render, store, cache_key, key, job)
+                    fut.add_done_callback(lambda _: self._inflight.pop(key, None))
+        try:
+            return fut.result(timeout=self.app.config['PREVIEW_WAIT_SECONDS'])
+        except FutureTimeout:
+            return None
+
+    def _job(self, store, version, filename, mimetype, size):
+        """A zero-argument render function (None while text extraction is pending)."""
+        kind, path = source_kind(filename, mimetype), version.path   # no ORM access off-thread
+        if kind == 'image':
+            if (version.size or 0) > self.app.config['PREVIEW_MAX_BYTES']:
+                raise PreviewUnavailable('image too large to preview')
+
+            def image():
+                with store.open(path) as fh:
+                    return render_image(fh, size)
+            return image
+        if kind == 'page':
+            if extract.supported(filename):
+                status, text, _ = extract.lookup(version, filename)
+                if status == 'pending':
+                    return None
+                if status != 'done':
+                    raise PreviewUnavailable(f'no text to preview ({status})')
+                return lambda: render_page(text, size)
+
+            def page():
+                with store.open(path) as fh:
+                    return render_page(extract.decode_text(fh.read(PAGE_TEXT_BYTES)), size)
+            return page
+        raise PreviewUnavailable('no preview for this file type')
+
+    def _render(self, store, cache_key, key, job):
+        try:
+            data = job()
+        except ImportError:
+            raise PreviewUnavailable('Pillow is not installed') from None
+        except (PreviewUnavailable, StorageError) as e:
+            now = time.monotonic()
+            with self._lock:
+                if len(self._failed) > 10_000:
+                    self._failed = {k: v for k, v in self._failed.items() if v[0] > now}
+                self._failed[key] = (now + FAILURE_TTL, str(e))
+            raise PreviewUnavailable(str(e)) from e
+        store.put(cache_key, data)
+        return data
+
+
+def init_app(app):
+    app.extensions['previews'] = Previews(app)
+
+
+def get_previews() -> Previews:
+    return current_app.extensions['previews']
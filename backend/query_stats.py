@@ -0,0 +1,168 @@
+# backend/query_stats.py
+"""
+Per-request SQL accounting.
+
+Engine events count every statement and its duration for the active
+request, log slow statements with the app line that issued them, and warn
+when one statement shape repeats N_PLUS_ONE_THRESHOLD times in a request
+(the classic lazy-load-in-a-loop N+1).  Totals go to Prometheus and, in
+debug mode, to X-DB-Query-Count / X-DB-Query-Time response headers.
+"""
+from __future__ import annotations
+import os
+import re
+import threading
+import time
+import traceback
+from collections import Counter as Tally
+from contextlib import contextmanager
+
+from flask import current_app, g, has_app_context, request
+from prometheus_client import Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+QUERIES_PER_REQUEST = Histogram(
+    'docs_db_queries_per_request', 'SQL statements issued per request', ['endpoint'],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+DB_SECONDS_PER_REQUEST = Histogram(
+    'docs_db_seconds_per_request', 'Time spent in SQL per request', ['endpoint'],
+    buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5))
+
+SLOW_QUERY_MS = 200
+N_PLUS_ONE_THRESHOLD = 10
+
+_PKG_DIR = os.path.dirname(os.path.abspath(__file__))
+_local = threading.local()
+_installed = False
+
+
+class QueryStats:
+    """Statements seen while this collector is active."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes: Tally[str] = Tally()
+        self.statements: list[str] = []
+        self.repeated: dict[str, str] = {}   # shape → call site, once past the threshold
+
+    def add(self, statement: str, seconds: float, n_plus_one: int):
+        self.count += 1
+        self.seconds += seconds
+        self.statements.append(statement)
+        shape = statement_shape(statement)
+        self.shapes[shape] += 1
+        if self.shapes[shape] == n_plus_one:
+            self.repeated[shape] = call_site()
+
+
+def statement_shape(statement: str) -> str:
+    """Collapse whitespace and IN-lists so equivalent statements compare equal."""
+    shape = re.sub(r'\s+', ' ', statement).strip()
+    return re.sub(r'IN \((?:[^()]*)\)', 'IN (…)', shape, flags=re.IGNORECASE)
+
+
+def call_site() -> str:
+    """First stack frame inside this package that is not SQL plumbing."""
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        if frame.filename.startswith(_PKG_DIR) and frame.filename != __file__ \
+                and os.sep + 'tests' + os.sep not in frame.filename:
+            return f"{os.path.relpath(frame.filename, _PKG_DIR)}:{frame.lineno} in {frame.name}"
+    return "<unknown>"
+
+
+def _active() -> list[QueryStats]:
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+@contextmanager
+def collect():
+    """Count the statements executed on this thread inside the block."""
+    stats = QueryStats()
+    _active().append(stats)
+    try:
+        yield stats
+    finally:
+        _active().remove(stats)
+
+
+@contextmanager
+def max_queries(limit: int):
+    """Test helper: fail if the block issues more than *limit* statements."""
+    with collect() as stats:
+        yield stats
+    if stats.count > limit:
+        listing = "\n".join(f"  {s}" for s in stats.statements)
+        raise AssertionError(f"expected at most {limit} queries, got {stats.count}:\n{listing}")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    stack = _active()
+    if not stack:
+        return
+    config = current_app.config if has_app_context() else {}
+    threshold = config.get('N_PLUS_ONE_THRESHOLD', N_PLUS_ONE_THRESHOLD)
+    for stats in stack:
+        stats.add(statement, elapsed, threshold)
+    if has_app_context() and elapsed * 1000 >= config.get('SLOW_QUERY_MS', SLOW_QUERY_MS):
+        current_app.logger.warning(
+            f"slow query {elapsed * 1000:.1f} ms at {call_site()}: {statement_shape(statement)[:500]}")
+
+
+def _handle_error(context):
+    # a failed statement never reaches after_cursor_execute; drop its start
+    # time so the pooled connection's stack stays paired with its statements
+    conn = context.connection
+    if conn is not None and conn.info.get('query_start'):
+        conn.info['query_start'].pop()
+
+
+def init_app(app):
+    """Install engine listeners (once per process) and per-request hooks."""
+    global _installed
+    if not app.config.get('QUERY_STATS_ENABLED', True):
+        return
+    if not _installed:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        _installed = True
+
+    @app.before_request
+    def _start_query_stats():
+        g.query_stats = QueryStats()
+        _active().append(g.query_stats)
+
+    @app.after_request
+    def _report_query_stats(response):
+        stats = g.pop('query_stats', None)
+        if stats is None:
+            return response
+        if stats in _active():
+            _active().remove(stats)
+
+        endpoint = request.endpoint or 'unknown'
+        QUERIES_PER_REQUEST.labels(endpoint).observe(stats.count)
+        DB_SECONDS_PER_REQUEST.labels(endpoint).observe(stats.seconds)
+        for shape, site in stats.repeated.items():
+            current_app.logger.warning(
+                f"possible N+1 in {endpoint}: {stats.shapes[shape]}× at {site}: {shape[:300]}")
+
+        if app.debug or app.config.get('QUERY_STATS_HEADERS'):
+            response.headers['X-DB-Query-Count'] = str(stats.count)
+            response.headers['X-DB-Query-Time'] = f"{stats.seconds * 1000:.1f}ms"
+        return response
+
+    @app.teardown_request
+    def _drop_query_stats(_exc):
+        stats = g.pop('query_stats', None)
+        if stats is not None and stats in _active():
+            _active().remove(stats)
@@ -0,0 +1,188 @@
+# backend/retention.py
+"""
+Policy-driven version retention.
+
+A version survives the sweep if any rule keeps it:
+  * it is the file's current version,
+  * a DocumentReview references it (original_version / modified_version),
+  * it is among the newest ``keep_last`` versions,
+  * it is the newest version of its day within the last ``daily_days`` days,
+  * it is the newest version of its ISO week within the last ``weekly_weeks`` weeks.
+
+The sweeper walks File ids in keyset batches, loads each batch's versions
+and review references in two queries, deletes doomed rows with one bulk
+DELETE per batch and unlinks their blobs after the commit.  Whole-tree
+sweeps (dry or not) store their report as a RetentionRun, which is what
+GET /admin/retention-report serves; requests never walk the tree.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from .background import run_periodically
+from .changes import record_version_deletes
+from .domain_metrics import record_versions_deleted
+from .models import db, User, File, FileVersion, DocumentReview, RetentionRun
+from .stats import forget_versions
+from .storage import storage
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    keep_last: int = 10
+    daily_days: int = 30
+    weekly_weeks: int = 52
+
+    @classmethod
+    def from_config(cls, config) -> RetentionPolicy:
+        return cls(keep_last=config['VERSION_KEEP_LAST'],
+                   daily_days=config['VERSION_KEEP_DAILY_DAYS'],
+                   weekly_weeks=config['VERSION_KEEP_WEEKLY_WEEKS'])
+
+
+@dataclass
+class SweepReport:
+    dry_run: bool
+    files_scanned: int = 0
+    versions_deleted: int = 0
+    bytes_reclaimed: int = 0
+    per_user: dict = field(default_factory=dict)   # username → {"versions", "bytes"}
+    ran_at: datetime | None = None
+
+    def add(self, username: str, nbytes: int):
+        self.versions_deleted += 1
+        self.bytes_reclaimed += nbytes
+        entry = self.per_user.setdefault(username, {"versions": 0, "bytes": 0})
+        entry["versions"] += 1
+        entry["bytes"] += nbytes
+
+    def as_dict(self) -> dict:
+        return {
+            "ran_at": self.ran_at.isoformat() if self.ran_at else None,
+            "dry_run": self.dry_run,
+            "files_scanned": self.files_scanned,
+            "versions_deleted": self.versions_deleted,
+            "bytes_reclaimed": self.bytes_reclaimed,
+            "per_user": self.per_user,
+        }
+
+
+def versions_to_delete(versions, current_version: int | None, protected: set[int],
+                       policy: RetentionPolicy, now: datetime) -> list:
+    """Pick the doomed entries of *versions* (objects with version_number/uploaded_at)."""
+    newest_first = sorted(versions, key=lambda v: v.version_number, reverse=True)
+    keep = {current_version} | set(protected)
+    keep.update(v.version_number for v in newest_first[:policy.keep_last])
+
+    daily_cutoff = now - timedelta(days=policy.daily_days)
+    weekly_cutoff = now - timedelta(weeks=policy.weekly_weeks)
+    days_seen, weeks_seen = set(), set()
+    for v in newest_first:
+        ts = v.uploaded_at or now
+        if ts >= daily_cutoff:
+            if ts.date() not in days_seen:
+                days_seen.add(ts.date())
+                keep.add(v.version_number)
+        elif ts >= weekly_cutoff:
+            week = ts.isocalendar()[:2]
+            if week not in weeks_seen:
+                weeks_seen.add(week)
+                keep.add(v.version_number)
+
+    return [v for v in newest_first if v.version_number not in keep]
+
+
+def _version_bytes(v) -> int:
+    if v.size is not None:
+        return v.size
+    return storage.size(v.path)
+
+
+def sweep(policy: RetentionPolicy | None = None, dry_run: bool = False,
+          user_id: int | None = None, batch_size: int | None = None,
+          now: datetime | None = None) -> SweepReport:
+    """Apply *policy* to every file (or one user's files); run in an app context."""
+    policy = policy or RetentionPolicy.from_config(current_app.config)
+    batch_size = batch_size or current_app.config['RETENTION_BATCH_SIZE']
+    now = now or datetime.utcnow()
+    report = SweepReport(dry_run=dry_run, ran_at=now)
+    last_id = 0
+
+    while True:
+        q = (db.session.query(File.id, File.current_version, User.username)
+             .join(User, User.id == File.owner_id)
+             .filter(File.id > last_id))
+        if user_id is not None:
+            q = q.filter(File.owner_id == user_id)
+        files = q.order_by(File.id).limit(batch_size).all()
+        if not files:
+            break
+        last_id = files[-1].id
+        report.files_scanned += len(files)
+        ids = [f.id for f in files]
+
+        versions: dict[int, list] = {}
+        for v in (db.session.query(FileVersion.id, FileVersion.file_id, FileVersion.version_number,
+                                   FileVersion.uploaded_at, FileVersion.path, FileVersion.size)
+                  .filter(FileVersion.file_id.in_(ids))):
+            versions.setdefault(v.file_id, []).append(v)
+
+        protected: dict[int, set[int]] = {}
+        for file_id, orig, mod in (db.session.query(DocumentReview.file_id,
+                                                    DocumentReview.original_version,
+                                                    DocumentReview.modified_version)
+                                   .filter(DocumentReview.file_id.in_(ids))):
+            protected.setdefault(file_id, set()).update(n for n in (orig, mod) if n is not None)
+
+        doomed, freed = [], 0
+        for f in files:
+            for v in versions_to_delete(versions.get(f.id, []), f.current_version,
+                                        protected.get(f.id, set()), policy, now):
+                nbytes = _version_bytes(v)
+                report.add(f.username, nbytes)
+                doomed.append(v)
+                freed += nbytes
+
+        if doomed and not dry_run:
+            record_version_deletes(v.id for v in doomed)
+            forget_versions(v.id for v in doomed)
+            db.session.execute(FileVersion.__table__.delete()
+                               .where(FileVersion.id.in_([v.id for v in doomed])))
+            db.session.commit()
+            for v in doomed:
+                storage.delete(v.path)
+            record_versions_deleted('retention_sweep', len(doomed), freed)
+
+    if user_id is None:
+        _store(report)
+    return report
+
+
+def _store(report: SweepReport):
+    db.session.add(RetentionRun(ran_at=report.ran_at, dry_run=report.dry_run,
+                                files_scanned=report.files_scanned,
+                                versions_deleted=report.versions_deleted,
+                                bytes_reclaimed=report.bytes_reclaimed,
+                                per_user=report.per_user))
+    db.session.commit()
+
+
+def latest_report() -> SweepReport | None:
+    """The most recent stored whole-tree sweep, or None if none has run yet."""
+    run = RetentionRun.query.order_by(RetentionRun.id.desc()).first()
+    if run is None:
+        return None
+    return SweepReport(dry_run=run.dry_run, files_scanned=run.files_scanned,
+                       versions_deleted=run.versions_deleted, bytes_reclaimed=run.bytes_reclaimed,
+                       per_user=run.per_user, ran_at=run.ran_at)
+
+
+def init_sweeper(app):
+    """Sweep every RETENTION_SWEEP_INTERVAL seconds (0 = only via `flask retention-sweep`)."""
+    def _sweep():
+        report = sweep()
+        app.logger.info(f"retention sweep: {report.versions_deleted} versions, "
+                        f"{report.bytes_reclaimed} bytes reclaimed")
+    run_periodically(app, 'retention-sweeper', _sweep, app.config.get('RETENTION_SWEEP_INTERVAL', 0))
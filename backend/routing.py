@@ -0,0 +1,80 @@
+# backend/routing.py
+"""
+Read-replica routing for ``db.session``.
+
+Requests to the endpoints in REPLICA_ENDPOINTS read from a second engine
+built from DATABASE_REPLICA_URL, when one is configured.  Anything that writes
+(flush, bulk update/delete) always goes to the primary, and marks the
+browser session so the next REPLICA_STICKY_SECONDS of reads also hit the
+primary (read-your-writes).
+"""
+import time
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+
+from .config import engine_options
+
+REPLICA_EXTENSION = 'db_replica'
+
+# Read-only listings that tolerate replication lag
+REPLICA_ENDPOINTS = {
+    'main.get_folders',
+    'main.get_all_public_files',
+    'main.get_notifications',
+    'main.get_my_reviews',
+    'main.get_my_requests',
+}
+
+_STICKY_KEY = '_primary_until'
+
+
+class RoutingSession(Session):
+    """Session that sends reads to the replica while ``g.use_replica`` is set."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and has_request_context()
+                and g.get('use_replica')):
+            replica = current_app.extensions.get(REPLICA_EXTENSION)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _mark_write():
+    if has_request_context():
+        g.use_replica = False
+        g.db_wrote = True
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _after_flush(session, flush_context):
+    _mark_write()
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _after_bulk(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        _mark_write()
+
+
+def init_replica_routing(app):
+    """Create the replica engine and install the per-request routing hooks."""
+    url = app.config.get('DATABASE_REPLICA_URL')
+    if not url:
+        return
+    app.extensions[REPLICA_EXTENSION] = create_engine(url, **engine_options(url, app.config))
+
+    @app.before_request
+    def _choose_bind():
+        g.use_replica = (
+            request.endpoint in REPLICA_ENDPOINTS
+            and session.get(_STICKY_KEY, 0) < time.time()
+        )
+
+    @app.after_request
+    def _stick_to_primary(response):
+        if g.get('db_wrote'):
+            session[_STICKY_KEY] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+        return response
@@ -0,0 +1,300 @@
+# backend/sessions.py
+"""
+Server-side sessions.
+
+With the default SESSION_TYPE=cookie Flask keeps the whole session in a
+signed cookie: nothing to share between replicas, but nothing to revoke
+either.  Any other SESSION_TYPE stores the session under an opaque random
+id and only that id goes into the cookie:
+
+    memory  – dict in this process (tests, single-process dev servers)
+    sqlite  – one SQLite file (SESSION_SQLITE_PATH), shared by the workers
+              of a host or by pods mounting the same volume
+    redis   – any Redis-protocol server (SESSION_REDIS_URL); what a
+              multi-replica deployment should use
+
+Because every replica reads the same store, login state and the OAuth
+``state`` authlib keeps in the session survive a callback that lands on a
+different pod.
+
+Writes are lazy: a request that did not modify the session writes nothing,
+except to slide the expiry once less than half of PERMANENT_SESSION_LIFETIME
+is left.  Expired sessions are dropped by Redis itself and purged in bulk by
+the other stores every PURGE_EVERY writes.  Each store indexes sessions by
+Flask-Login's ``_user_id`` so ``revoke_user_sessions`` can log a user out
+everywhere (password change / reset); a session whose user changes gets a
+fresh id, so an id planted before login is worthless afterwards.
+"""
+from __future__ import annotations
+import re
+import secrets
+import sqlite3
+import threading
+import time
+
+from flask import current_app
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+PURGE_EVERY = 1000                            # writes between expiry sweeps (memory / sqlite)
+_SID = re.compile(r'[A-Za-z0-9_-]{43}')       # secrets.token_urlsafe(32)
+
+
+class SessionStore:
+    """Interface shared by the stores; payloads are opaque strings."""
+
+    def load(self, sid: str) -> tuple[str, float] | None:
+        """``(payload, expires_at)`` of a live session, else None."""
+        raise NotImplementedError
+
+    def save(self, sid: str, payload: str, ttl: int, user_id: str | None):
+        raise NotImplementedError
+
+    def delete(self, sid: str):
+        raise NotImplementedError
+
+    def revoke_user(self, user_id: str, keep: str | None = None) -> int:
+        """Delete every session of *user_id* except *keep*; returns how many."""
+        raise NotImplementedError
+
+    def purge(self) -> int:
+        """Drop expired sessions; returns how many."""
+        return 0
+
+
+class MemorySessionStore(SessionStore):
+    def __init__(self):
+        self._data: dict[str, tuple[str, float, str | None]] = {}
+        self._by_user: dict[str, set[str]] = {}
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        entry = self._data.get(sid)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0], entry[1]
+
+    def save(self, sid, payload, ttl, user_id):
+        with self._lock:
+            self._unlink(sid)
+            self._data[sid] = (payload, time.time() + ttl, user_id)
+            if user_id is not None:
+                self._by_user.setdefault(user_id, set()).add(sid)
+            self._writes += 1
+            if self._writes % PURGE_EVERY == 0:
+                self._purge()
+
+    def delete(self, sid):
+        with self._lock:
+            self._unlink(sid)
+
+    def revoke_user(self, user_id, keep=None):
+        with self._lock:
+            sids = [s for s in self._by_user.get(user_id, ()) if s != keep]
+            for sid in sids:
+                self._unlink(sid)
+            return len(sids)
+
+    def purge(self):
+        with self._lock:
+            return self._purge()
+
+    # ── internals (lock held) ──
+    def _unlink(self, sid):
+        entry = self._data.pop(sid, None)
+        if entry is not None and entry[2] is not None:
+            sids = self._by_user.get(entry[2])
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del self._by_user[entry[2]]
+
+    def _purge(self):
+        now = time.time()
+        dead = [sid for sid, (_, expires, _) in self._data.items() if expires <= now]
+        for sid in dead:
+            self._unlink(sid)
+        return len(dead)
+
+
+class SQLiteSessionStore(SessionStore):
+    """One row per session in a WAL-mode SQLite file; a connection per thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        with self._conn() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS sessions ('
+                         ' sid TEXT PRIMARY KEY, user_id TEXT, expires REAL NOT NULL, data TEXT NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_sessions_user_id ON sessions (user_id)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_sessions_expires ON sessions (expires)')
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def load(self, sid):
+        row = self._conn().execute('SELECT data, expires FROM sessions WHERE sid = ? AND expires > ?',
+                                   (sid, time.time())).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def save(self, sid, payload, ttl, user_id):
+        with self._conn() as conn:
+            conn.execute('INSERT OR REPLACE INTO sessions (sid, user_id, expires, data) VALUES (?, ?, ?, ?)',
+                         (sid, user_id, time.time() + ttl, payload))
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            self.purge()
+
+    def delete(self, sid):
+        with self._conn() as conn:
+            conn.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+    def revoke_user(self, user_id, keep=None):
+        with self._conn() as conn:
+            return conn.execute('DELETE FROM sessions WHERE user_id = ? AND sid IS NOT ?',
+                                (user_id, keep)).rowcount
+
+    def purge(self):
+        with self._conn() as conn:
+            return conn.execute('DELETE FROM sessions WHERE expires <= ?', (time.time(),)).rowcount
+
+
+class RedisSessionStore(SessionStore):
+    """
+    ``<prefix><sid>`` holds ``"<expires_at>\\n<payload>"`` with a matching EX,
+    ``<prefix>user:<id>`` the set of that user's session ids.
+
+    *client* is a ``redis.Redis`` or anything speaking the same methods.
+    """
+
+    def __init__(self, client, prefix: str = 'session:'):
+        self.client, self.prefix = client, prefix
+
+    def load(self, sid):
+        raw = self.client.get(self.prefix + sid)
+        if raw is None:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode('utf-8')
+        expires, _, payload = raw.partition('\n')
+        return payload, float(expires)
+
+    def save(self, sid, payload, ttl, user_id):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.set(self.prefix + sid, f'{time.time() + ttl}\n{payload}', ex=ttl)
+        if user_id is not None:
+            pipe.sadd(self._user_key(user_id), sid)
+            pipe.expire(self._user_key(user_id), ttl)
+        pipe.execute()
+
+    def delete(self, sid):
+        self.client.delete(self.prefix + sid)
+
+    def revoke_user(self, user_id, keep=None):
+        key = self._user_key(user_id)
+        sids = [s.decode('utf-8') if isinstance(s, bytes) else s for s in self.client.smembers(key)]
+        sids = [s for s in sids if s != keep]
+        if not sids:
+            return 0
+        pipe = self.client.pipeline(transaction=False)
+        pipe.delete(*(self.prefix + s for s in sids))
+        pipe.srem(key, *sids)
+        removed, _ = pipe.execute()
+        return removed
+
+    def _user_key(self, user_id):
+        return f'{self.prefix}user:{user_id}'
+
+
+def create_session_store(config) -> SessionStore | None:
+    """The store selected by SESSION_TYPE (None for plain cookie sessions)."""
+    kind = config.get('SESSION_TYPE', 'cookie')
+    if kind == 'cookie':
+        return None
+    if kind == 'memory':
+        return MemorySessionStore()
+    if kind == 'sqlite':
+        return SQLiteSessionStore(config['SESSION_SQLITE_PATH'])
+    if kind == 'redis':
+        import redis   # optional dependency, only needed for this store
+        return RedisSessionStore(redis.Redis.from_url(config['SESSION_REDIS_URL']),
+                                 prefix=config.get('SESSION_KEY_PREFIX', 'session:'))
+    raise ValueError(f"unknown SESSION_TYPE {kind!r}")
+
+
+# ───────────────────────────── Flask wiring ─────────────────────────────
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid: str | None = None, expires: float = 0.0):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid, self.expires = sid, expires
+        self.loaded_user = self.get('_user_id')
+        self.modified = False
+
+
+class ServerSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store: SessionStore):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and _SID.fullmatch(sid):
+            hit = self.store.load(sid)
+            if hit is not None:
+                payload, expires = hit
+                return ServerSession(self.serializer.loads(payload), sid=sid, expires=expires)
+        return ServerSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain, path = self.get_cookie_domain(app), self.get_cookie_path(app)
+        if not session:
+            if session.sid is not None:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        ttl = int(app.permanent_session_lifetime.total_seconds())
+        user_id = session.get('_user_id')
+        if session.sid is not None and user_id != session.loaded_user:
+            self.store.delete(session.sid)          # new identity, new id
+            session.sid = None
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        elif not session.modified and session.expires - time.time() > ttl / 2:
+            return                                  # nothing to write
+
+        self.store.save(session.sid, self.serializer.dumps(dict(session)), ttl,
+                        None if user_id is None else str(user_id))
+        response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                            secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app))
+        response.vary.add('Cookie')
+
+
+def init_app(app):
+    """Install the server-side session interface unless SESSION_TYPE is 'cookie'."""
+    store = create_session_store(app.config)
+    if store is not None:
+        app.extensions['session_store'] = store
+        app.session_interface = ServerSessionInterface(store)
+
+
+def revoke_user_sessions(user_id, keep: str | None = None) -> int:
+    """Log *user_id* out of every server-side session but *keep* (no-op for cookie sessions)."""
+    store = current_app.extensions.get('session_store')
+    if store is None:
+        return 0
+    return store.revoke_user(str(user_id), keep=keep)
@@ -0,0 +1,359 @@
+# backend/stats.py
+"""
+Pre-aggregated review, storage and folder statistics.
+
+Three rollup tables are kept current by an ``after_flush`` hook, in the same
+transaction as the change:
+
+  * review_rollup  – (reviewer, status) → reviews, and for those with a
+                     ``reviewed_at`` the summed seconds since ``requested_at``;
+                     fed by request_review / submit_review / cancel_review
+                     and by reviews deleted with their file,
+  * storage_rollup – owner → live files, their versions and version bytes;
+                     fed by uploads, new versions, edits and deletes,
+  * folder_rollup  – folder → direct subfolders, direct files, the version
+                     bytes of those files and when any of that last changed;
+                     fed by the same writes plus folder creates, renames,
+                     moves and deletes, and read by the lazy folder listing.
+
+Each flush turns into one ``INSERT … ON CONFLICT/DUPLICATE KEY UPDATE
+n = n + delta`` per touched key, so concurrent writers never overwrite one
+another.  Bulk deletes that bypass the ORM call ``forget_versions`` first.
+Anything else that edits rows behind the ORM's back (imports, fsck size
+fixes, owner changes) is caught by ``reconcile()``, which recomputes all three
+tables with GROUP BY queries every STATS_RECONCILE_INTERVAL seconds and
+rewrites only the keys that drifted (``last_modified`` is not recomputed;
+a folder without one reports its creation time).
+
+The admin endpoints read the rollups alone, so their cost depends on the
+number of users, not on the number of files or reviews; a folder listing
+costs one page of rows, not the subtree below it.
+"""
+from __future__ import annotations
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import event, func, select
+
+from .background import run_periodically
+from .changes import FileOwners
+from .models import (db, DocumentReview, File, FileVersion, Folder, FolderRollup, ReviewRollup,
+                     StorageRollup, User)
+from .routing import RoutingSession
+
+REVIEW_COUNTERS = ('reviews', 'timed', 'turnaround_seconds')
+STORAGE_COUNTERS = ('files', 'versions', 'bytes')
+FOLDER_COUNTERS = ('subfolders', 'files', 'bytes')
+
+
+def _turnaround(review) -> int | None:
+    if review.reviewed_at is None or review.requested_at is None:
+        return None
+    return max(0, int((review.reviewed_at - review.requested_at).total_seconds()))
+
+
+class _Deltas:
+    def __init__(self):
+        self.reviews = defaultdict(lambda: dict.fromkeys(REVIEW_COUNTERS, 0))
+        self.storage = defaultdict(lambda: dict.fromkeys(STORAGE_COUNTERS, 0))
+        self.folders = defaultdict(lambda: dict.fromkeys(FOLDER_COUNTERS, 0))
+        self.gone = set()               # folders deleted in this flush: drop their row
+
+    def touch(self, folder_id):
+        """Stamp *folder_id* as modified even if none of its counters move."""
+        self.folders[folder_id]
+
+    def review(self, reviewer_id, status, sign: int, turnaround: int | None):
+        d = self.reviews[(reviewer_id, status)]
+        d['reviews'] += sign
+        if turnaround is not None:
+            d['timed'] += sign
+            d['turnaround_seconds'] += sign * turnaround
+
+    def apply(self, conn):
+        for (reviewer_id, status), d in self.reviews.items():
+            _bump(conn, ReviewRollup.__table__, {'reviewer_id': reviewer_id, 'status': status}, d)
+        for user_id, d in self.storage.items():
+            if user_id is not None:
+                _bump(conn, StorageRollup.__table__, {'user_id': user_id}, d)
+        now = datetime.utcnow()
+        for folder_id, d in self.folders.items():
+            if folder_id is not None and folder_id not in self.gone:
+                _bump(conn, FolderRollup.__table__, {'folder_id': folder_id}, d, {'last_modified': now})
+        if self.gone:
+            conn.execute(FolderRollup.__table__.delete()
+                         .where(FolderRollup.__table__.c.folder_id.in_(self.gone)))
+
+
+def _bump(conn, table, key: dict, deltas: dict, stamp: dict | None = None):
+    """Add *deltas* to the row at *key*, creating it at zero first; *stamp* columns are overwritten."""
+    deltas = {c: n for c, n in deltas.items() if n}
+    stamp = stamp or {}
+    if not deltas and not stamp:
+        return
+    zeros = (c.name for c in table.columns if c.name not in key and not c.nullable)
+    row = {**key, **dict.fromkeys(zeros, 0), **deltas, **stamp}
+    dialect = conn.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).values(row)
+        stmt = stmt.on_conflict_do_update(index_elements=list(key),
+                                          set_={**{c: table.c[c] + stmt.excluded[c] for c in deltas},
+                                                **{c: stmt.excluded[c] for c in stamp}})
+    elif dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(row)
+        stmt = stmt.on_duplicate_key_update({**{c: table.c[c] + stmt.inserted[c] for c in deltas},
+                                             **{c: stmt.inserted[c] for c in stamp}})
+    else:
+        where = [table.c[k] == v for k, v in key.items()]
+        if conn.execute(table.update().where(*where)
+                        .values({**{c: table.c[c] + n for c, n in deltas.items()}, **stamp})).rowcount:
+            return
+        stmt = table.insert().values(row)
+    conn.execute(stmt)
+
+
+def _changed_any(obj, attrs) -> bool:
+    state = db.inspect(obj)
+    return any(state.attrs[a].history.has_changes() for a in attrs)
+
+
+def _moved(obj, attr):
+    """(old, new) of *attr* if this flush changed it, else None."""
+    hist = db.inspect(obj).attrs[attr].history
+    if not hist.has_changes():
+        return None
+    return next(iter(hist.deleted), None), getattr(obj, attr)
+
+
+class _FileFolders:
+    """folder_id of the files a flush touches, from the session or one lookup for the rest."""
+
+    def __init__(self, session, objects):
+        self.session = session
+        self.known = {o.id: o.folder_id for o in objects if isinstance(o, File)}
+
+    def of(self, version):
+        if version.file_id not in self.known:
+            self.known[version.file_id] = self.session.execute(
+                select(File.folder_id).where(File.id == version.file_id)).scalar()
+        return self.known[version.file_id]
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _roll_up(session, flush_context):
+    touched = [(o, 1) for o in session.new] + [(o, -1) for o in session.deleted]
+    dirty = [o for o in session.dirty if isinstance(o, (DocumentReview, FileVersion, File, Folder))]
+    if not any(isinstance(o, (File, FileVersion, DocumentReview, Folder)) for o, _ in touched) and not dirty:
+        return
+
+    owners = FileOwners(session, [o for o, _ in touched])
+    folders = _FileFolders(session, [o for o, _ in touched] + dirty)
+    deltas = _Deltas()
+    for obj, sign in touched:
+        if isinstance(obj, File):
+            deltas.storage[obj.owner_id]['files'] += sign
+            deltas.folders[obj.folder_id]['files'] += sign
+        elif isinstance(obj, FileVersion):
+            d = deltas.storage[owners.of(obj)[0]]
+            d['versions'] += sign
+            d['bytes'] += sign * (obj.size or 0)
+            deltas.folders[folders.of(obj)]['bytes'] += sign * (obj.size or 0)
+        elif isinstance(obj, DocumentReview):
+            deltas.review(obj.reviewer_id, obj.status or 'pending', sign, _turnaround(obj))
+        elif isinstance(obj, Folder):
+            deltas.folders[obj.parent_id]['subfolders'] += sign
+            if sign < 0:
+                deltas.gone.add(obj.id)
+
+    for obj in dirty:
+        state = db.inspect(obj)
+        if isinstance(obj, FileVersion):
+            size = state.attrs.size.history
+            if size.has_changes():
+                old = next(iter(size.deleted), None) or 0
+                deltas.storage[owners.of(obj)[0]]['bytes'] += (obj.size or 0) - old
+                deltas.folders[folders.of(obj)]['bytes'] += (obj.size or 0) - old
+            continue
+        if isinstance(obj, File):
+            move = _moved(obj, 'folder_id')
+            if move:                    # the file's versions move along with it
+                nbytes = session.execute(select(func.coalesce(func.sum(FileVersion.size), 0))
+                                         .where(FileVersion.file_id == obj.id)).scalar()
+                for folder_id, sign in zip(move, (-1, 1)):
+                    deltas.folders[folder_id]['files'] += sign
+                    deltas.folders[folder_id]['bytes'] += sign * int(nbytes)
+            elif _changed_any(obj, ('filename', 'current_version')):
+                deltas.touch(obj.folder_id)
+            continue
+        if isinstance(obj, Folder):
+            move = _moved(obj, 'parent_id')
+            if move:
+                for parent_id, sign in zip(move, (-1, 1)):
+                    deltas.folders[parent_id]['subfolders'] += sign
+            elif _changed_any(obj, ('name',)):
+                deltas.touch(obj.parent_id)
+            continue
+        status, reviewed = state.attrs.status.history, state.attrs.reviewed_at.history
+        if status.has_changes() or reviewed.has_changes():
+            old_status = next(iter(status.deleted), None) or obj.status
+            old_reviewed = next(iter(reviewed.deleted), None) if reviewed.has_changes() else obj.reviewed_at
+            old_turnaround = (None if old_reviewed is None or obj.requested_at is None
+                              else max(0, int((old_reviewed - obj.requested_at).total_seconds())))
+            deltas.review(obj.reviewer_id, old_status, -1, old_turnaround)
+            deltas.review(obj.reviewer_id, obj.status, 1, _turnaround(obj))
+    deltas.apply(session.connection())
+
+
+def forget_versions(version_ids) -> None:
+    """Subtract versions about to be removed by a bulk DELETE; call before it, same transaction."""
+    version_ids = list(version_ids)
+    if not version_ids:
+        return
+    deltas = _Deltas()
+    for owner, n, nbytes in (db.session.query(File.owner_id, func.count(FileVersion.id),
+                                              func.coalesce(func.sum(FileVersion.size), 0))
+                             .join(File, File.id == FileVersion.file_id)
+                             .filter(FileVersion.id.in_(version_ids))
+                             .group_by(File.owner_id)):
+        deltas.storage[owner]['versions'] -= n
+        deltas.storage[owner]['bytes'] -= int(nbytes)
+    for folder_id, nbytes in (db.session.query(File.folder_id, func.coalesce(func.sum(FileVersion.size), 0))
+                              .join(File, File.id == FileVersion.file_id)
+                              .filter(FileVersion.id.in_(version_ids))
+                              .group_by(File.folder_id)):
+        deltas.folders[folder_id]['bytes'] -= int(nbytes)
+    deltas.apply(db.session.connection())
+
+
+# ── reconciliation ──
+def _actual_reviews() -> dict:
+    actual = defaultdict(lambda: dict.fromkeys(REVIEW_COUNTERS, 0))
+    for reviewer_id, status, n in (db.session.query(DocumentReview.reviewer_id, DocumentReview.status,
+                                                    func.count(DocumentReview.id))
+                                   .group_by(DocumentReview.reviewer_id, DocumentReview.status)):
+        actual[(reviewer_id, status or 'pending')]['reviews'] += n
+    # turnaround needs datetime arithmetic, which has no portable SQL spelling
+    for row in (db.session.query(DocumentReview.reviewer_id, DocumentReview.status,
+                                 DocumentReview.requested_at, DocumentReview.reviewed_at)
+                .filter(DocumentReview.reviewed_at.isnot(None)).yield_per(1000)):
+        t = _turnaround(row)
+        if t is not None:
+            d = actual[(row.reviewer_id, row.status or 'pending')]
+            d['timed'] += 1
+            d['turnaround_seconds'] += t
+    return actual
+
+
+def _actual_storage() -> dict:
+    actual = defaultdict(lambda: dict.fromkeys(STORAGE_COUNTERS, 0))
+    for owner, n in db.session.query(File.owner_id, func.count(File.id)).group_by(File.owner_id):
+        actual[owner]['files'] = n
+    for owner, n, nbytes in (db.session.query(File.owner_id, func.count(FileVersion.id),
+                                              func.coalesce(func.sum(FileVersion.size), 0))
+                             .join(File, File.id == FileVersion.file_id)
+                             .group_by(File.owner_id)):
+        actual[owner]['versions'] = n
+        actual[owner]['bytes'] = int(nbytes)
+    return actual
+
+
+def _actual_folders() -> dict:
+    actual = defaultdict(lambda: dict.fromkeys(FOLDER_COUNTERS, 0))
+    for parent_id, n in (db.session.query(Folder.parent_id, func.count(Folder.id))
+                         .filter(Folder.parent_id.isnot(None)).group_by(Folder.parent_id)):
+        actual[parent_id]['subfolders'] = n
+    for folder_id, n in (db.session.query(File.folder_id, func.count(File.id))
+                         .filter(File.folder_id.isnot(None)).group_by(File.folder_id)):
+        actual[folder_id]['files'] = n
+    for folder_id, nbytes in (db.session.query(File.folder_id, func.coalesce(func.sum(FileVersion.size), 0))
+                              .join(File, File.id == FileVersion.file_id)
+                              .filter(File.folder_id.isnot(None)).group_by(File.folder_id)):
+        actual[folder_id]['bytes'] = int(nbytes)
+    return actual
+
+
+def _sync(model, keys, counters, actual: dict) -> int:
+    stored = {tuple(getattr(r, k) for k in keys): r for r in model.query}
+    fixed = 0
+    for key, values in actual.items():
+        key = key if isinstance(key, tuple) else (key,)
+        row = stored.pop(key, None)
+        if row is None:
+            if any(values.values()):
+                db.session.add(model(**dict(zip(keys, key)), **values))
+                fixed += 1
+        elif any(getattr(row, c) != values[c] for c in counters):
+            for c in counters:
+                setattr(row, c, values[c])
+            fixed += 1
+    for row in stored.values():
+        if any(getattr(row, c) for c in counters):
+            db.session.delete(row)
+            fixed += 1
+    return fixed
+
+
+def reconcile() -> dict:
+    """Recompute the rollups from the source tables and fix drifted keys; run in an app context."""
+    fixed = {
+        'reviews': _sync(ReviewRollup, ('reviewer_id', 'status'), REVIEW_COUNTERS, _actual_reviews()),
+        'storage': _sync(StorageRollup, ('user_id',), STORAGE_COUNTERS, _actual_storage()),
+        'folders': _sync(FolderRollup, ('folder_id',), FOLDER_COUNTERS, _actual_folders()),
+    }
+    db.session.commit()
+    return fixed
+
+
+def init_reconciler(app):
+    """Reconcile every STATS_RECONCILE_INTERVAL seconds (0 = only via `flask reconcile-stats`)."""
+    def _reconcile():
+        fixed = reconcile()
+        if any(fixed.values()):
+            app.logger.warning(f"stats rollups drifted, fixed: {fixed}")
+    run_periodically(app, 'stats-reconciler', _reconcile, app.config.get('STATS_RECONCILE_INTERVAL', 0))
+
+
+# ── reading ──
+def review_stats() -> dict:
+    reviewers, totals = {}, defaultdict(int)
+    for row, username in (db.session.query(ReviewRollup, User.username)
+                          .outerjoin(User, User.id == ReviewRollup.reviewer_id)
+                          .filter(ReviewRollup.reviews != 0)):
+        entry = reviewers.setdefault(row.reviewer_id, {
+            'reviewer_id': row.reviewer_id, 'username': username, 'by_status': {},
+            'timed': 0, 'turnaround_seconds': 0})
+        entry['by_status'][row.status] = row.reviews
+        entry['timed'] += row.timed
+        entry['turnaround_seconds'] += row.turnaround_seconds
+        totals[row.status] += row.reviews
+    timed = sum(e['timed'] for e in reviewers.values())
+    turnaround = sum(e['turnaround_seconds'] for e in reviewers.values())
+    for entry in reviewers.values():
+        entry['avg_turnaround_seconds'] = (round(entry.pop('turnaround_seconds') / entry['timed'], 1)
+                                           if entry['timed'] else None)
+        del entry['timed']
+    return {
+        'by_status': dict(totals),
+        'avg_turnaround_seconds': round(turnaround / timed, 1) if timed else None,
+        'reviewers': sorted(reviewers.values(), key=lambda e: -sum(e['by_status'].values())),
+    }
+
+
+def storage_stats() -> dict:
+    users = [{'user_id': row.user_id, 'username': username, 'files': row.files,
+              'versions': row.versions, 'bytes': row.bytes}
+             for row, username in (db.session.query(StorageRollup, User.username)
+                                   .outerjoin(User, User.id == StorageRollup.user_id)
+                                   .order_by(StorageRollup.bytes.desc()))
+             if row.files or row.versions]
+    return {
+        'files': sum(u['files'] for u in users),
+        'versions': sum(u['versions'] for u in users),
+        'bytes': sum(u['bytes'] for u in users),
+        'users': users,
+    }
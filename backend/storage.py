@@ -0,0 +1,515 @@
+# backend/storage.py
+"""
+Pluggable blob storage for document bytes.
+
+Every read/write of file content goes through ``storage`` (a proxy to the
+driver configured for the current app):
+
+    storage.put(key, data_or_stream) -> bytes written
+    storage.open(key)                -> binary stream
+    storage.read(key) / storage.read_range(key, start, end)
+    storage.copy(src, dst, immutable=False) / storage.move(src, dst) / storage.delete(key)
+    storage.stat(key)                -> StorageStat | None
+    storage.send(key, ...)           -> Flask response with the bytes
+
+Drivers: ``local`` (filesystem) and ``s3`` (any S3-compatible service:
+AWS, MinIO, Ceph…; needs boto3).
+
+A *key* is what File.path / FileVersion.path store: a '/'-separated path
+relative to the storage root (UPLOAD_FOLDER), e.g. ``alice/Reports/q1.pdf``.
+Keys mean the same thing on every node whatever its mount point or working
+directory; ``Storage.key`` normalises them and refuses anything that would
+escape the root.  Rows written before paths became keys (``uploads/alice/...``
+or absolute paths) must be rewritten with ``flask relativize-paths`` first.
+"""
+from __future__ import annotations
+import errno
+import hashlib
+import mimetypes
+import os
+import shutil
+import tempfile
+from urllib.parse import quote
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+from flask import Response, current_app, send_file
+from werkzeug.local import LocalProxy
+
+from .domain_metrics import record_copy
+
+CHUNK_SIZE = 1024 * 1024
+FICLONE = 0x40049409     # _IOW(0x94, 9, int) from <linux/fs.h>
+
+
+@dataclass(frozen=True)
+class StorageStat:
+    size: int
+    mtime: float
+
+
+class StorageError(Exception):
+    pass
+
+
+class Storage:
+    """Interface shared by the drivers."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def key(self, path: str) -> str:
+        """Normalise a stored key; absolute paths and keys escaping the root are refused."""
+        rel = os.path.normpath(path)
+        if os.path.isabs(rel) or rel == '..' or rel.startswith('..' + os.sep):
+            raise StorageError(f"{path!r} is outside the storage root")
+        return '' if rel == '.' else rel.replace(os.sep, '/')
+
+    def put(self, path: str, data) -> int:
+        raise NotImplementedError
+
+    def open(self, path: str):
+        raise NotImplementedError
+
+    def read_range(self, path: str, start: int, end: int) -> bytes:
+        """Bytes ``start..end`` inclusive, like an HTTP Range header."""
+        raise NotImplementedError
+
+    def copy(self, src: str, dst: str, immutable: bool = False) -> str:
+        """
+        Duplicate *src* at *dst* and return the strategy used.  Pass
+        ``immutable=True`` when neither path is ever modified in place (true
+        for everything written through this module), allowing the two
+        names to share storage.
+        """
+        raise NotImplementedError
+
+    def move(self, src: str, dst: str):
+        self.copy(src, dst)
+        self.delete(src)
+
+    def move_dir(self, src: str, dst: str):
+        """
+        Move everything under *src* to *dst*, which must not hold anything yet.
+        This default moves blob by blob; drivers with real directories rename once.
+        """
+        src, dst = self.key(src), self.key(dst)
+        if next(iter(self.scan(dst)), None) is not None:
+            raise StorageError(f"already exists: {dst}")
+        for key, _ in list(self.scan(src)):
+            self.move(key, dst + key[len(src):])
+
+    def delete(self, path: str) -> bool:
+        raise NotImplementedError
+
+    def stat(self, path: str) -> StorageStat | None:
+        raise NotImplementedError
+
+    def ensure_dir(self, path: str):
+        """Create a directory where the backend has directories (no-op otherwise)."""
+
+    def scan(self, prefix: str = '', workers: int = 8, skip=()):
+        """Yield ``(key, size)`` for every blob under *prefix* (dir names in *skip* pruned)."""
+        raise NotImplementedError
+
+    def send(self, path: str, as_attachment: bool = False, download_name: str | None = None,
+             mimetype: str | None = None) -> Response:
+        raise NotImplementedError
+
+    # ── conveniences built on the primitives ──
+    def exists(self, path: str) -> bool:
+        return self.stat(path) is not None
+
+    def size(self, path: str) -> int:
+        st = self.stat(path)
+        return st.size if st else 0
+
+    def read(self, path: str) -> bytes:
+        with self.open(path) as fh:
+            return fh.read()
+
+    def read_text(self, path: str, encoding: str = 'utf-8') -> str:
+        return self.read(path).decode(encoding)
+
+
+class HashingReader:
+    """File-like wrapper that SHA-256 hashes and counts what is read through it."""
+
+    def __init__(self, raw):
+        self.raw, self.size = raw, 0
+        self._sha = hashlib.sha256()
+
+    def read(self, n=-1):
+        chunk = self.raw.read(n)
+        self._sha.update(chunk)
+        self.size += len(chunk)
+        return chunk
+
+    def hexdigest(self) -> str:
+        return self._sha.hexdigest()
+
+
+# ───────────────────────────── local filesystem ─────────────────────────────
+class LocalStorage(Storage):
+    """
+    Plain files under *root*.  With *accel_prefix* set (DOWNLOAD_MODE=accel)
+    ``send`` only returns an ``X-Accel-Redirect`` to ``<accel_prefix><key>``
+    and nginx streams the file itself from an ``internal`` location.
+    """
+
+    def __init__(self, root: str, accel_prefix: str | None = None):
+        super().__init__(root)
+        self.accel_prefix = accel_prefix
+
+    def local_path(self, path: str) -> str:
+        return os.path.join(self.root, *self.key(path).split('/'))
+
+    def _key_of(self, local: str) -> str:
+        """Inverse of ``local_path`` for paths found by walking the root."""
+        return os.path.relpath(local, self.root).replace(os.sep, '/')
+
+    def put(self, path, data) -> int:
+        path = self.local_path(path)
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        # write next to the target and rename, so readers never see half a file
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                if isinstance(data, (bytes, bytearray, memoryview)):
+                    out.write(data)
+                else:
+                    shutil.copyfileobj(data, out, CHUNK_SIZE)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return os.path.getsize(path)
+
+    def open(self, path):
+        try:
+            return open(self.local_path(path), 'rb')
+        except FileNotFoundError as e:
+            raise StorageError(f"not found: {path}") from e
+
+    def read_range(self, path, start, end) -> bytes:
+        with self.open(path) as fh:
+            fh.seek(start)
+            return fh.read(end - start + 1)
+
+    def copy(self, src, dst, immutable=False):
+        src, dst = self.local_path(src), self.local_path(dst)
+        directory = os.path.dirname(dst) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        os.close(fd)
+        try:
+            strategy = copy_file(src, tmp, allow_link=immutable)
+            os.replace(tmp, dst)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        record_copy(strategy, os.path.getsize(dst))
+        return strategy
+
+    def move(self, src, dst):
+        src, dst = self.local_path(src), self.local_path(dst)
+        os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+        shutil.move(src, dst)
+
+    def move_dir(self, src, dst):
+        src, dst = self.local_path(src), self.local_path(dst)
+        if os.path.lexists(dst) and not (os.path.isdir(dst) and not os.listdir(dst)):
+            raise StorageError(f"already exists: {self._key_of(dst)}")
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        if os.path.isdir(src):
+            os.rename(src, dst)        # one metadata operation, however many files are below
+        else:
+            os.makedirs(dst, exist_ok=True)
+
+    def delete(self, path) -> bool:
+        try:
+            os.remove(self.local_path(path))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def stat(self, path):
+        try:
+            st = os.stat(self.local_path(path))
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return StorageStat(size=st.st_size, mtime=st.st_mtime)
+
+    def ensure_dir(self, path):
+        os.makedirs(self.local_path(path), exist_ok=True)
+
+    def scan(self, prefix='', workers=8, skip=()):
+        # one os.scandir() per directory, directories fanned out over a pool so
+        # slow metadata round-trips (NFS, cold caches) overlap
+        def list_dir(path):
+            files, dirs = [], []
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in skip:
+                                dirs.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False) and not entry.name.startswith('.upload-'):
+                            files.append((entry.path, entry.stat(follow_symlinks=False).st_size))
+            except FileNotFoundError:
+                pass
+            return files, dirs
+
+        top = self.local_path(prefix)
+        if not os.path.isdir(top):
+            return
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = {pool.submit(list_dir, top)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    files, dirs = fut.result()
+                    pending.update(pool.submit(list_dir, d) for d in dirs)
+                    for path, size in files:
+                        yield self._key_of(path), size
+
+    def send(self, path, as_attachment=False, download_name=None, mimetype=None):
+        if self.accel_prefix:
+            return self._accel_redirect(path, as_attachment, download_name, mimetype)
+        return send_file(os.path.abspath(self.local_path(path)), as_attachment=as_attachment,
+                         download_name=download_name, mimetype=mimetype)
+
+    def _accel_redirect(self, path, as_attachment, download_name, mimetype):
+        key = self.key(path)
+        name = download_name or os.path.basename(key)
+        resp = Response(mimetype=mimetype or mimetypes.guess_type(name)[0] or 'application/octet-stream')
+        resp.headers['X-Accel-Redirect'] = quote(self.accel_prefix.rstrip('/') + '/' + key)
+        if as_attachment:
+            resp.headers.set('Content-Disposition', 'attachment', filename=name)
+        return resp
+
+
+# ───────────────────────────── zero-copy duplication ─────────────────────────
+# Each strategy copies src into the (empty) file at dst or raises OSError;
+# copy_file() walks them cheapest-first.  Hardlink and reflink share extents
+# and cost no data I/O; copy_file_range and sendfile keep the bytes in the
+# kernel (and let NFS 4.2 / CIFS do a server-side copy); the last resort is
+# a plain buffered read/write loop.
+_FALLBACK_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EACCES, errno.EINVAL, errno.ENOSYS,
+                    errno.ENOTTY, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EMLINK,
+                    errno.EBADF, errno.ETXTBSY}
+
+
+def _link(src, dst):
+    os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        open(dst, 'wb').close()
+        raise
+
+
+def _reflink(fsrc, fdst, size):
+    import fcntl
+    fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+
+def _copy_file_range(fsrc, fdst, size):
+    if not hasattr(os, 'copy_file_range'):
+        raise OSError(errno.ENOSYS, 'copy_file_range unavailable')
+    done = 0
+    while done < size:
+        n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size - done)
+        if n == 0:
+            break
+        done += n
+
+
+def _sendfile(fsrc, fdst, size):
+    if not hasattr(os, 'sendfile'):
+        raise OSError(errno.ENOSYS, 'sendfile unavailable')
+    done = 0
+    while done < size:
+        n = os.sendfile(fdst.fileno(), fsrc.fileno(), done, size - done)
+        if n == 0:
+            break
+        done += n
+
+
+def _buffered(fsrc, fdst, size):
+    shutil.copyfileobj(fsrc, fdst, CHUNK_SIZE)
+
+
+_STREAM_STRATEGIES = (('reflink', _reflink), ('copy_file_range', _copy_file_range),
+                      ('sendfile', _sendfile), ('buffered', _buffered))
+
+
+def copy_file(src: str, dst: str, allow_link: bool = False) -> str:
+    """Fill the existing, empty file *dst* with *src*; returns the strategy that worked."""
+    if allow_link:
+        try:
+            _link(src, dst)
+            return 'hardlink'
+        except OSError as e:
+            if e.errno not in _FALLBACK_ERRNOS and e.errno != errno.EEXIST:
+                raise
+    with open(src, 'rb') as fsrc, open(dst, 'r+b') as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        for name, strategy in _STREAM_STRATEGIES:
+            try:
+                strategy(fsrc, fdst, size)
+                return name
+            except OSError as e:
+                if e.errno not in _FALLBACK_ERRNOS or name == 'buffered':
+                    raise
+                fsrc.seek(0)
+                fdst.seek(0)
+                fdst.truncate()
+
+
+# ───────────────────────────── S3-compatible ────────────────────────────────
+class _CountingReader:
+    """File-like wrapper that counts the bytes boto3 pulls through it."""
+
+    def __init__(self, raw):
+        self.raw, self.count = raw, 0
+
+    def read(self, n=-1):
+        chunk = self.raw.read(n)
+        self.count += len(chunk)
+        return chunk
+
+
+class S3Storage(Storage):
+    """
+    Objects live under ``<bucket>/<key>``.
+
+    One client per driver (boto3 clients are thread-safe) with a connection
+    pool of S3_MAX_POOL_CONNECTIONS; streams above S3_MULTIPART_THRESHOLD are
+    uploaded and copied as parallel multipart transfers.
+    """
+
+    def __init__(self, bucket: str, root: str, endpoint_url: str | None = None,
+                 region: str | None = None, access_key: str | None = None,
+                 secret_key: str | None = None, max_pool_connections: int = 50,
+                 multipart_threshold: int = 8 * 1024 * 1024,
+                 multipart_chunksize: int = 8 * 1024 * 1024, max_concurrency: int = 8):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config as BotoConfig
+        except ImportError as e:  # pragma: no cover
+            raise StorageError("STORAGE_BACKEND=s3 needs the boto3 package") from e
+
+        super().__init__(root)
+        self.bucket = bucket
+        self.client = boto3.client(
+            's3', endpoint_url=endpoint_url, region_name=region,
+            aws_access_key_id=access_key, aws_secret_access_key=secret_key,
+            config=BotoConfig(max_pool_connections=max_pool_connections,
+                              retries={'max_attempts': 5, 'mode': 'standard'}),
+        )
+        self.transfer = TransferConfig(multipart_threshold=multipart_threshold,
+                                       multipart_chunksize=multipart_chunksize,
+                                       max_concurrency=max_concurrency)
+
+    def _missing(self, err) -> bool:
+        return err.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound')
+
+    def put(self, path, data) -> int:
+        key = self.key(path)
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=bytes(data))
+            return len(data)
+        reader = _CountingReader(data)
+        self.client.upload_fileobj(reader, self.bucket, key, Config=self.transfer)
+        return reader.count
+
+    def open(self, path):
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.key(path))['Body']
+        except ClientError as e:
+            if self._missing(e):
+                raise StorageError(f"not found: {path}") from e
+            raise
+
+    def read_range(self, path, start, end) -> bytes:
+        body = self.client.get_object(Bucket=self.bucket, Key=self.key(path),
+                                      Range=f"bytes={start}-{end}")['Body']
+        with body:
+            return body.read()
+
+    def copy(self, src, dst, immutable=False):
+        # server-side CopyObject / UploadPartCopy: no bytes pass through us
+        self.client.copy({'Bucket': self.bucket, 'Key': self.key(src)},
+                         self.bucket, self.key(dst), Config=self.transfer)
+        record_copy('server_side', self.size(dst))
+        return 'server_side'
+
+    def delete(self, path) -> bool:
+        existed = self.exists(path)
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(path))
+        return existed
+
+    def scan(self, prefix='', workers=8, skip=()):
+        prefix = self.key(prefix)
+        prefix = prefix + '/' if prefix else ''
+        for page in self.client.get_paginator('list_objects_v2').paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get('Contents', ()):
+                parts = obj['Key'].split('/')
+                if not any(p in skip for p in parts[:-1]):
+                    yield obj['Key'], obj['Size']
+
+    def stat(self, path):
+        from botocore.exceptions import ClientError
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self.key(path))
+        except ClientError as e:
+            if self._missing(e):
+                return None
+            raise
+        return StorageStat(size=head['ContentLength'], mtime=head['LastModified'].timestamp())
+
+    def send(self, path, as_attachment=False, download_name=None, mimetype=None):
+        obj = self.client.get_object(Bucket=self.bucket, Key=self.key(path))
+        name = download_name or os.path.basename(path)
+        mimetype = mimetype or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        resp = Response(obj['Body'].iter_chunks(CHUNK_SIZE), mimetype=mimetype,
+                        direct_passthrough=True)
+        resp.content_length = obj['ContentLength']
+        if as_attachment:
+            resp.headers.set('Content-Disposition', 'attachment', filename=name)
+        return resp
+
+
+# ───────────────────────────── wiring ──────────────────────────────────────
+def create_storage(config) -> Storage:
+    backend = config.get('STORAGE_BACKEND', 'local')
+    if backend == 'local':
+        accel = config.get('ACCEL_REDIRECT_PREFIX') if config.get('DOWNLOAD_MODE') == 'accel' else None
+        return LocalStorage(root=config['UPLOAD_FOLDER'], accel_prefix=accel)
+    if backend == 's3':
+        return S3Storage(
+            bucket=config['S3_BUCKET'], root=config['UPLOAD_FOLDER'],
+            endpoint_url=config.get('S3_ENDPOINT_URL'), region=config.get('S3_REGION'),
+            access_key=config.get('S3_ACCESS_KEY'), secret_key=config.get('S3_SECRET_KEY'),
+            max_pool_connections=config.get('S3_MAX_POOL_CONNECTIONS', 50),
+            multipart_threshold=config.get('S3_MULTIPART_THRESHOLD', 8 * 1024 * 1024),
+            multipart_chunksize=config.get('S3_MULTIPART_CHUNKSIZE', 8 * 1024 * 1024),
+        )
+    raise StorageError(f"unknown STORAGE_BACKEND {backend!r}")
+
+
+def init_storage(app):
+    app.extensions['storage'] = create_storage(app.config)
+
+
+def get_storage() -> Storage:
+    return current_app.extensions['storage']
+
+
+storage: Storage = LocalProxy(get_storage)  # type: ignore[assignment]
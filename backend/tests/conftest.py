@@ -7,12 +7,13 @@ import pytest
 os.environ["DATABASE_URL"] = "sqlite:///:memory:"
 
 # ✅ 正確引入 Flask 應用
-from ..app import app as real_app, db
+from ..app import create_app, db
+from .. import query_stats
 
 @pytest.fixture(scope="session")
 def flask_app():
     tmp_dir = tempfile.mkdtemp()
-    real_app.config.update(
+    real_app = create_app(
         TESTING=True,
         UPLOAD_FOLDER=tmp_dir,
         WTF_CSRF_ENABLED=False,
@@ -32,3 +33,8 @@ def app(flask_app):
 @pytest.fixture
 def client(app):
     return app.test_client()
+
+# ✅ with max_queries(n): ...  → fails the test if the block runs more than n SQL statements
+@pytest.fixture
+def max_queries():
+    return query_stats.max_queries
@@ -0,0 +1,95 @@
+import io
+import tarfile
+import zipfile
+
+from ..models import File, FileVersion, Folder
+from ..storage import storage
+
+
+def _zip(entries):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in entries:
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+def _tgz(entries):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tf:
+        for name, data in entries:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+def test_archive_is_unpacked_into_a_folder(client, app, monkeypatch):
+    client.post("/register", json={
+        "username": "unpacker", "email": "unpacker@mail", "password": "pwd", "grade": 1
+    })
+    client.post("/login", json={"username": "unpacker", "password": "pwd"})
+    docs = client.post("/folders", json={"name": "docs"}).get_json()["folder_id"]
+    monkeypatch.setitem(app.config, "ARCHIVE_BATCH_SIZE", 2)      # several batched flushes
+
+    body = _zip([("proj/", b""), ("proj/readme.md", b"# hi"), ("proj/src/main.py", b"print(1)"),
+                 ("proj/src/util.py", b"x = 2"), ("__MACOSX/proj/._readme.md", b"junk"),
+                 ("../evil.txt", b"nope"), ("proj/zeros.bin", bytes(2 * 1024 * 1024))])
+    rv = client.post(f"/upload-archive?folder_id={docs}", data=body)
+    report = rv.get_json()
+    assert rv.status_code == 201
+    assert (report["imported"], report["skipped"], report["rejected"], report["folders_created"]) == (3, 2, 2, 2)
+    status = {e["name"]: e["status"] for e in report["entries"]}
+    assert status["../evil.txt"] == "rejected" and status["proj/zeros.bin"] == "rejected"
+    main = next(e for e in report["entries"] if e["name"] == "proj/src/main.py")
+    assert client.get(f"/download/{main['file_id']}").data == b"print(1)"
+
+    proj = client.get(f"/folders/{docs}/children").get_json()["folders"][0]
+    assert (proj["name"], proj["subfolders"], proj["files"]) == ("proj", 1, 1)
+    src = client.get(f"/folders/{proj['id']}/children").get_json()
+    assert [f["name"] for f in src["folders"]] == ["src"] and src["folders"][0]["bytes"] == 13
+
+    # the same archive again: every file already exists, nothing is overwritten
+    again = client.post(f"/upload-archive?folder_id={docs}", data=body).get_json()
+    assert again["imported"] == 0 and again["exists"] == 3 and again["folders_created"] == 0
+
+    # archive-wide limits abort the whole import
+    with app.app_context():
+        before = File.query.count()
+    many = _tgz([(f"bulk/{i}.txt", b"x") for i in range(5)])
+    monkeypatch.setitem(app.config, "ARCHIVE_MAX_ENTRIES", 3)
+    assert client.post("/upload-archive", data=many).status_code == 413
+    monkeypatch.setitem(app.config, "ARCHIVE_MAX_ENTRIES", 100)
+    bomb = _tgz([("bomb/a.txt", b"a"), ("bomb/zeros.bin", bytes(4 * 1024 * 1024))])
+    rv = client.post("/upload-archive", data=bomb)
+    assert rv.status_code == 413 and "compressed" in rv.get_json()["error"]
+    with app.app_context():
+        assert File.query.count() == before
+        assert not storage.exists("unpacker/bomb/a.txt")               # written, then removed again
+    assert client.post("/upload-archive", data=many).get_json()["imported"] == 5   # tar streams fine
+
+    assert client.post("/upload-archive", data=b"definitely not an archive").status_code == 400
+
+
+def test_archive_cannot_write_into_reserved_directories(client, app):
+    client.post("/register", json={
+        "username": "dotter", "email": "dotter@mail", "password": "pwd", "grade": 1
+    })
+    client.post("/login", json={"username": "dotter", "password": "pwd"})
+    fid = client.post("/upload", data={"file": (io.BytesIO(b"original"), "a.txt")},
+                      content_type="multipart/form-data").get_json()["file_id"]
+    with app.app_context():
+        blob = FileVersion.query.filter_by(file_id=fid).one().path
+    inside = blob.split("/", 1)[1]                                 # ".version/<h>/<h>/<name>"
+
+    body = _zip([(inside, b"tampered"), ("docs/.derived/x.txt", b"x"), ("docs/ok.txt", b"ok")])
+    report = client.post("/upload-archive", data=body).get_json()
+    status = {e["name"]: e["status"] for e in report["entries"]}
+    assert status[inside] == "rejected" and status["docs/.derived/x.txt"] == "rejected"
+    assert status["docs/ok.txt"] == "imported"
+    assert client.get(f"/download/{fid}").data == b"original"
+    with app.app_context():
+        assert storage.read(blob) == b"original"
+        assert not Folder.query.filter(Folder.name.like(".%")).count()
+
+    assert client.post("/folders", json={"name": ".version"}).status_code == 400
@@ -49,3 +49,16 @@ def test_register_login_logout(client):
 def test_google_oauth2_login(client):
     rv = client.get("/auth/google/login")
     assert rv.status_code == 302  # Redirect to Google OAuth
+
+
+def test_create_app_is_side_effect_free():
+    from sqlalchemy import inspect
+    from ..app import create_app, db
+
+    other = create_app(TESTING=True, METRICS_ENABLED=False,
+                       SQLALCHEMY_DATABASE_URI="sqlite://")
+    # no tables created, no users seeded until the CLI commands run
+    with other.app_context():
+        assert inspect(db.engine).get_table_names() == []
+    assert "main.health" in other.view_functions
+    assert {"init-db", "seed-users"} <= set(other.cli.commands)
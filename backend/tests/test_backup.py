@@ -0,0 +1,115 @@
+import io
+import json
+import os
+import tarfile
+import tempfile
+from io import BytesIO
+
+import pytest
+
+from .. import backup
+from ..app import create_app
+from ..models import db, DocumentReview, File, FileVersion, Folder, User
+from ..storage import storage
+
+
+def _members(archive: bytes) -> dict:
+    with tarfile.open(fileobj=io.BytesIO(archive), mode="r|*") as tar:
+        return {m.name: tar.extractfile(m).read() for m in tar}
+
+
+def _manifest(members: dict) -> dict:
+    """manifest.json with the rows/<table>/*.jsonl members folded back in."""
+    manifest = json.loads(members["manifest.json"])
+    for name in sorted(members):
+        if name.startswith(backup.ROW_DIR):
+            key = name.split("/")[1]
+            manifest.setdefault(key, []).extend(json.loads(line) for line in members[name].splitlines())
+    return manifest
+
+
+def test_snapshot_round_trip_full_then_incremental(client, app):
+    for name in ("snap", "snaprev"):
+        client.post("/register", json={
+            "username": name, "email": f"{name}@mail", "password": "pwd", "grade": 1
+        })
+    client.post("/login", json={"username": "snap", "password": "pwd"})
+    client.post("/folders", json={"name": "Reports"})
+    fid = client.post("/upload", data={"file": (BytesIO(b"draft"), "plan.txt")},
+                      content_type="multipart/form-data").get_json()["file_id"]
+    client.post(f"/file-content/{fid}", json={"content": "final"})
+    with app.app_context():
+        me = User.query.filter_by(username="snap").one()
+        reviewer = User.query.filter_by(username="snaprev").one()
+        db.session.add(DocumentReview(file_id=fid, reviewer_id=reviewer.id, requester_id=me.id,
+                                      status="pending", original_version=1, modified_version=2))
+        db.session.commit()
+
+    rv = client.get("/export")
+    assert rv.status_code == 200 and rv.mimetype == "application/gzip"
+    full, snapshot_id = rv.data, int(rv.headers[backup.SNAPSHOT_HEADER])
+    members = _members(full)
+    manifest = _manifest(members)
+    assert manifest["scope"] == {"user": "snap"} and manifest["snapshot_id"] == snapshot_id
+    assert {v["version_number"] for v in manifest["versions"]} == {1, 2}
+    assert members[f"blobs/{manifest['versions'][0]['sha256']}"] == b"draft"
+    assert [u["password_hash"] for u in manifest["users"] if u["username"] != "snap"] == ["!"]
+
+    client.post(f"/file-content/{fid}", json={"content": "final, really"})
+    rv = client.get(f"/export?since={snapshot_id}")
+    incremental = rv.data
+    manifest = _manifest(_members(incremental))
+    assert [v["version_number"] for v in manifest["versions"]] == [3]
+    assert len(manifest["files"]) == 1 and len(manifest["reviews"]) == 1
+    assert client.get("/export?scope=all").status_code == 403
+
+    # restore both into an empty deployment
+    tmp = tempfile.mkdtemp()
+    other = create_app(TESTING=True, METRICS_ENABLED=False, UPLOAD_FOLDER=tmp,
+                       SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(tmp, 'restore.db')}")
+    with other.app_context():
+        db.create_all()
+        report = backup.import_from(io.BytesIO(full))
+        assert report.inserted["versions"] == 2 and report.blobs == 2 and report.live_restored == 1
+        report = backup.import_from(io.BytesIO(incremental))
+        assert report.inserted["versions"] == 1 and report.updated["files"] == 1
+
+        restored = db.session.get(File, fid)
+        assert restored.current_version == 3
+        assert storage.read(restored.path) == b"final, really"
+        assert [storage.read(v.path) for v in restored.versions] == [b"final, really", b"final", b"draft"]
+        assert Folder.query.filter_by(name="Reports").count() == 1
+        assert DocumentReview.query.filter_by(file_id=fid).one().modified_version == 2
+
+        # replaying is harmless; a foreign database is refused
+        assert backup.import_from(io.BytesIO(incremental)).inserted["versions"] == 0
+        db.session.get(User, manifest["users"][0]["id"]).username = "someone-else"
+        db.session.commit()
+        with pytest.raises(backup.BackupError):
+            backup.import_from(io.BytesIO(full))
+        assert FileVersion.query.count() == 3
+
+
+def test_export_streams_rows_in_batches_and_blobs_in_chunks(client, app, monkeypatch):
+    client.post("/register", json={
+        "username": "bigsnap", "email": "bigsnap@mail", "password": "pwd", "grade": 1
+    })
+    client.post("/login", json={"username": "bigsnap", "password": "pwd"})
+    big = os.urandom(backup.CHUNK_SIZE * 2 + 5)
+    for name in ("big.bin", "same.bin"):                   # one blob, two versions
+        client.post("/upload", data={"file": (BytesIO(big), name)}, content_type="multipart/form-data")
+    client.post("/upload", data={"file": (BytesIO(b"small"), "small.txt")},
+                content_type="multipart/form-data")
+    monkeypatch.setattr(backup, "BATCH", 1)
+
+    with app.app_context():
+        user = User.query.filter_by(username="bigsnap").one()
+        manifest = backup.build_manifest(user)
+        chunks = list(backup.iter_archive(manifest, user, workers=2))
+    assert manifest["rows"]["versions"] == 3 and manifest["rows"]["files"] == 3
+    assert max(len(c) for c in chunks) < len(big)             # nothing held a whole blob
+
+    members = _members(b"".join(chunks))
+    assert len([n for n in members if n.startswith("rows/versions/")]) == 3
+    blobs = {n: data for n, data in members.items() if n.startswith(backup.BLOB_DIR)}
+    assert sorted(blobs.values(), key=len) == [b"small", big]
@@ -0,0 +1,25 @@
+import json
+
+from ..benchmarks import runner
+from ..benchmarks.__main__ import main
+
+
+def test_benchmark_smoke_run_writes_baseline(tmp_path):
+    out = tmp_path / "run.json"
+    rc = main(["--users", "2", "--files-per-user", "15", "--max-versions", "5",
+               "--notifications-per-user", "5", "--iterations", "2", "--warmup", "1",
+               "--concurrency", "2", "--out", str(out)])
+    assert rc == 0
+    data = json.loads(out.read_text())
+    assert data["meta"]["counts"]["files"] == 30
+    assert {"client:folders", "wsgi:folders", "client:compare_versions"} <= set(data["results"])
+
+    # identical run never regresses against itself
+    assert runner.compare(data, data) == []
+
+
+def test_compare_flags_slowdowns():
+    base = {"results": {"client:folders": {"p50_ms": 10.0}}}
+    now = {"results": {"client:folders": {"p50_ms": 20.0}}}
+    assert runner.compare(now, base, tolerance=0.5)[0].startswith("client:folders")
+    assert runner.compare(now, base, tolerance=1.5) == []
@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta
+from io import BytesIO
+
+from .. import changes, retention
+from ..models import db, ChangeLog, File, FileVersion, Folder, User
+
+
+def _login(client, name):
+    client.post("/register", json={
+        "username": name, "email": f"{name}@mail", "password": "pwd", "grade": 1
+    })
+    client.post("/login", json={"username": name, "password": "pwd"})
+
+
+def _drain(client, cursor, limit=200):
+    seen = []
+    while True:
+        body = client.get(f"/changes?since={cursor}&limit={limit}").get_json()
+        seen += body["changes"]
+        cursor = body["cursor"]
+        if not body["has_more"]:
+            return seen, cursor
+
+
+def test_feed_follows_mutations(client, app, monkeypatch):
+    monkeypatch.setitem(app.config, "CHANGES_SETTLE_SECONDS", 0)
+    _login(client, "feeder")
+    cursor = client.get("/changes").get_json()["cursor"]
+    assert client.get(f"/changes?since={cursor}").get_json()["changes"] == []
+
+    folder = client.post("/folders", json={"name": "Sync"}).get_json()["folder_id"]
+    fid = client.post("/upload", data={"file": (BytesIO(b"v1"), "a.txt")},
+                      content_type="multipart/form-data").get_json()["file_id"]
+    client.post(f"/file-content/{fid}", json={"content": "v2"})
+    client.post(f"/rename-file/{fid}", json={"new_filename": "b.txt"})
+    client.post("/move-file", json={"file_id": fid, "target_folder_id": folder})
+
+    seen, cursor = _drain(client, cursor, limit=2)
+    files = [c for c in seen if c["entity"] == "file" and c["id"] == fid]
+    assert files[-1]["op"] == "upsert" and files[-1]["data"]["filename"] == "b.txt"
+    assert files[-1]["data"]["folder_id"] == folder and files[-1]["data"]["current_version"] == 2
+    assert {c["data"]["version_number"] for c in seen if c["entity"] == "version"} == {1, 2}
+    assert any(c["entity"] == "folder" and c["id"] == folder for c in seen)
+
+    # another user's private changes are not in my feed; a page collapses repeats
+    with app.app_context():
+        me_id = User.query.filter_by(username="feeder").one().id
+        other = app.test_client()
+        _login(other, "lurker")
+        other.post("/upload", data={"file": (BytesIO(b"x"), "mine.txt")},
+                   content_type="multipart/form-data")
+    client.post(f"/rename-file/{fid}", json={"new_filename": "c.txt"})
+    client.post(f"/rename-file/{fid}", json={"new_filename": "d.txt"})
+    body = client.get(f"/changes?since={cursor}").get_json()
+    assert [(c["entity"], c["id"], c["data"]["filename"]) for c in body["changes"]] == [("file", fid, "d.txt")]
+    cursor = body["cursor"]
+
+    client.delete(f"/delete/{fid}")
+    seen, cursor = _drain(client, cursor)
+    assert ("file", fid, "delete") in {(c["entity"], c["id"], c["op"]) for c in seen}
+    with app.app_context():
+        assert ChangeLog.query.filter_by(entity_id=fid, user_id=me_id).count() >= 5
+
+    assert client.get("/changes?since=!!").status_code == 400
+
+
+def test_rollback_leaves_no_entries_and_compaction(client, app, monkeypatch):
+    monkeypatch.setitem(app.config, "CHANGES_SETTLE_SECONDS", 0)
+    _login(client, "compactor")
+    cursor = client.get("/changes").get_json()["cursor"]
+    with app.app_context():
+        me = User.query.filter_by(username="compactor").one()
+        root = Folder.query.filter_by(owner_id=me.id, parent_id=None).one()
+        before = ChangeLog.query.count()
+        db.session.add(Folder(name="ghost", owner_id=me.id, parent_id=root.id))
+        db.session.flush()
+        db.session.rollback()
+        assert ChangeLog.query.count() == before
+
+        folder = Folder(name="n0", owner_id=me.id, parent_id=root.id)
+        db.session.add(folder)
+        db.session.commit()
+        for i in range(1, 4):
+            folder.name = f"n{i}"
+            db.session.commit()
+        rows = ChangeLog.query.filter_by(entity="folder", entity_id=folder.id).count()
+        assert rows == 4
+
+        result = changes.compact(now=datetime.utcnow() + timedelta(hours=25))
+        assert result["collapsed"] >= 3 and result["expired"] == 0
+        assert ChangeLog.query.filter_by(entity="folder", entity_id=folder.id).one().data["name"] == "n3"
+
+    body = client.get(f"/changes?since={cursor}").get_json()
+    assert [c["data"]["name"] for c in body["changes"] if c["entity"] == "folder"] == ["n3"]
+
+    with app.app_context():
+        changes.compact(now=datetime.utcnow() + timedelta(days=31))
+        assert ChangeLog.query.count() == 0
+    rv = client.get(f"/changes?since={cursor}")
+    assert rv.status_code == 410 and rv.get_json()["resync"]
+    assert client.get(f"/changes?since={rv.get_json()['cursor']}").status_code == 200
+
+
+def test_retention_sweep_records_tombstones(client, app, monkeypatch):
+    _login(client, "swept")
+    fid = client.post("/upload", data={"file": (BytesIO(b"0"), "s.txt")},
+                      content_type="multipart/form-data").get_json()["file_id"]
+    for i in range(1, 3):
+        client.post(f"/file-content/{fid}", json={"content": str(i)})
+    with app.app_context():
+        owner = db.session.get(File, fid).owner_id
+        first = FileVersion.query.filter_by(file_id=fid, version_number=1).one().id
+        retention.sweep(retention.RetentionPolicy(keep_last=2, daily_days=0, weekly_weeks=0),
+                        user_id=owner)
+        tomb = ChangeLog.query.filter_by(entity="version", entity_id=first, op="delete").one()
+        assert tomb.user_id == owner
+
+
+def test_older_versions_of_published_files_stay_with_the_owner(client, app):
+    _login(client, "pubber")
+    fid = client.post("/upload", data={"file": (BytesIO(b"v1"), "p.txt")},
+                      content_type="multipart/form-data").get_json()["file_id"]
+    with app.app_context():
+        db.session.get(File, fid).is_published = True
+        db.session.commit()
+    client.post(f"/upload-version/{fid}", data={"file": (BytesIO(b"v2"), "p.txt")},
+                content_type="multipart/form-data")
+    with app.app_context():
+        owner = db.session.get(File, fid).owner_id
+        versions = {v.id: v for v in FileVersion.query.filter_by(file_id=fid)}
+        next(v for v in versions.values() if v.version_number == 1).comment = "internal note"
+        db.session.commit()
+
+        audience = {}
+        for row in ChangeLog.query.filter(ChangeLog.entity == "version", ChangeLog.op == "upsert",
+                                          ChangeLog.entity_id.in_(versions)):
+            audience.setdefault(row.data["version_number"], set()).add(row.user_id)
+    assert audience == {1: {owner}, 2: {changes.EVERYONE}}
@@ -0,0 +1,50 @@
+import os
+import tempfile
+
+from ..app import create_app
+from ..config import Config, engine_options
+from ..models import db, User, Folder
+
+
+def test_engine_options_only_for_pooled_drivers():
+    cfg = {k: getattr(Config, k) for k in dir(Config) if k.isupper()}
+    assert engine_options("sqlite://", cfg) == {}
+    opts = engine_options("mysql+pymysql://u:p@db/x", cfg)
+    assert opts["pool_pre_ping"] is True
+    assert opts["pool_recycle"] == Config.DB_POOL_RECYCLE
+    assert opts["pool_size"] == Config.DB_POOL_SIZE
+
+
+def test_listing_reads_from_replica_until_a_write():
+    tmp = tempfile.mkdtemp()
+    app = create_app(
+        TESTING=True, METRICS_ENABLED=False, UPLOAD_FOLDER=tmp,
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(tmp, 'primary.db')}",
+        DATABASE_REPLICA_URL=f"sqlite:///{os.path.join(tmp, 'replica.db')}",
+        REPLICA_STICKY_SECONDS=60,
+    )
+    with app.app_context():
+        # same user in both databases, root folders told apart by name
+        for engine, root_name in ((db.engines[None], "primary root"),
+                                  (app.extensions["db_replica"], "replica root")):
+            db.metadata.create_all(engine)
+            with engine.begin() as conn:
+                conn.execute(User.__table__.insert(), {
+                    "id": 1, "username": "rr", "email": "rr@mail",
+                    "password_hash": "x",
+                })
+                conn.execute(Folder.__table__.insert(),
+                             {"id": 1, "name": root_name, "owner_id": 1})
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = "1"
+
+    assert client.get("/folders").get_json()["tree"]["name"] == "replica root"
+
+    rv = client.post("/folders", json={"name": "fresh"})
+    assert rv.status_code == 201
+
+    tree = client.get("/folders").get_json()["tree"]
+    assert tree["name"] == "primary root"
+    assert [c["name"] for c in tree["children"]] == ["fresh"]
@@ -0,0 +1,39 @@
+from io import BytesIO
+
+from prometheus_client import REGISTRY
+
+from .. import domain_metrics
+
+
+def _value(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_upload_and_download_are_counted(client, app):
+    client.post("/register", json={
+        "username": "muser", "email": "m@mail", "password": "pwd", "grade": 2
+    })
+    client.post("/login", json={"username": "muser", "password": "pwd"})
+
+    before_up = _value("docs_upload_bytes_total", operation="upload_file")
+    before_writes = _value("docs_disk_write_seconds_count", operation="upload_file")
+    rv = client.post("/upload", data={"file": (BytesIO(b"12345"), "m.txt")},
+                     content_type="multipart/form-data")
+    fid = rv.get_json()["file_id"]
+    assert _value("docs_upload_bytes_total", operation="upload_file") == before_up + 5
+    assert _value("docs_disk_write_seconds_count", operation="upload_file") == before_writes + 2
+
+    before_down = _value("docs_download_bytes_total", operation="download_file")
+    client.get(f"/download/{fid}")
+    assert _value("docs_download_bytes_total", operation="download_file") == before_down + 5
+
+    client.post(f"/file-content/{fid}", json={"content": "123"})
+    before_freed = _value("docs_version_bytes_reclaimed_total", operation="cleanup_versions")
+    client.post(f"/cleanup-versions/{fid}")
+    assert _value("docs_version_bytes_reclaimed_total",
+                  operation="cleanup_versions") == before_freed + 5
+
+    with app.app_context():
+        domain_metrics.collect_gauges()
+    assert _value("docs_stored_bytes", tier="grade-2") >= 3
+    assert _value("docs_metrics_collector_last_run_timestamp_seconds") > 0
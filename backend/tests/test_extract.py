@@ -0,0 +1,112 @@
+import io
+import time
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from .. import extract
+from ..models import ExtractedContent
+
+
+def _docx(*paragraphs, title="Plan"):
+    body = "".join(f'<w:p><w:r><w:t>{p[:3]}</w:t></w:r><w:r><w:t>{p[3:]}</w:t></w:r></w:p>'
+                   for p in paragraphs)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("word/document.xml",
+                    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                    f'<w:body>{body}</w:body></w:document>')
+        zf.writestr("docProps/core.xml",
+                    '<cp:coreProperties xmlns:cp="x" xmlns:dc="http://purl.org/dc/elements/1.1/">'
+                    f'<dc:title>{title}</dc:title><dc:creator>Ann</dc:creator></cp:coreProperties>')
+    return buf.getvalue()
+
+
+def _pdf(*lines):
+    content = b"BT /F1 12 Tf " + b" T* ".join(b"(%s) Tj" % l.encode() for l in lines) + b" ET"
+    stream = zlib.compress(content)
+    return (b"%%PDF-1.4\n1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n"
+            b"2 0 obj << /Type /Pages /Kids [3 0 R] /Count 1 >> endobj\n"
+            b"3 0 obj << /Type /Page /Parent 2 0 R /Contents 4 0 R >> endobj\n"
+            b"4 0 obj << /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream endobj\n"
+            b"5 0 obj << /Title (Q3 \\(draft\\)) >> endobj\n%%%%EOF" % (len(stream), stream))
+
+
+def test_extractors():
+    assert extract.run_job(".docx", _docx("Hello world", "Second para"), 0, 100)["text"] == \
+        "Hello world\nSecond para"
+    result = extract.run_job(".docx", _docx("Hello"), 0, 100)
+    assert result["meta"] == {"title": "Plan", "author": "Ann", "paragraphs": 1}
+
+    result = extract.run_job(".pdf", _pdf("Quarterly report", "Revenue up"), 0, 100)
+    assert result["text"] == "Quarterly report\nRevenue up"
+    assert result["meta"] == {"pages": 1, "title": "Q3 (draft)"}
+
+    result = extract.run_job(".csv", b"name;qty\nbolts;3\nnuts;7\n", 0, 100)
+    assert result["text"] == "name\tqty\nbolts\t3\nnuts\t7"
+    assert result["meta"] == {"rows": 3, "columns": 2, "header": ["name", "qty"]}
+
+    assert extract.run_job(".csv", b"a,b\n" * 100, 0, 10)["meta"]["truncated"]
+    assert extract.run_job(".docx", b"not a zip", 0, 100)["status"] == "failed"
+
+
+@extract.extractor(".slow")
+def _slow(data):
+    while True:
+        time.sleep(0.01)
+
+
+@extract.extractor(".hog")
+def _hog(data):
+    return bytes(1 << 30).decode(), {}
+
+
+def test_jobs_are_bounded_in_the_pool():
+    with ProcessPoolExecutor(max_workers=1, initializer=extract._limit_memory, initargs=(64,)) as pool:
+        assert pool.submit(extract.run_job, ".slow", b"", 0.2, 100).result(5)["error"] == "timed out after 0.2s"
+        assert pool.submit(extract.run_job, ".hog", b"", 5, 100).result(5)["error"] == "memory limit exceeded"
+        assert pool.submit(extract.run_job, ".docx", _docx("still fine"), 5, 100).result(5)["text"] == "still fine"
+
+
+def test_uploads_are_extracted_once_per_content(client, app):
+    client.post("/register", json={
+        "username": "extractor", "email": "extractor@mail", "password": "pwd", "grade": 1
+    })
+    client.post("/login", json={"username": "extractor", "password": "pwd"})
+    upload = lambda data, name: client.post(
+        "/upload", data={"file": (io.BytesIO(data), name)},
+        content_type="multipart/form-data").get_json()
+    first = upload(_docx("Budget 2024"), "budget.docx")
+    fid = first["file_id"]
+
+    rv = client.get(f"/file-content/{fid}")
+    if rv.status_code == 202:
+        with app.app_context():
+            extract.get_extraction().submit(first["sha256"], "", "budget.docx").result(10)
+        rv = client.get(f"/file-content/{fid}")
+    body = rv.get_json()
+    assert rv.status_code == 200 and body["content"] == "Budget 2024" and body["read_only"]
+    assert body["metadata"]["extractor"] == "docx"
+
+    copy = upload(_docx("Budget 2024"), "copy.docx")      # same bytes: served from the cache
+    assert client.get(f"/file-content/{copy['file_id']}").get_json()["content"] == "Budget 2024"
+    with app.app_context():
+        assert ExtractedContent.query.filter_by(sha256=first["sha256"]).count() == 1
+
+    client.post(f"/upload-version/{fid}", data={"file": (io.BytesIO(_docx("Budget 2025")), "budget.docx")},
+                content_type="multipart/form-data")
+    app.extensions["extraction"].workers = 0
+    try:
+        diff = client.get(f"/compare-versions/{fid}/1/2").get_json()
+    finally:
+        app.extensions["extraction"].workers = app.config["EXTRACT_WORKERS"]
+    assert diff["text_differences"]["different_lines"] == [
+        {"line_number": 1, "version1": "Budget 2024", "version2": "Budget 2025"}]
+
+    bad = upload(b"not a pdf", "broken.pdf")["file_id"]
+    app.extensions["extraction"].workers = 0
+    try:
+        assert client.get(f"/file-content/{bad}").status_code == 422
+    finally:
+        app.extensions["extraction"].workers = app.config["EXTRACT_WORKERS"]
+    assert client.get(f"/file-content/{upload(b'x', 'blob.bin')['file_id']}").status_code == 400
@@ -1,6 +1,8 @@
 from io import BytesIO
 import json
 
+from ..pagination import encode_cursor
+
 def _register_and_login(client, username="u1"):
     # register
     client.post("/register", json={
@@ -85,4 +87,98 @@ def test_folder_create_upload_move_rename_delete(client):
     file_id = rv.get_json()["file_id"]
 
     rv = client.get(f"/download/{file_id}")
-    assert rv.status_code == 200
\ No newline at end of file
+    assert rv.status_code == 200
+
+def test_folder_children_are_paged_with_aggregates(client, app):
+    from backend import stats
+    from backend.models import db, FolderRollup
+
+    _register_and_login(client, "lister")
+    mk = lambda name, parent=None: client.post(
+        "/folders", json={"name": name, "parent_id": parent}).get_json()["folder_id"]
+    up = lambda name, data, folder: client.post(
+        "/upload", data={"file": (BytesIO(data), name), "folder_id": folder},
+        content_type="multipart/form-data").get_json()["file_id"]
+
+    projects = mk("projects")
+    for name in ("beta", "alpha", "gamma"):
+        mk(name, projects)
+    up("b.txt", b"12345", projects)
+    moved = up("a.txt", b"123", projects)
+    mk("deep", mk("nested", mk("alpha2", projects)))
+
+    root = client.get("/folders/root/children").get_json()
+    entry = next(f for f in root["folders"] if f["id"] == projects)
+    assert (entry["subfolders"], entry["files"], entry["bytes"]) == (4, 2, 8)
+    assert entry["last_modified"]
+
+    # one level at a time, folders first, then files, two entries per page
+    names, cursor = [], None
+    while True:
+        rv = client.get(f"/folders/{projects}/children?limit=2" + (f"&cursor={cursor}" if cursor else ""))
+        body = rv.get_json()
+        names += [f["name"] for f in body["folders"]] + [f["name"] for f in body["files"]]
+        cursor = rv.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert names == ["alpha", "alpha2", "beta", "gamma", "a.txt", "b.txt"]
+    assert body["folder"]["id"] == projects and body["files"][-1]["size"] == 5
+
+    # aggregates follow edits, moves and deletes
+    client.post(f"/file-content/{moved}", json={"content": "1234567"})
+    client.post("/move-file", json={"file_id": moved, "target_folder_id": None})
+    gamma = next(f["id"] for f in client.get(f"/folders/{projects}/children").get_json()["folders"]
+                 if f["name"] == "gamma")
+    client.delete(f"/folders/{gamma}")
+    entry = next(f for f in client.get("/folders/root/children").get_json()["folders"]
+                 if f["id"] == projects)
+    assert (entry["subfolders"], entry["files"], entry["bytes"]) == (3, 1, 5)
+    with app.app_context():
+        assert db.session.get(FolderRollup, gamma) is None
+        assert stats.reconcile()["folders"] == 0
+
+    assert client.get(f"/folders/{projects}/children?cursor=bogus").status_code == 400
+    for bad in ({"p": True, "n": "a", "id": 1}, {"p": 0, "n": 5, "id": 1},
+                {"p": 0, "n": "a", "id": 1.5}, {"p": 2, "n": "a", "id": 1}):
+        assert client.get(f"/folders/{projects}/children?cursor={encode_cursor(bad)}").status_code == 400
+    assert client.get("/folders/99999/children").status_code == 404
+
+
+def test_folder_rename_and_move_rewrite_paths_in_bulk(client, app, monkeypatch):
+    from backend.models import db, File
+
+    _register_and_login(client, "mover")
+    mk = lambda name, parent=None: client.post(
+        "/folders", json={"name": name, "parent_id": parent}).get_json()["folder_id"]
+    up = lambda name, folder: client.post(
+        "/upload", data={"file": (BytesIO(name.encode()), name), "folder_id": folder},
+        content_type="multipart/form-data").get_json()["file_id"]
+
+    a = mk("a"); b = mk("b", a); c = mk("c", b); mk("b2", a)
+    in_b, in_c = up("one.txt", b), up("two.txt", c)
+
+    rv = client.post(f"/rename-folder/{b}", json={"new_name": "bee"})
+    assert rv.status_code == 200 and rv.get_json()["files_moved"] == 2
+    assert client.get(f"/download/{in_c}").data == b"two.txt"
+    assert client.post(f"/rename-folder/{b}", json={"new_name": "b2"}).status_code == 400
+    assert client.post(f"/rename-folder/{b}", json={"new_name": "x/y"}).status_code == 400
+
+    rv = client.post("/move-folder", json={"folder_id": b, "target_folder_id": None})
+    assert rv.status_code == 200
+    with app.app_context():
+        assert db.session.get(File, in_b).path == "mover/bee/one.txt"
+        assert db.session.get(File, in_c).path == "mover/bee/c/two.txt"
+    assert client.get(f"/download/{in_b}").data == b"one.txt"
+    root = client.get("/folders/root/children").get_json()["folders"]
+    assert {f["name"]: f["subfolders"] for f in root} == {"a": 1, "bee": 1}
+
+    # cycles and the depth limit are refused before anything moves
+    assert client.post("/move-folder", json={"folder_id": b, "target_folder_id": c}).status_code == 400
+    assert client.post("/move-folder", json={"folder_id": b, "target_folder_id": b}).status_code == 400
+    monkeypatch.setitem(app.config, "FOLDER_DEPTH_LIMIT", 3)
+    rv = client.post("/move-folder", json={"folder_id": b, "target_folder_id": a})
+    assert rv.status_code == 200                                   # a/bee/c: three levels
+    deeper = mk("d", a)
+    rv = client.post("/move-folder", json={"folder_id": b, "target_folder_id": deeper})
+    assert rv.status_code == 400 and "3 levels" in rv.get_json()["error"]
+    assert client.get(f"/download/{in_c}").data == b"two.txt"
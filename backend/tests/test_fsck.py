@@ -0,0 +1,58 @@
+import os
+import time
+from io import BytesIO
+
+from .. import fsck
+from ..models import File, FileVersion, db
+from ..storage import storage
+
+
+def _age(path, seconds=3600):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_fsck_finds_and_repairs_drift(client, app):
+    client.post("/register", json={
+        "username": "fsck", "email": "fsck@mail", "password": "pwd", "grade": 1
+    })
+    client.post("/login", json={"username": "fsck", "password": "pwd"})
+    fid = client.post("/upload", data={"file": (BytesIO(b"first"), "f.txt")},
+                      content_type="multipart/form-data").get_json()["file_id"]
+    client.post(f"/file-content/{fid}", json={"content": "second"})
+
+    root = app.config["UPLOAD_FOLDER"]
+    with app.app_context():
+        baseline = fsck.run()
+        live = db.session.get(File, fid)
+        v1, v2 = FileVersion.query.filter_by(file_id=fid).order_by(FileVersion.version_number)
+        v1_id, v2_id, live_path = v1.id, v2.id, live.path
+
+        orphan = os.path.join(root, "fsck", "stray.bin")
+        with open(orphan, "wb") as fh:
+            fh.write(b"zzz")
+        _age(orphan)
+        fresh = os.path.join(root, "fsck", "uploading.bin")
+        with open(fresh, "wb") as fh:
+            fh.write(b"in flight")
+        os.remove(storage.local_path(live.path))
+        os.remove(storage.local_path(v1.path))
+        v2.size = 999
+        db.session.commit()
+
+        report = fsck.run()
+        assert report.orphans == baseline.orphans + 1
+        assert "fsck/stray.bin" in report.samples["orphans"]
+        assert report.missing == baseline.missing + 2
+        assert report.size_mismatches == baseline.size_mismatches + 1
+
+        fixed = fsck.run(repair=True, quarantine=True)
+        assert fixed.quarantined == fixed.orphans and fixed.repaired >= 3
+        assert not os.path.exists(orphan) and os.path.exists(fresh)
+        assert db.session.get(FileVersion, v1_id) is None
+        assert db.session.get(FileVersion, v2_id).size == len(b"second")
+        assert storage.read(live_path) == b"second"
+
+        after = fsck.run()
+        assert after.orphans == 0 and after.missing == 0 and after.size_mismatches == 0
+        os.remove(fresh)
@@ -0,0 +1,47 @@
+import time
+from io import BytesIO
+
+from .. import health
+from ..hot_cache import get_cache
+from ..models import File, FileVersion, db
+
+
+def test_liveness_does_not_touch_dependencies(client, monkeypatch):
+    monkeypatch.setattr(health, "_check_engine", None)
+    rv = client.get("/healthz")
+    assert rv.status_code == 200 and rv.get_json() == {"status": "ok"}
+
+
+def test_ready_only_after_warm_up(client, app, monkeypatch):
+    client.post("/register", json={
+        "username": "warm", "email": "warm@mail", "password": "pwd", "grade": 1
+    })
+    client.post("/login", json={"username": "warm", "password": "pwd"})
+    fid = client.post("/upload", data={"file": (BytesIO(b"handbook"), "h.txt")},
+                      content_type="multipart/form-data").get_json()["file_id"]
+    with app.app_context():
+        db.session.get(File, fid).is_published = True
+        db.session.commit()
+        digest = FileVersion.query.filter_by(file_id=fid).one().sha256
+        get_cache().clear()
+
+    warmup = health.get_warmup(app)
+    first = client.get("/readyz")
+    if not warmup.done.is_set():
+        assert first.status_code == 503
+    assert warmup.done.wait(5)
+
+    rv = client.get("/readyz")
+    body = rv.get_json()
+    assert rv.status_code == 200 and body["ready"]
+    assert body["checks"]["database"]["ok"] and body["checks"]["storage"]["ok"]
+    assert all(step["ok"] for step in body["warmup"]["steps"].values())
+    assert body["warmup"]["steps"]["pool"]["result"] == {"database": 1}
+    with app.app_context():
+        assert get_cache().get(digest) == b"handbook"
+
+    monkeypatch.setitem(app.config, "HEALTH_CHECK_TIMEOUT", 0.05)
+    monkeypatch.setattr(health, "_check_storage", lambda store: time.sleep(0.5))
+    rv = client.get("/readyz")
+    assert rv.status_code == 503
+    assert rv.get_json()["checks"]["storage"] == {"ok": False, "error": "timed out after 0.05s"}
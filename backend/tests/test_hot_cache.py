@@ -0,0 +1,57 @@
+from io import BytesIO
+
+from prometheus_client import REGISTRY
+
+from ..hot_cache import HotCache
+from ..models import File, db
+
+
+def _hits():
+    return REGISTRY.get_sample_value("docs_hot_cache_hits_total") or 0
+
+
+def test_admission_by_frequency_and_lru_eviction():
+    cache = HotCache(max_bytes=10, max_item_bytes=6, admit_after=2)
+    assert cache.get("a") is None
+    assert cache.put("a", b"aaaa") is False          # seen once: not admitted yet
+    cache.get("a")
+    assert cache.put("a", b"aaaa") and cache.get("a") == b"aaaa"
+
+    for _ in range(2):
+        cache.get("b")
+    assert cache.put("b", b"bbbbbb") is True          # fits exactly: 10 bytes
+    assert cache.put("big", b"x" * 7) is False        # larger than one item may be
+
+    cache.get("c"); cache.get("c")
+    assert cache.put("c", b"cccc") is False           # not hotter than LRU victim "a"
+    for _ in range(5):
+        cache.get("c")
+    assert cache.put("c", b"cccc") is True            # evicts the least recently used "a"
+    assert cache.get("a") is None and len(cache) == 2 and cache.nbytes == 10
+
+
+def test_published_download_served_from_cache_until_new_version(client, app):
+    client.post("/register", json={
+        "username": "hot", "email": "hot@mail", "password": "pwd", "grade": 1
+    })
+    client.post("/login", json={"username": "hot", "password": "pwd"})
+    fid = client.post("/upload", data={"file": (BytesIO(b"handbook v1"), "hb.txt")},
+                      content_type="multipart/form-data").get_json()["file_id"]
+    with app.app_context():
+        db.session.get(File, fid).is_published = True
+        db.session.commit()
+
+    before = _hits()
+    bodies = [client.get(f"/download/{fid}") for _ in range(3)]
+    assert all(r.data == b"handbook v1" for r in bodies)
+    assert _hits() == before + 1
+    assert len(app.extensions["hot_cache"]) >= 1
+
+    etag = bodies[-1].headers["ETag"]
+    assert client.get(f"/download/{fid}", headers={"If-None-Match": etag}).status_code == 304
+
+    cached = app.extensions["hot_cache"].nbytes
+    client.post(f"/upload-version/{fid}", data={"file": (BytesIO(b"handbook v2"), "hb.txt")},
+                content_type="multipart/form-data")
+    assert app.extensions["hot_cache"].nbytes == cached - len(b"handbook v1")
+    assert client.get(f"/download/{fid}").data == b"handbook v2"
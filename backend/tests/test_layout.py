@@ -0,0 +1,101 @@
+import os
+from io import BytesIO
+
+from .. import layout
+from ..models import File, FileVersion, db
+from ..storage import storage
+
+
+def test_new_versions_are_sharded_and_flat_ones_migrate(client, app):
+    client.post("/register", json={
+        "username": "shard", "email": "shard@mail", "password": "pwd", "grade": 1
+    })
+    client.post("/login", json={"username": "shard", "password": "pwd"})
+    fid = client.post("/upload", data={"file": (BytesIO(b"one"), "s.txt")},
+                      content_type="multipart/form-data").get_json()["file_id"]
+    client.post(f"/upload-version/{fid}", data={"file": (BytesIO(b"two"), "s.txt")},
+                content_type="multipart/form-data")
+
+    with app.app_context():
+        versions = FileVersion.query.filter_by(file_id=fid).order_by(FileVersion.version_number).all()
+        for v in versions:
+            assert v.path == layout.version_path("shard", os.path.basename(v.path))
+
+        # push them back into the old flat layout, as written before sharding
+        flat = {}
+        for v in versions:
+            parent = os.path.dirname(os.path.dirname(os.path.dirname(v.path)))
+            flat[v.id] = os.path.join(parent, os.path.basename(v.path))
+            storage.move(v.path, flat[v.id])
+            if v.file.path == v.path:
+                v.file.path = flat[v.id]
+            v.path = flat[v.id]
+        db.session.commit()
+        missing = FileVersion(file_id=fid, version_number=3, path=flat[versions[0].id] + ".gone")
+        db.session.add(missing)
+        db.session.commit()
+
+        report = layout.migrate_version_layout(batch_size=1, workers=2)
+        assert (report.moved, report.missing, report.failed) == (2, 1, 0)
+        for v in FileVersion.query.filter_by(file_id=fid).filter(FileVersion.version_number < 3):
+            assert v.path == layout.sharded_path(flat[v.id])
+            assert storage.exists(v.path) and not storage.exists(flat[v.id])
+        assert db.session.get(File, fid).path == layout.sharded_path(flat[versions[1].id])
+
+        again = layout.migrate_version_layout()
+        assert (again.moved, again.missing) == (0, 1)
+        db.session.delete(missing)
+        db.session.commit()
+
+    assert client.get(f"/download/{fid}").data == b"two"
+
+
+def test_legacy_paths_become_storage_keys(client, app):
+    for name in ("keys", "keysmith"):
+        client.post("/register", json={
+            "username": name, "email": f"{name}@mail", "password": "pwd", "grade": 1
+        })
+    client.post("/login", json={"username": "keysmith", "password": "pwd"})
+    other = client.post("/upload", data={"file": (BytesIO(b"theirs"), "o.txt")},
+                        content_type="multipart/form-data").get_json()["file_id"]
+    client.post("/login", json={"username": "keys", "password": "pwd"})
+    fid = client.post("/upload", data={"file": (BytesIO(b"mine"), "k.txt")},
+                      content_type="multipart/form-data").get_json()["file_id"]
+
+    with app.app_context():
+        root = app.config["UPLOAD_FOLDER"]
+        live = db.session.get(File, fid)
+        assert live.path == "keys/k.txt"
+        # rows as written when paths still carried the upload root
+        live.path = os.path.join(root, live.path)
+        for v in FileVersion.query.filter(FileVersion.file_id.in_([fid, other])):
+            v.path = os.path.join(root, v.path)
+        db.session.commit()
+
+    with app.app_context():
+        report = layout.migrate_storage_keys(batch_size=1)
+        assert report.rewritten == 3 and report.outside_root == 0
+        assert db.session.get(File, fid).path == "keys/k.txt"
+        assert layout.migrate_storage_keys().rewritten == 0
+    assert client.get(f"/download/{fid}").data == b"mine"
+
+    with app.app_context():
+        File.query.filter(File.id.in_([fid, other])).delete()
+        db.session.commit()
+
+    # "keys" is a prefix of "keysmith" but only its own deleted files are listed
+    deleted = client.get("/list-deleted-files").get_json()
+    assert [d["file_id"] for d in deleted] == [fid]
+
+    with app.app_context():
+        FileVersion.query.filter(FileVersion.file_id.in_([fid, other])).delete()
+        db.session.commit()
+
+
+def test_names_that_collide_with_the_storage_root_are_reserved(client, app):
+    root = os.path.basename(os.path.normpath(app.config["UPLOAD_FOLDER"]))
+    for name in (root, layout.VERSION_DIR, layout.DERIVED_DIR, "a/b"):
+        rv = client.post("/register", json={
+            "username": name, "email": f"reserved{len(name)}@mail", "password": "pwd", "grade": 1
+        })
+        assert rv.status_code == 400
@@ -0,0 +1,74 @@
+import io
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from .. import previews
+from ..storage import storage
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _png(w, h):
+    buf = io.BytesIO()
+    Image.new("RGB", (w, h), (200, 30, 30)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def test_preview_endpoint(client):
+    client.post("/register", json={
+        "username": "thumbs", "email": "thumbs@mail", "password": "pwd", "grade": 1
+    })
+    client.post("/login", json={"username": "thumbs", "password": "pwd"})
+    upload = lambda data, name: client.post(
+        "/upload", data={"file": (io.BytesIO(data), name)},
+        content_type="multipart/form-data").get_json()["file_id"]
+
+    fid = upload(_png(800, 400), "wide.png")
+    rv = client.get(f"/preview/{fid}/1?size=100")
+    assert rv.status_code == 200 and rv.mimetype == "image/webp"
+    assert "no-cache" in rv.headers["Cache-Control"] and "immutable" not in rv.headers["Cache-Control"]
+    assert Image.open(io.BytesIO(rv.data)).size == (128, 64)          # snapped up to 128
+    assert client.get(f"/preview/{fid}/1?size=100",
+                      headers={"If-None-Match": rv.headers["ETag"]}).status_code == 304
+
+    notes = upload(b"# Notes\n\nfirst line", "notes.md")
+    page = client.get(f"/preview/{notes}/1?size=256")
+    assert page.status_code == 200 and Image.open(io.BytesIO(page.data)).size == (181, 256)
+
+    assert client.get(f"/preview/{upload(b'not a png', 'broken.png')}/1").status_code == 404
+    assert client.get(f"/preview/{upload(b'x', 'blob.bin')}/1").status_code == 404
+    assert client.get(f"/preview/{fid}/9").status_code == 404
+
+
+def test_concurrent_requests_share_one_render(app, monkeypatch):
+    renders = []
+    real = previews.render_image
+
+    def slow_render(fh, size):
+        renders.append(size)
+        time.sleep(0.2)
+        return real(fh, size)
+    monkeypatch.setattr(previews, "render_image", slow_render)
+
+    with app.app_context():
+        storage.put("coalesce/photo.png", _png(300, 300))
+    version = SimpleNamespace(sha256="c0" * 32, path="coalesce/photo.png", size=1)
+    pool = previews.Previews(app)
+    results = []
+
+    def request():
+        with app.app_context():
+            results.append(pool.get(version, "photo.png", "image/png", 64))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert renders == [64] and len(results) == 8 and len(set(results)) == 1
+    with app.app_context():
+        assert pool.get(version, "photo.png", "image/png", 64) == results[0]   # from storage now
+    assert renders == [64]
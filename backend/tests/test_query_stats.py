@@ -0,0 +1,57 @@
+import logging
+
+import pytest
+
+from .. import query_stats
+
+
+def _login(client):
+    client.post("/register", json={
+        "username": "quser", "email": "q@mail", "password": "pwd", "grade": 1
+    })
+    client.post("/login", json={"username": "quser", "password": "pwd"})
+
+
+def test_statement_shape_collapses_in_lists():
+    a = query_stats.statement_shape("SELECT * FROM f WHERE id IN (?, ?)")
+    b = query_stats.statement_shape("SELECT *\n FROM f WHERE id IN (?, ?, ?, ?)")
+    assert a == b
+
+
+def test_max_queries_helper(client, max_queries):
+    _login(client)
+    with max_queries(5):
+        client.get("/notifications")
+    with pytest.raises(AssertionError, match="expected at most 0 queries"):
+        with max_queries(0):
+            client.get("/notifications")
+
+
+def test_headers_and_n_plus_one_warning(client, app, caplog):
+    _login(client)
+    for i in range(3):
+        client.post("/folders", json={"name": f"q{i}"})
+
+    app.config.update(QUERY_STATS_HEADERS=True, N_PLUS_ONE_THRESHOLD=3)
+    try:
+        with caplog.at_level(logging.WARNING):
+            rv = client.get("/folders")
+    finally:
+        app.config.update(QUERY_STATS_HEADERS=False, N_PLUS_ONE_THRESHOLD=10)
+
+    assert int(rv.headers["X-DB-Query-Count"]) > 0
+    assert rv.headers["X-DB-Query-Time"].endswith("ms")
+    assert any("possible N+1 in main.get_folders" in r.message for r in caplog.records)
+
+
+def test_failed_statement_does_not_leak_its_start_time(app):
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    from ..models import db
+
+    with app.app_context():
+        conn = db.session.connection()
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM no_such_table"))
+        assert conn.info.get("query_start") == []
+        db.session.rollback()
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+from io import BytesIO
+from types import SimpleNamespace
+
+from .. import retention
+from ..models import User, FileVersion, DocumentReview, db
+from ..storage import storage
+
+
+def _v(n, days_ago, now):
+    return SimpleNamespace(version_number=n, uploaded_at=now - timedelta(days=days_ago))
+
+
+def test_policy_keeps_last_daily_weekly_current_and_reviewed():
+    now = datetime(2026, 6, 30, 12)
+    versions = [
+        _v(1, 400, now),              # outside every window
+        _v(2, 101, now), _v(3, 100, now),  # same ISO week → only v3 kept weekly
+        _v(4, 10, now), _v(5, 10, now),    # same day → only v5 kept daily
+        _v(6, 1, now),
+    ]
+    policy = retention.RetentionPolicy(keep_last=1, daily_days=30, weekly_weeks=52)
+    doomed = retention.versions_to_delete(versions, current_version=6, protected={1},
+                                          policy=policy, now=now)
+    assert sorted(v.version_number for v in doomed) == [2, 4]
+
+
+def test_sweep_deletes_rows_and_blobs_in_bulk(client, app):
+    client.post("/register", json={
+        "username": "ret", "email": "ret@mail", "password": "pwd", "grade": 1
+    })
+    client.post("/login", json={"username": "ret", "password": "pwd"})
+    fid = client.post("/upload", data={"file": (BytesIO(b"v1"), "ret.txt")},
+                      content_type="multipart/form-data").get_json()["file_id"]
+    for i in range(2, 6):
+        client.post(f"/file-content/{fid}", json={"content": f"v{i}"})
+
+    with app.app_context():
+        user = User.query.filter_by(username="ret").first()
+        old = datetime.utcnow() - timedelta(days=800)
+        FileVersion.query.filter(FileVersion.file_id == fid).update({"uploaded_at": old})
+        db.session.add(DocumentReview(file_id=fid, reviewer_id=user.id, requester_id=user.id,
+                                      status="approved", original_version=2, modified_version=3))
+        db.session.commit()
+        paths = {v.version_number: v.path for v in FileVersion.query.filter_by(file_id=fid)}
+
+        policy = retention.RetentionPolicy(keep_last=1, daily_days=0, weekly_weeks=0)
+        report = retention.sweep(policy, dry_run=True, user_id=user.id)
+        assert report.versions_deleted == 2 and report.per_user["ret"]["bytes"] == 4
+        assert FileVersion.query.filter_by(file_id=fid).count() == 5
+
+        retention.sweep(policy, user_id=user.id)
+        left = sorted(v.version_number for v in FileVersion.query.filter_by(file_id=fid))
+        assert left == [2, 3, 5]
+        assert not any(storage.exists(paths[n]) for n in (1, 4))
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["retention-sweep", "--dry-run", "--user", "ret"])
+    assert "bytes reclaimable" in result.output
+
+
+def test_retention_report_requires_admin(client):
+    client.post("/register", json={
+        "username": "ret2", "email": "ret2@mail", "password": "pwd", "grade": 1
+    })
+    client.post("/login", json={"username": "ret2", "password": "pwd"})
+    assert client.get("/admin/retention-report").status_code == 403
+
+
+def test_retention_report_serves_the_last_stored_sweep(client, app):
+    client.post("/register", json={
+        "username": "ret3", "email": "ret3@mail", "password": "pwd", "grade": 1
+    })
+    with app.app_context():
+        User.query.filter_by(username="ret3").one().is_admin = True
+        db.session.commit()
+    client.post("/login", json={"username": "ret3", "password": "pwd"})
+
+    result = app.test_cli_runner().invoke(args=["retention-sweep", "--dry-run"])
+    assert result.exit_code == 0
+    with app.app_context():
+        stored = retention.latest_report()
+
+    rv = client.get("/admin/retention-report")
+    assert rv.status_code == 200
+    body = rv.get_json()
+    assert body["dry_run"] is True and body["ran_at"] == stored.ran_at.isoformat()
+    assert body["files_scanned"] == stored.files_scanned
@@ -50,7 +50,7 @@ def test_request_and_complete_review(client, flask_app):
     rv = client.get("/my-reviews")
     reviews = rv.get_json()
     assert len(reviews) > 0
-    rid = reviews[-1]["id"]
+    rid = next(r["id"] for r in reviews if r["status"] == "pending")
 
     # check notifications
     rv = client.get("/notifications")
@@ -0,0 +1,92 @@
+from datetime import datetime
+from io import BytesIO
+
+from ..models import DocumentReview, User, db
+from ..pagination import encode_cursor
+
+
+def _user(client, name):
+    client.post("/register", json={
+        "username": name, "email": f"{name}@mail", "password": "pwd", "grade": 1
+    })
+
+
+def _login(client, name):
+    client.post("/logout")
+    client.post("/login", json={"username": name, "password": "pwd"})
+
+
+def test_inbox_is_paginated_pending_first_and_eager_loaded(client, app, max_queries):
+    _user(client, "ibx_req")
+    _user(client, "ibx_rev")
+    with app.app_context():
+        reviewer_id = User.query.filter_by(username="ibx_rev").first().id
+
+    _login(client, "ibx_req")
+    file_ids = []
+    for i in range(5):
+        rv = client.post("/upload", data={"file": (BytesIO(b"x"), f"ibx{i}.txt")},
+                         content_type="multipart/form-data")
+        file_ids.append(rv.get_json()["file_id"])
+        client.post(f"/request-review/{file_ids[-1]}", json={"reviewer_id": reviewer_id})
+    # two of them get decided, three stay pending
+    _login(client, "ibx_rev")
+    first_page = client.get("/my-reviews?limit=50").get_json()
+    for review in first_page[:2]:
+        client.post(f"/review/{review['id']}", json={"decision": "approved"})
+
+    seen, cursor = [], None
+    with max_queries(3 * 3):   # user load + one joined query (+ phase switch) per page
+        for _ in range(3):
+            url = "/my-reviews?limit=2" + (f"&cursor={cursor}" if cursor else "")
+            rv = client.get(url)
+            seen.extend(rv.get_json())
+            cursor = rv.headers.get("X-Next-Cursor")
+    assert cursor is None
+    assert len(seen) == 5 and len({r["id"] for r in seen}) == 5
+    assert [r["status"] for r in seen] == ["pending"] * 3 + ["approved"] * 2
+
+    pending = client.get("/my-reviews?status=pending").get_json()
+    assert {r["status"] for r in pending} == {"pending"} and len(pending) == 3
+    assert client.get("/my-reviews?status=bogus").status_code == 400
+    assert client.get("/my-reviews?cursor=!!").status_code == 400
+
+    _login(client, "ibx_req")
+    mine = client.get("/my-requests?status=approved").get_json()
+    assert len(mine) == 2 and all(r["reviewer"] == "ibx_rev" for r in mine)
+
+
+def test_inbox_pages_rows_within_the_same_second_in_order(client, app):
+    _user(client, "ibs_req")
+    _user(client, "ibs_rev")
+    with app.app_context():
+        reviewer_id = User.query.filter_by(username="ibs_rev").first().id
+
+    _login(client, "ibs_req")
+    for i in range(3):
+        rv = client.post("/upload", data={"file": (BytesIO(b"x"), f"ibs{i}.txt")},
+                         content_type="multipart/form-data")
+        client.post(f"/request-review/{rv.get_json()['file_id']}",
+                    json={"reviewer_id": reviewer_id})
+    # same second, sub-second order opposite to the id order
+    with app.app_context():
+        reviews = DocumentReview.query.filter_by(reviewer_id=reviewer_id).order_by(DocumentReview.id).all()
+        review_ids = [r.id for r in reviews]
+        for review, micros in zip(reviews, (100000, 500000, 900000)):
+            review.requested_at = datetime(2030, 1, 1, 12, 0, 0, micros)
+        db.session.commit()
+
+    _login(client, "ibs_rev")
+    seen, cursor = [], None
+    for _ in range(4):
+        url = "/my-reviews?limit=1" + (f"&cursor={cursor}" if cursor else "")
+        rv = client.get(url)
+        seen.extend(r["id"] for r in rv.get_json())
+        cursor = rv.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == review_ids[::-1]
+
+    for bad in ({"p": "x"}, {"p": -1}, {"p": True}, {"p": 0, "t": 5, "id": 1},
+                {"p": 0, "t": "2030-01-01 12:00:00", "id": "x"}):
+        assert client.get(f"/my-reviews?cursor={encode_cursor(bad)}").status_code == 400
@@ -0,0 +1,134 @@
+import tempfile
+import time
+
+import pytest
+
+from ..app import create_app
+from ..models import db
+from ..sessions import MemorySessionStore, RedisSessionStore, SQLiteSessionStore
+
+
+class FakeRedis:
+    """The handful of Redis commands RedisSessionStore issues, in a dict."""
+
+    def __init__(self):
+        self.data, self.expiry = {}, {}
+
+    def _live(self, key):
+        if key in self.expiry and self.expiry[key] <= time.time():
+            self.data.pop(key, None)
+            self.expiry.pop(key, None)
+        return key in self.data
+
+    def get(self, key):
+        return self.data[key].encode() if self._live(key) else None
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+        if ex is not None:
+            self.expiry[key] = time.time() + ex
+
+    def delete(self, *keys):
+        live = [k for k in keys if self._live(k)]
+        for k in live:
+            del self.data[k]
+        return len(live)
+
+    def sadd(self, key, *members):
+        self._live(key)
+        self.data.setdefault(key, set()).update(members)
+
+    def srem(self, key, *members):
+        self.data.get(key, set()).difference_update(members)
+
+    def smembers(self, key):
+        return {m.encode() for m in self.data[key]} if self._live(key) else set()
+
+    def expire(self, key, ttl):
+        self.expiry[key] = time.time() + ttl
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self)
+
+
+class _Pipeline:
+    def __init__(self, client):
+        self.client, self.calls = client, []
+
+    def __getattr__(self, name):
+        return lambda *a, **k: self.calls.append((name, a, k))
+
+    def execute(self):
+        return [getattr(self.client, n)(*a, **k) for n, a, k in self.calls]
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionStore()
+    if request.param == "sqlite":
+        return SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    return RedisSessionStore(FakeRedis())
+
+
+def test_store_ttl_and_per_user_revocation(store, monkeypatch):
+    store.save("a", "payload-a", 60, "7")
+    store.save("b", "payload-b", 60, "7")
+    store.save("c", "payload-c", 60, "8")
+    store.save("anon", "payload-anon", 10, None)
+    payload, expires = store.load("a")
+    assert payload == "payload-a" and expires > time.time()
+
+    assert store.revoke_user("7", keep="b") == 1
+    assert store.load("a") is None and store.load("b") is not None
+
+    store.delete("b")
+    assert store.load("b") is None and store.revoke_user("7") == 0
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 30)
+    assert store.load("anon") is None and store.load("c") is not None
+    store.purge()
+    assert store.load("c") is not None
+
+
+def test_sqlite_store_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "shared.db")
+    SQLiteSessionStore(path).save("s", "oauth-state", 60, None)
+    assert SQLiteSessionStore(path).load("s")[0] == "oauth-state"
+
+
+def test_server_side_sessions_are_lazy_and_revocable():
+    tmp = tempfile.mkdtemp()
+    app = create_app(TESTING=True, METRICS_ENABLED=False, UPLOAD_FOLDER=tmp,
+                     SQLALCHEMY_DATABASE_URI="sqlite://", SESSION_TYPE="memory")
+    store = app.extensions["session_store"]
+    with app.app_context():
+        db.create_all()
+    writes = []
+    real_save = store.save
+    store.save = lambda *a: (writes.append(a[0]), real_save(*a))
+
+    laptop, phone = app.test_client(), app.test_client()
+    laptop.post("/register", json={"username": "sess", "email": "sess@mail",
+                                   "password": "secret1", "grade": 1})
+    for c in (laptop, phone):
+        rv = c.post("/login", json={"username": "sess", "password": "secret1"})
+        assert rv.status_code == 200
+    cookie = laptop.get_cookie("session").value
+    assert len(cookie) == 43 and "sess" not in cookie   # only an opaque id leaves the server
+
+    before = len(writes)
+    for _ in range(3):
+        assert laptop.get("/user-info").status_code == 200
+    assert len(writes) == before                         # unmodified sessions are not rewritten
+
+    assert laptop.post("/change-password", json={"current_password": "secret1",
+                                                 "new_password": "secret2"}).status_code == 200
+    assert laptop.get("/user-info").status_code == 200
+    assert phone.get("/user-info").status_code == 401
+
+    laptop.post("/logout")
+    assert store.load(cookie) is None
+    with app.app_context():
+        db.drop_all()
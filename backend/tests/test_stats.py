@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+from io import BytesIO
+
+from .. import stats
+from ..models import db, DocumentReview, File, ReviewRollup, StorageRollup, User
+
+
+def _register(client, name):
+    client.post("/register", json={
+        "username": name, "email": f"{name}@mail", "password": "pwd", "grade": 1
+    })
+
+
+def _rollups():
+    return ({(r.reviewer_id, r.status): (r.reviews, r.timed, r.turnaround_seconds)
+             for r in ReviewRollup.query if r.reviews},
+            {r.user_id: (r.files, r.versions, r.bytes) for r in StorageRollup.query if r.files})
+
+
+def test_rollups_follow_mutations_and_reconcile(client, app):
+    for name in ("author", "checker"):
+        _register(client, name)
+    client.post("/login", json={"username": "author", "password": "pwd"})
+    with app.app_context():
+        author = User.query.filter_by(username="author").one().id
+        checker = User.query.filter_by(username="checker").one().id
+
+    fids = [client.post("/upload", data={"file": (BytesIO(b"x" * n), f"s{n}.txt")},
+                        content_type="multipart/form-data").get_json()["file_id"] for n in (3, 5)]
+    client.post(f"/file-content/{fids[0]}", json={"content": "abcdefg"})
+    client.delete(f"/delete/{fids[1]}")
+    assert client.post(f"/request-review/{fids[0]}", json={"reviewer_id": checker}).status_code == 201
+    client.post(f"/cancel-review/{fids[0]}")
+    client.post(f"/request-review/{fids[0]}", json={"reviewer_id": checker})
+
+    client.post("/logout")
+    client.post("/login", json={"username": "checker", "password": "pwd"})
+    with app.app_context():
+        review = DocumentReview.query.filter_by(file_id=fids[0], status="pending").one()
+        review.requested_at = datetime.utcnow() - timedelta(hours=2)
+        db.session.commit()
+        review_id = review.id
+    assert client.post(f"/review/{review_id}", json={"decision": "approved"}).status_code == 200
+
+    with app.app_context():
+        reviews, storage = _rollups()
+        assert storage[author] == (1, 2, 3 + 7)
+        assert reviews[(checker, "cancelled")] == (1, 0, 0)
+        approved = reviews[(checker, "approved")]
+        assert approved[:2] == (1, 1) and 7190 <= approved[2] <= 7210
+
+        # drift introduced behind the ORM's back is repaired by reconcile()
+        db.session.query(StorageRollup).filter_by(user_id=author).update({"bytes": 999})
+        db.session.query(ReviewRollup).filter_by(reviewer_id=checker, status="cancelled").delete()
+        db.session.commit()
+        before = (reviews, storage)
+        fixed = stats.reconcile()
+        assert fixed["storage"] >= 1 and fixed["reviews"] >= 1
+        reviews, storage = _rollups()
+        assert storage[author] == before[1][author]
+        assert reviews[(checker, "cancelled")] == before[0][(checker, "cancelled")]
+        assert reviews[(checker, "approved")][:2] == (1, 1)
+        assert stats.reconcile() == {"reviews": 0, "storage": 0, "folders": 0}
+
+    assert client.get("/admin/stats/storage").status_code == 403
+    client.post("/logout")
+    _register(client, "statsadmin")
+    with app.app_context():
+        User.query.filter_by(username="statsadmin").one().is_admin = True
+        db.session.commit()
+    client.post("/login", json={"username": "statsadmin", "password": "pwd"})
+    body = client.get("/admin/stats/storage").get_json()
+    assert {"user_id": author, "username": "author", "files": 1, "versions": 2, "bytes": 10} in body["users"]
+    body = client.get("/admin/stats/reviews").get_json()
+    mine = next(r for r in body["reviewers"] if r["username"] == "checker")
+    assert mine["by_status"] == {"approved": 1, "cancelled": 1}
+    assert 7190 <= mine["avg_turnaround_seconds"] <= 7210
@@ -0,0 +1,129 @@
+import os
+from io import BytesIO
+
+import pytest
+from flask import Flask
+from prometheus_client import REGISTRY
+
+from .. import storage as storage_mod
+from ..storage import LocalStorage, StorageError, create_storage
+
+
+def _exercise(store):
+    a, b, c = ('u/d/a.txt', 'u/d/b.txt', 'u/d/c.txt')
+    assert store.put(a, b"hello world") == 11
+    assert store.put(b, BytesIO(b"x" * 5000)) == 5000
+    assert store.read(a) == b"hello world"
+    assert sorted(store.scan('u')) == [(a, 11), (b, 5000)]
+    assert store.read_range(a, 6, 10) == b"world"
+    assert store.stat(a).size == 11 and store.size(b) == 5000
+
+    store.copy(a, c)
+    assert store.read_text(c) == "hello world"
+    store.move(c, b)
+    assert store.read(b) == b"hello world" and not store.exists(c)
+
+    store.put('u/e/f/g.txt', b"deep")
+    store.move_dir('u/e', 'u/moved/e')
+    assert store.read('u/moved/e/f/g.txt') == b"deep" and not store.exists('u/e/f/g.txt')
+    with pytest.raises(StorageError):
+        store.move_dir('u/d', 'u/moved/e')      # never merges into a non-empty target
+
+    assert store.delete(a) is True
+    assert store.delete(a) is False
+    assert store.stat(a) is None
+    with pytest.raises(StorageError):
+        store.open(a)
+
+    app = Flask(__name__)
+    with app.test_request_context():
+        resp = store.send(b, as_attachment=True, download_name='b.txt')
+        resp.direct_passthrough = False
+        assert resp.get_data() == b"hello world"
+        assert 'attachment' in resp.headers['Content-Disposition']
+
+
+def test_local_storage(tmp_path):
+    _exercise(LocalStorage(str(tmp_path)))
+    leftovers = [n for n in os.listdir(tmp_path / 'u' / 'd') if n.startswith('.upload-')]
+    assert leftovers == []
+
+
+def test_s3_storage_against_moto(tmp_path, monkeypatch):
+    moto = pytest.importorskip('moto')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'test')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'test')
+    with moto.mock_aws():
+        store = create_storage({'STORAGE_BACKEND': 's3', 'S3_BUCKET': 'docs',
+                                'S3_REGION': 'us-east-1', 'UPLOAD_FOLDER': str(tmp_path),
+                                'S3_MULTIPART_THRESHOLD': 5 * 1024 * 1024})
+        store.client.create_bucket(Bucket='docs')
+        _exercise(store)
+        # nothing was written to the local disk
+        assert not (tmp_path / 'u').exists()
+
+
+def test_keys_are_relative_to_the_root(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = LocalStorage('uploads')
+    assert store.key('alice/a.txt') == 'alice/a.txt'
+    assert store.key('alice/../bob/./b.txt') == 'bob/b.txt'
+    # a user called "uploads" is just another key, never the root prefix
+    assert store.key('uploads/alice/a.txt') == 'uploads/alice/a.txt'
+    for bad in ('../etc/passwd', '/etc/passwd', str(tmp_path / 'uploads' / 'alice' / 'a.txt')):
+        with pytest.raises(StorageError):
+            store.key(bad)
+
+    store.put('alice/a.txt', b"x")
+    # a replica with another working directory resolves the same key
+    assert LocalStorage(str(tmp_path / 'uploads')).read('alice/a.txt') == b"x"
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(StorageError):
+        create_storage({'STORAGE_BACKEND': 'ftp'})
+
+
+def test_copy_prefers_zero_copy_and_falls_back(tmp_path, monkeypatch):
+    src = tmp_path / "src.bin"
+    src.write_bytes(b"abc" * 100_000)
+    store = LocalStorage(str(tmp_path))
+
+    assert store.copy("src.bin", "v/linked", immutable=True) == "hardlink"
+    assert os.stat(tmp_path / "v" / "linked").st_ino == os.stat(src).st_ino
+
+    first = store.copy("src.bin", "plain")
+    assert first in ("reflink", "copy_file_range", "sendfile")
+    assert (tmp_path / "plain").read_bytes() == src.read_bytes()
+    assert os.stat(tmp_path / "plain").st_ino != os.stat(src).st_ino
+
+    def unsupported(*a, **k):
+        raise OSError(storage_mod.errno.EOPNOTSUPP, "nope")
+
+    monkeypatch.setattr(storage_mod, "_reflink", unsupported)
+    monkeypatch.setattr(storage_mod.os, "copy_file_range", unsupported, raising=False)
+    monkeypatch.setattr(storage_mod, "_STREAM_STRATEGIES", (
+        ("reflink", storage_mod._reflink), ("copy_file_range", storage_mod._copy_file_range),
+        ("sendfile", storage_mod._sendfile), ("buffered", storage_mod._buffered)))
+    assert store.copy("src.bin", "sent") == "sendfile"
+    monkeypatch.setattr(storage_mod.os, "sendfile", unsupported, raising=False)
+    assert store.copy("src.bin", "plain") == "buffered"
+    assert (tmp_path / "plain").read_bytes() == src.read_bytes()
+
+    assert REGISTRY.get_sample_value("docs_blob_copies_total", {"strategy": "buffered"}) >= 1
+
+
+def test_accel_mode_hands_the_transfer_to_nginx(tmp_path):
+    store = create_storage({'STORAGE_BACKEND': 'local', 'UPLOAD_FOLDER': str(tmp_path),
+                            'DOWNLOAD_MODE': 'accel', 'ACCEL_REDIRECT_PREFIX': '/_protected/'})
+    key = 'alice/.version/ab/cd/1_v1_my report.pdf'
+    store.put(key, b"%PDF" * 1000)
+
+    with Flask(__name__).test_request_context():
+        resp = store.send(key, as_attachment=True, download_name='report_v1.pdf')
+    assert resp.headers['X-Accel-Redirect'] == '/_protected/alice/.version/ab/cd/1_v1_my%20report.pdf'
+    assert resp.get_data() == b"" and resp.mimetype == 'application/pdf'
+    assert 'report_v1.pdf' in resp.headers['Content-Disposition']
+
+    with pytest.raises(StorageError):
+        store.send(str(tmp_path.parent / 'elsewhere.txt'))
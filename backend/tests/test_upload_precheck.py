@@ -0,0 +1,77 @@
+import hashlib
+from io import BytesIO
+
+from ..models import File, FileVersion, db
+
+
+def _login(client, name):
+    client.post("/register", json={
+        "username": name, "email": f"{name}@mail", "password": "pwd", "grade": 1
+    })
+    client.post("/login", json={"username": name, "password": "pwd"})
+
+
+def test_precheck_dedupes_readable_content_only(client, app):
+    body = b"quarterly template " * 50
+    digest = hashlib.sha256(body).hexdigest()
+
+    _login(client, "dedup_a")
+    rv = client.post("/upload", data={"file": (BytesIO(body), "tpl.txt")},
+                     content_type="multipart/form-data")
+    assert rv.status_code == 201 and rv.get_json()["sha256"] == digest
+    src_id = rv.get_json()["file_id"]
+
+    rv = client.post("/upload/precheck", json={"sha256": digest, "size": len(body), "filename": "copy.txt"})
+    assert rv.status_code == 201 and rv.get_json()["deduplicated"] is True
+    copy_id = rv.get_json()["file_id"]
+    assert copy_id != src_id
+    assert client.get(f"/download/{copy_id}").data == body
+
+    rv = client.post("/upload/precheck", json={"sha256": digest, "size": len(body), "file_id": src_id})
+    assert rv.status_code == 201 and rv.get_json()["version_number"] == 2
+
+    miss = client.post("/upload/precheck", json={"sha256": "0" * 64, "size": 3, "filename": "x.txt"})
+    assert miss.status_code == 200 and miss.get_json() == {"deduplicated": False, "upload_url": "/upload"}
+    assert client.post("/upload/precheck", json={"sha256": "nothex", "size": 3}).status_code == 400
+
+    # another user cannot borrow unpublished content by guessing its hash
+    client.post("/logout")
+    _login(client, "dedup_b")
+    rv = client.post("/upload/precheck", json={"sha256": digest, "size": len(body), "filename": "t.txt"})
+    assert rv.get_json()["deduplicated"] is False
+
+    with app.app_context():
+        db.session.get(File, src_id).is_published = True
+        db.session.commit()
+    rv = client.post("/upload/precheck", json={"sha256": digest, "size": len(body), "filename": "t.txt"})
+    assert rv.status_code == 201
+
+    with app.app_context():
+        assert FileVersion.query.filter_by(sha256=digest).count() == 4
+
+
+def test_precheck_only_borrows_current_version_of_published_files(client, app):
+    old = b"superseded draft " * 40
+    digest = hashlib.sha256(old).hexdigest()
+
+    _login(client, "dedup_c")
+    fid = client.post("/upload", data={"file": (BytesIO(old), "draft.txt")},
+                      content_type="multipart/form-data").get_json()["file_id"]
+    client.post(f"/file-content/{fid}", json={"content": "final text"})
+    with app.app_context():
+        db.session.get(File, fid).is_published = True
+        db.session.commit()
+    assert client.post("/upload/precheck", json={"sha256": digest, "size": len(old),
+                                                 "file_id": "abc"}).status_code == 400
+    own_folder = client.post("/folders", json={"name": "drafts"}).get_json()["folder_id"]
+
+    client.post("/logout")
+    _login(client, "dedup_e")
+    probe = {"sha256": digest, "size": len(old), "filename": "e.txt"}
+    assert client.post("/upload/precheck", json={**probe, "folder_id": {"a": 1}}).status_code == 400
+    assert client.post("/upload/precheck", json={**probe, "folder_id": own_folder}).status_code == 403
+
+    client.post("/logout")
+    _login(client, "dedup_d")
+    rv = client.post("/upload/precheck", json={"sha256": digest, "size": len(old), "filename": "d.txt"})
+    assert rv.status_code == 200 and rv.get_json()["deduplicated"] is False